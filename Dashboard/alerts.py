@@ -0,0 +1,310 @@
+# FILE: alerts.py
+"""
+Threshold alerts on the P/L, evaluated incrementally as snapshots are applied.
+
+Rules are read from a JSON list, for example
+
+    [{"id": "ticket-loss", "metric": "ticket_profit", "below": -200, "hysteresis": 20},
+     {"id": "eu-target", "metric": "symbol_profit", "symbol": "EURUSD", "above": 500, "debounce_s": 5},
+     {"id": "drawdown", "metric": "total_pl_pct", "below": -2, "hysteresis": 0.25}]
+
+Metrics: ticket_profit (each position, optionally only those of one symbol), symbol_profit (net profit
+of each symbol, or of one), total_pl (all relays together) and total_pl_pct (total_pl as a percentage
+of the summed balance the EAs report).
+"""
+import json
+import math
+import os
+import time
+from bisect import bisect_left, bisect_right
+
+METRICS = ("ticket_profit", "symbol_profit", "total_pl", "total_pl_pct")
+TOTAL = "total"
+
+# ===================================================================
+# 1. Rules
+# ===================================================================
+class AlertRule:
+    """
+    Fires once the metric goes below (or above) the threshold and stays there for debounce seconds;
+    fires again only after the value has come back by at least `hysteresis`.
+    """
+    __slots__ = ("id", "metric", "above", "threshold", "symbol", "hysteresis", "debounce")
+
+    def __init__(self, id, metric, threshold, above=False, symbol=None, hysteresis=0.0, debounce=0.0):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown alert metric: {metric!r}")
+        if symbol is not None and metric not in ("ticket_profit", "symbol_profit"):
+            raise ValueError(f"{metric} has no symbol")
+        self.id = id
+        self.metric = metric
+        self.threshold = float(threshold)
+        self.above = above
+        self.symbol = symbol
+        self.hysteresis = abs(float(hysteresis))
+        self.debounce = max(float(debounce), 0.0)
+
+    @classmethod
+    def from_dict(cls, item, index=0):
+        if ("above" in item) == ("below" in item):
+            raise ValueError(f"Alert rule {item.get('id', index)!r} needs exactly one of 'above' or 'below'")
+        above = "above" in item
+        return cls(str(item.get("id", index)), item.get("metric"), item["above" if above else "below"], above,
+                   item.get("symbol") or None, item.get("hysteresis", 0.0), item.get("debounce_s", 0.0))
+
+    def to_dict(self):
+        item = {"id": self.id, "metric": self.metric, "above" if self.above else "below": self.threshold}
+        if self.symbol is not None:
+            item["symbol"] = self.symbol
+        if self.hysteresis:
+            item["hysteresis"] = self.hysteresis
+        if self.debounce:
+            item["debounce_s"] = self.debounce
+        return item
+
+    @property
+    def rearm_point(self):
+        return self.threshold - self.hysteresis if self.above else self.threshold + self.hysteresis
+
+    def holds(self, value):
+        return value > self.threshold if self.above else value < self.threshold
+
+    def rearmed(self, value):
+        return value <= self.rearm_point if self.above else value >= self.rearm_point
+
+    def describe(self):
+        subject = f"{self.metric}[{self.symbol}]" if self.symbol else self.metric
+        return f"{subject} {'>' if self.above else '<'} {self.threshold:g}"
+
+    def __repr__(self):
+        return f"AlertRule({self.id!r}, {self.describe()})"
+
+
+def load_rules(path):
+    """ The rules in a JSON file; a missing file means no rules. """
+    try:
+        with open(path, encoding="utf-8") as f:
+            items = json.load(f)
+    except FileNotFoundError:
+        return []
+    return [AlertRule.from_dict(item, index) for index, item in enumerate(items)]
+
+# ===================================================================
+# 2. Sorted threshold index
+# ===================================================================
+class ThresholdIndex:
+    """
+    The rules of one metric and symbol, as four sorted lists of the points where a rule's state can
+    change: the thresholds and rearm points of the "below" rules and of the "above" rules. A move
+    from one value to another only touches the rules whose points lie between the two.
+    """
+    def __init__(self, rules):
+        self.below_fire = self._sorted(rules, False, "threshold")
+        self.below_rearm = self._sorted(rules, False, "rearm_point")
+        self.above_fire = self._sorted(rules, True, "threshold")
+        self.above_rearm = self._sorted(rules, True, "rearm_point")
+
+    @staticmethod
+    def _sorted(rules, above, attr):
+        pairs = sorted(((getattr(rule, attr), rule) for rule in rules if rule.above == above), key=lambda pair: pair[0])
+        return [point for point, _ in pairs], [rule for _, rule in pairs]
+
+    def crossed(self, old, new):
+        """ Rules whose fire or rearm condition may differ between old and new (old=None: a first value). """
+        if old is None:
+            # Only rules that hold already can change their (default, armed) state
+            points, rules = self.below_fire
+            yield from rules[bisect_right(points, new):]
+            points, rules = self.above_fire
+            yield from rules[:bisect_left(points, new)]
+            return
+        low, high = (old, new) if old < new else (new, old)
+        # below: "value < point" / "value >= point" flips for points in (low, high]
+        for points, rules in (self.below_fire, self.below_rearm):
+            yield from rules[bisect_right(points, low):bisect_right(points, high)]
+        # above: "value > point" / "value <= point" flips for points in [low, high)
+        for points, rules in (self.above_fire, self.above_rearm):
+            yield from rules[bisect_left(points, low):bisect_left(points, high)]
+
+# ===================================================================
+# 3. Engine
+# ===================================================================
+class AlertEvent:
+    __slots__ = ("rule", "subject", "value", "time", "kind")
+
+    def __init__(self, rule, subject, value, wall, kind):
+        self.rule = rule
+        self.subject = subject
+        self.value = value
+        self.time = wall
+        self.kind = kind  # "fired" or "cleared"
+
+    @property
+    def subject_text(self):
+        if isinstance(self.subject, tuple):
+            source, ticket = self.subject
+            return f"{source}#{ticket}" if source else f"#{ticket}"
+        return self.subject
+
+    def to_dict(self):
+        return {"time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.time)), "event": self.kind,
+                "rule": self.rule.id, "condition": self.rule.describe(), "subject": self.subject_text,
+                "value": round(self.value, 4) if self.value is not None else None}
+
+
+class AlertEngine:
+    """
+    Keeps the rules in ThresholdIndexes per (metric, symbol) and re-evaluates only the rules whose
+    thresholds lie between a subject's previous and new value. A subject is a position key for
+    ticket_profit, a symbol for symbol_profit and TOTAL for the account metrics; per subject only
+    the rules that are not armed keep a state (pending since a time, or fired), so the memory is
+    proportional to the alerts that are active, not to rules times positions.
+
+    The owner reports changes with ticket(), symbols() and totals(), calls tick() periodically for
+    the debounced rules and collects the events with drain().
+    """
+    def __init__(self, rules=(), audit_path=None, clock=time.monotonic):
+        self.clock = clock
+        self.audit_path = audit_path
+        self._audit = None
+        self.events = []
+        self.fired_count = 0
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        self.rules = list(rules)
+        grouped = {}
+        for rule in self.rules:
+            grouped.setdefault((rule.metric, rule.symbol), []).append(rule)
+        self.indexes = {key: ThresholdIndex(rules) for key, rules in grouped.items()}
+        self.has_ticket_rules = any(metric == "ticket_profit" for metric, _ in self.indexes)
+        self.has_symbol_rules = any(metric == "symbol_profit" for metric, _ in self.indexes)
+        self.states = {}         # (metric, subject) -> {rule: monotonic pending-since time, or None once fired}
+        self.values = {}         # (metric, subject) -> last value, for the account and symbol metrics
+        self.dirty_symbols = set()
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    # --- inputs -------------------------------------------------------
+    def ticket(self, key, symbol, old, new):
+        """ A position's profit went from old to new; None for a position that opened or closed. """
+        self.dirty_symbols.add(symbol)
+        if not self.has_ticket_rules:
+            return
+        if new is None:
+            self._forget(("ticket_profit", key), old)
+        else:
+            self._update("ticket_profit", key, symbol, old, new)
+
+    def symbols(self, profit_of):
+        """ Re-evaluates the symbols whose positions changed since the last call; profit_of(symbol) is None once it has none. """
+        dirty, self.dirty_symbols = self.dirty_symbols, set()
+        if not self.has_symbol_rules:
+            return
+        for symbol in dirty:
+            self._set("symbol_profit", symbol, symbol, profit_of(symbol))
+
+    def totals(self, total_pl, balance=None):
+        self._set("total_pl", TOTAL, None, total_pl)
+        pct = total_pl / balance * 100 if balance else None
+        self._set("total_pl_pct", TOTAL, None, pct)
+
+    def _set(self, metric, subject, symbol, value):
+        slot = (metric, subject)
+        old = self.values.get(slot)
+        if value is None:
+            self.values.pop(slot, None)
+            self._forget(slot, old)
+        elif value != old:
+            self.values[slot] = value
+            self._update(metric, subject, symbol, old, value)
+
+    def _update(self, metric, subject, symbol, old, new):
+        if old == new or (isinstance(new, float) and math.isnan(new)):
+            return
+        now = None
+        for index_key in ((metric, symbol), (metric, None)) if symbol is not None else ((metric, None),):
+            index = self.indexes.get(index_key)
+            if index is None:
+                continue
+            slot = (metric, subject)
+            for rule in index.crossed(old, new):
+                states = self.states.get(slot)
+                state = states.get(rule, False) if states else False
+                if state is False:  # armed
+                    if not rule.holds(new):
+                        continue
+                    if now is None:
+                        now = self.clock()
+                    if rule.debounce:
+                        self.states.setdefault(slot, {})[rule] = now
+                    else:
+                        self.states.setdefault(slot, {})[rule] = None
+                        self._emit(rule, subject, new, "fired")
+                elif state is None:  # fired
+                    if rule.rearmed(new):
+                        self._clear(slot, rule)
+                        self._emit(rule, subject, new, "cleared")
+                elif not rule.holds(new):  # pending, and no longer holds: not sustained long enough
+                    self._clear(slot, rule)
+
+    def _forget(self, slot, value):
+        """ The subject is gone (a closed position, a symbol without positions): its fired rules clear. """
+        states = self.states.pop(slot, None)
+        if states:
+            for rule, since in states.items():
+                if since is None:
+                    self._emit(rule, slot[1], value, "cleared")
+
+    def _clear(self, slot, rule):
+        states = self.states[slot]
+        del states[rule]
+        if not states:
+            del self.states[slot]
+
+    def tick(self, value_of):
+        """ Fires the debounced rules that have held for long enough; value_of(metric, subject) gives the current value. """
+        now = self.clock()
+        for (metric, subject), states in self.states.items():
+            for rule, since in states.items():
+                if since is not None and now - since >= rule.debounce:
+                    states[rule] = None
+                    value = self.values.get((metric, subject))
+                    self._emit(rule, subject, value_of(metric, subject) if value is None else value, "fired")
+
+    # --- outputs ------------------------------------------------------
+    def _emit(self, rule, subject, value, kind):
+        event = AlertEvent(rule, subject, value, time.time(), kind)
+        if kind == "fired":
+            self.fired_count += 1
+        self.events.append(event)
+        self.audit(event)
+
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+
+    def audit(self, event):
+        """ Appends the event to the audit log, one JSON object per line. """
+        if self.audit_path is None:
+            return
+        try:
+            if self._audit is None:
+                os.makedirs(os.path.dirname(self.audit_path) or ".", exist_ok=True)
+                self._audit = open(self.audit_path, "a", encoding="utf-8")
+            self._audit.write(json.dumps(event.to_dict(), ensure_ascii=False) + "\n")
+            self._audit.flush()
+        except OSError as e:
+            print(f"[Alerts] ❌ Audit log disabled: {e!r}")
+            self.audit_path = None
+
+    def active(self):
+        """ (rule, subject) of every rule that has fired and not cleared yet. """
+        return [(rule, subject) for (_, subject), states in self.states.items()
+                for rule, since in states.items() if since is None]
+
+    def close(self):
+        if self._audit is not None:
+            self._audit.close()
+            self._audit = None
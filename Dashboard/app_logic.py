@@ -1,20 +1,47 @@
 # FILE: app_logic.py
+import os
 import sys
+import time
 import asyncio
-import websockets
-import json
-import requests
-from functools import partial
+from bisect import bisect_left
 
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableView, QHeaderView,
-    QPushButton, QLabel, QMessageBox, QDialog, QLineEdit, QComboBox
+    QPushButton, QLabel, QMessageBox, QDialog, QLineEdit, QComboBox,
+    QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication, QMenu, QAbstractItemView, QSystemTrayIcon
 )
-from PyQt6.QtGui import QColor
+from PyQt6.QtGui import QColor, QShortcut, QKeySequence
 from PyQt6.QtCore import (
-    Qt, QSettings, QThread, pyqtSignal, QAbstractTableModel, QModelIndex
+    Qt, QSettings, QThread, pyqtSignal, QAbstractTableModel, QModelIndex, QEvent, QRect, QSize, QObject,
+    QTimer, QElapsedTimer, QStandardPaths
 )
 
+from alerts import AlertEngine, load_rules
+from command_client import CommandClient, CommandBatcher, PendingCommands
+from ingest import MessageCoalescer, RelayListener, ConnectionStats, parse_endpoints, DEFAULT_RELAY
+from latency import LatencyTracker
+from stall_watchdog import StallWatchdog
+from sparkline import PnlSparkline
+
+# Recording the history, previewing the ATM rules, backtesting them and the separate ingest process need NumPy;
+# without it they are simply left out.
+try:
+    from history import HistoryRecorder
+except ImportError:
+    HistoryRecorder = None
+try:
+    from atm_rules import RuleInputs, evaluate as evaluate_rules
+except ImportError:
+    RuleInputs = None
+try:
+    from backtest_dialog import BacktestDialog
+except ImportError:
+    BacktestDialog = None
+try:
+    from ingest_process import IngestProcess, SnapshotReader
+except ImportError:
+    IngestProcess = SnapshotReader = None
+
 # ===================================================================
 # 1. Internationalization (i18n) Setup
 # ===================================================================
@@ -25,6 +52,7 @@ translations = {
         "connection_status_connected": "Connected to server",
         "connection_status_disconnected": "Disconnected",
         "connection_status_connecting": "Attempting to connect...",
+        "connection_timing": "handshake {handshake:.0f} ms · reconnects {reconnects} · last outage {downtime:.1f} s",
         "main_chart_symbol": "Main Chart Symbol: {symbol}",
         "total_pl": "Total P/L: ",
         "close_all": "Close All",
@@ -36,6 +64,7 @@ translations = {
         "confirm_close_profits": "Are you sure you want to close all profitable trades?",
         "confirm_close_losses": "Are you sure you want to close all losing trades?",
         "confirm_close_ticket": "Are you sure you want to close trade with ticket {ticket}?",
+        "confirm_close_selected": "Are you sure you want to close the {count} selected trades?",
         "command_error_title": "Connection Error",
         "command_error_message": "Command could not be sent to the server. Please check the server connection and status.",
         "be_fail_title": "Operation Failed",
@@ -51,6 +80,12 @@ translations = {
         "atm_off": "Inactive",
         "action_be": "BE",
         "action_close": "Close",
+        "menu_close_selected": "Close selected ({count})",
+        "menu_be_selected": "Break-even ({count})",
+        "menu_atm_on_selected": "Enable ATM ({count})",
+        "menu_atm_off_selected": "Disable ATM ({count})",
+        "filter_all_symbols": "All Symbols",
+        "symbol_summary": "{count} positions · Buy {buys} / Sell {sells} · Net {net:+.2f} lots · P/L {profit:+.2f} $",
         "settings_title": "Auto-Management Settings",
         "settings_trigger_label_1": "When price reaches",
         "settings_trigger_label_2": "% of target profit:",
@@ -61,6 +96,50 @@ translations = {
         "settings_save": "Save Settings",
         "settings_input_error_title": "Input Error",
         "settings_input_error_message": "Please enter valid numbers.",
+        "latency_overlay_title": "Latency (last {seconds}s) · F12 hide · Ctrl+Shift+L save",
+        "command_latency_title": "Commands, sent → seen in a snapshot (since start)",
+        "stall_title": "UI stalls over {threshold} ms: {count}, {seconds:.1f} s in total",
+        "alert_title": "Alert",
+        "alerts_title": "{count} alerts",
+        "alert_fired": "{subject}: {condition} (now {value}) [{rule}]",
+        "preview_title": "Preview on open positions",
+        "preview_summary": "{managed} managed · {triggered} trigger now · {volume:.2f} lots would close · {be} stops to break-even",
+        "preview_no_numpy": "Install NumPy to preview the rules on the open positions.",
+        "preview_no_positions": "No open positions to preview.",
+        "preview_no_data": "The EA does not send prices and targets yet; update core.mql5 to preview the rules.",
+        "preview_header_trigger": "Trigger at",
+        "preview_header_price": "Current",
+        "preview_header_progress": "% of TP",
+        "preview_header_close": "Close vol.",
+        "preview_header_status": "Status",
+        "preview_status_now": "Triggers now",
+        "preview_status_waiting": "Waiting",
+        "preview_be_yes": "Yes",
+        "preview_be_no": "No",
+        "backtest_open": "Backtest…",
+        "backtest_title": "Backtest Auto-Management Settings",
+        "backtest_trades": "Trades CSV:",
+        "backtest_ticks": "Tick files:",
+        "backtest_browse": "Browse…",
+        "backtest_trigger": "Trigger %:",
+        "backtest_close": "Close %:",
+        "backtest_be_both": "Both",
+        "backtest_be_on": "On",
+        "backtest_be_off": "Off",
+        "backtest_run": "Run",
+        "backtest_cancel": "Cancel",
+        "backtest_use": "Use selected",
+        "backtest_running": "Simulating {settings} settings…",
+        "backtest_summary": "{trades} trades ({skipped} without ticks) in {elapsed:.1f} s · without auto-management: {total:+.2f}, {win:.0%} winners",
+        "backtest_header_trigger": "Trigger %",
+        "backtest_header_close": "Close %",
+        "backtest_header_total": "Total P/L",
+        "backtest_header_mean": "Mean",
+        "backtest_header_p5": "P5",
+        "backtest_header_p50": "Median",
+        "backtest_header_p95": "P95",
+        "backtest_header_win": "Winners",
+        "backtest_header_triggered": "Triggered",
     },
     "fa": {
         "window_title": "داشبورد معاملاتی هیبرید",
@@ -68,6 +147,7 @@ translations = {
         "connection_status_connected": "به سرور متصل است",
         "connection_status_disconnected": "اتصال قطع شده است",
         "connection_status_connecting": "در حال تلاش برای اتصال...",
+        "connection_timing": "دست‌دهی {handshake:.0f} میلی‌ثانیه · اتصال مجدد {reconnects} · آخرین قطعی {downtime:.1f} ثانیه",
         "main_chart_symbol": "نماد اصلی چارت: {symbol}",
         "total_pl": "سود/زیان کل: ",
         "close_all": "بستن همه",
@@ -79,6 +159,7 @@ translations = {
         "confirm_close_profits": "آیا تمام معاملات سودده بسته شوند؟",
         "confirm_close_losses": "آیا تمام معاملات در ضرر بسته شوند؟",
         "confirm_close_ticket": "آیا معامله با تیکت {ticket} بسته شود؟",
+        "confirm_close_selected": "آیا {count} معامله انتخاب‌شده بسته شوند؟",
         "command_error_title": "خطا در ارتباط",
         "command_error_message": "دستور به سرور ارسال نشد. لطفاً اتصال به سرور و وضعیت آن را بررسی کنید.",
         "be_fail_title": "عملیات ناموفق",
@@ -94,6 +175,12 @@ translations = {
         "atm_off": "غیرفعال",
         "action_be": "BE",
         "action_close": "بستن",
+        "menu_close_selected": "بستن انتخاب‌شده‌ها ({count})",
+        "menu_be_selected": "ریسک-فری ({count})",
+        "menu_atm_on_selected": "فعال کردن ATM ({count})",
+        "menu_atm_off_selected": "غیرفعال کردن ATM ({count})",
+        "filter_all_symbols": "همه نمادها",
+        "symbol_summary": "{count} معامله · خرید {buys} / فروش {sells} · خالص {net:+.2f} لات · سود/زیان {profit:+.2f} $",
         "settings_title": "تنظیمات مدیریت خودکار",
         "settings_trigger_label_1": "وقتی قیمت به",
         "settings_trigger_label_2": "٪ از سود هدف رسید:",
@@ -104,6 +191,50 @@ translations = {
         "settings_save": "ذخیره تنظیمات",
         "settings_input_error_title": "خطای ورودی",
         "settings_input_error_message": "لطفاً اعداد معتبر وارد کنید.",
+        "latency_overlay_title": "تأخیر ({seconds} ثانیه اخیر) · F12 بستن · Ctrl+Shift+L ذخیره",
+        "command_latency_title": "دستورات، ارسال ← مشاهده در داده‌ها (از ابتدای اجرا)",
+        "stall_title": "توقف‌های رابط کاربری بیش از {threshold} میلی‌ثانیه: {count}، در مجموع {seconds:.1f} ثانیه",
+        "alert_title": "هشدار",
+        "alerts_title": "{count} هشدار",
+        "alert_fired": "{subject}: {condition} (اکنون {value}) [{rule}]",
+        "preview_title": "پیش‌نمایش روی معاملات باز",
+        "preview_summary": "{managed} تحت مدیریت · {triggered} اکنون فعال می‌شوند · {volume:.2f} لات بسته می‌شود · {be} حد ضرر به نقطه ورود",
+        "preview_no_numpy": "برای پیش‌نمایش قوانین روی معاملات باز، NumPy را نصب کنید.",
+        "preview_no_positions": "معامله بازی برای پیش‌نمایش وجود ندارد.",
+        "preview_no_data": "اکسپرت هنوز قیمت‌ها و اهداف را ارسال نمی‌کند؛ برای پیش‌نمایش، core.mql5 را به‌روزرسانی کنید.",
+        "preview_header_trigger": "قیمت فعال‌سازی",
+        "preview_header_price": "قیمت فعلی",
+        "preview_header_progress": "٪ از هدف",
+        "preview_header_close": "حجم بستن",
+        "preview_header_status": "وضعیت",
+        "preview_status_now": "اکنون فعال می‌شود",
+        "preview_status_waiting": "در انتظار",
+        "preview_be_yes": "بله",
+        "preview_be_no": "خیر",
+        "backtest_open": "بک‌تست…",
+        "backtest_title": "بک‌تست تنظیمات مدیریت خودکار",
+        "backtest_trades": "فایل CSV معاملات:",
+        "backtest_ticks": "فایل‌های تیک:",
+        "backtest_browse": "انتخاب…",
+        "backtest_trigger": "٪ تریگر:",
+        "backtest_close": "٪ بستن:",
+        "backtest_be_both": "هر دو",
+        "backtest_be_on": "فعال",
+        "backtest_be_off": "غیرفعال",
+        "backtest_run": "اجرا",
+        "backtest_cancel": "لغو",
+        "backtest_use": "استفاده از ردیف انتخاب‌شده",
+        "backtest_running": "در حال شبیه‌سازی {settings} تنظیم…",
+        "backtest_summary": "{trades} معامله ({skipped} بدون تیک) در {elapsed:.1f} ثانیه · بدون مدیریت خودکار: {total:+.2f}، {win:.0%} سودده",
+        "backtest_header_trigger": "٪ تریگر",
+        "backtest_header_close": "٪ بستن",
+        "backtest_header_total": "سود/زیان کل",
+        "backtest_header_mean": "میانگین",
+        "backtest_header_p5": "صدک ۵",
+        "backtest_header_p50": "میانه",
+        "backtest_header_p95": "صدک ۹۵",
+        "backtest_header_win": "سودده",
+        "backtest_header_triggered": "فعال‌شده",
     }
 }
 
@@ -122,14 +253,71 @@ class Translator:
 # ===================================================================
 # 2. Model/View Architecture for better table management
 # ===================================================================
+class SymbolStats:
+    """ Running per-symbol aggregates, updated as positions open, change and close. """
+    __slots__ = ("count", "buys", "sells", "buy_volume", "sell_volume", "profit")
+
+    def __init__(self):
+        self.count = self.buys = self.sells = 0
+        self.buy_volume = self.sell_volume = self.profit = 0.0
+
+    def add(self, trade, sign=1):
+        self.count += sign
+        self.profit += sign * trade.profit
+        if trade.type == "Buy":
+            self.buys += sign
+            self.buy_volume += sign * trade.volume
+        else:
+            self.sells += sign
+            self.sell_volume += sign * trade.volume
+
+    @property
+    def net_volume(self):
+        return self.buy_volume - self.sell_volume
+
+
 class TradeTableModel(QAbstractTableModel):
     """
     Data model for displaying trades in a QTableView.
     This class is responsible for managing the data and notifying the view to update.
+    Rows hold TradeRecords decoded on the network thread, keyed by (source, ticket) so several
+    relays can share one table, and each snapshot is applied as a diff instead of a full reset.
+
+    Sorting and the symbol filter are maintained incrementally instead of through a
+    QSortFilterProxyModel: visible rows are kept in a list ordered by (sort value, arrival),
+    so a row is located with a binary search and a changed value moves just that row.
+    Per-symbol aggregates are updated from the same diff.
     """
+    KeyRole = Qt.ItemDataRole.UserRole + 1
+    AtmEnabledRole = Qt.ItemDataRole.UserRole + 2
+    PendingRole = Qt.ItemDataRole.UserRole + 3
+
+    PROFIT_COLOR = QColor("#16a34a")
+    LOSS_COLOR = QColor("#dc2626")
+
+    # Trade fields that are rendered, mapped to the column that shows them.
+    FIELD_COLUMNS = (("ticket", 0), ("symbol", 1), ("type", 2), ("volume", 3), ("profit", 4), ("atm_enabled", 5))
+    SORT_FIELDS = {col: field for field, col in FIELD_COLUMNS}
+
+    symbols_changed = pyqtSignal()
+    aggregates_changed = pyqtSignal()
+
     def __init__(self, translator, parent=None):
         super().__init__(parent)
-        self.trades = []
+        self.trades = []            # visible rows, ascending by sort key
+        self.keys = []              # sort key of each entry in self.trades
+        self.all_trades = {}        # key -> TradeRecord, including filtered-out rows
+        self.arrival = {}           # key -> arrival sequence, the default order and tie-breaker
+        self.next_arrival = 0
+        self.by_source = {}         # source -> set of keys
+        self.by_symbol = {}         # symbol -> set of keys
+        self.symbol_stats = {}      # symbol -> SymbolStats
+        self.sort_field = None
+        self.descending = False
+        self.symbol_filter = None
+        self.pending = None         # PendingCommands, for the overlay on rows with commands in flight
+        self.confirmed = {}         # key -> the relay's own record of a row that shows an optimistic ATM state
+        self.alerts = None          # AlertEngine, told about every profit change while it has rules
         self.translator = translator
         self.headers = []
         self.update_headers()
@@ -155,21 +343,30 @@ class TradeTableModel(QAbstractTableModel):
             return None
 
         col = index.column()
-        trade = self.trades[index.row()]
+        trade = self.get_trade_at_row(index.row())
 
         if role == Qt.ItemDataRole.DisplayRole:
-            if col == 0: return str(trade.get('ticket', ''))
-            if col == 1: return trade.get('symbol', '')
-            if col == 2: return trade.get('type', '')
-            if col == 3: return f"{trade.get('volume', 0.0):.2f}"
-            if col == 4: return f"{trade.get('profit', 0.0):+.2f} $"
+            if col == 0: return trade.ticket_text
+            if col == 1: return trade.symbol
+            if col == 2: return trade.type
+            if col == 3: return trade.volume_text
+            if col == 4: return trade.profit_text
         
         elif role == Qt.ItemDataRole.ForegroundRole and col == 4:
-            return QColor("#16a34a") if trade.get('profit', 0) >= 0 else QColor("#dc2626")
+            return self.PROFIT_COLOR if trade.profit >= 0 else self.LOSS_COLOR
             
         elif role == Qt.ItemDataRole.TextAlignmentRole:
             return Qt.AlignmentFlag.AlignCenter
 
+        elif role == self.KeyRole:
+            return trade.key
+
+        elif role == self.AtmEnabledRole:
+            return trade.atm_enabled
+
+        elif role == self.PendingRole:
+            return self.pending.blocked(trade.key) if self.pending else ()
+
         return None
 
     def headerData(self, section, orientation, role):
@@ -177,14 +374,376 @@ class TradeTableModel(QAbstractTableModel):
             return self.headers[section]
         return None
 
-    def update_trades(self, new_trades):
-        """ This method updates the model with new data and notifies the view. """
+    # --- Ordering helpers ---------------------------------------------
+    def key_of(self, trade):
+        arrival = self.arrival[trade.key]
+        if self.sort_field is None:
+            return (arrival,)
+        return (getattr(trade, self.sort_field), arrival)
+
+    def visible_row(self, pos, count=None):
+        """ Maps a position in the ascending list to a view row (count = list length to map against). """
+        if not self.descending:
+            return pos
+        return (len(self.trades) if count is None else count) - 1 - pos
+
+    def is_visible(self, trade):
+        return self.symbol_filter is None or trade.symbol == self.symbol_filter
+
+    def row_for_key(self, key):
+        trade = self.all_trades.get(key)
+        if trade is None or not self.is_visible(trade):
+            return None
+        return self.visible_row(bisect_left(self.keys, self.key_of(trade)))
+
+    def rebuild(self):
+        """ Recomputes the visible rows from scratch (sort or filter changed). """
+        self.beginResetModel()
+        if self.symbol_filter is None:
+            visible = self.all_trades.values()
+        else:
+            visible = [self.all_trades[key] for key in self.by_symbol.get(self.symbol_filter, ())]
+        pairs = sorted((self.key_of(trade), trade) for trade in visible) if visible else []
+        self.keys = [key for key, _ in pairs]
+        self.trades = [trade for _, trade in pairs]
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
         self.layoutAboutToBeChanged.emit()
-        self.trades = new_trades
+        persistent = self.persistentIndexList()
+        keys = [self.get_trade_at_row(index.row()).key for index in persistent]
+        self.sort_field = self.SORT_FIELDS.get(column)
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        pairs = sorted(zip(map(self.key_of, self.trades), self.trades))
+        self.keys = [key for key, _ in pairs]
+        self.trades = [trade for _, trade in pairs]
+        # Keep selection and current index on the same positions
+        self.changePersistentIndexList(persistent, [
+            self.index(self.row_for_key(key), index.column()) for key, index in zip(keys, persistent)])
         self.layoutChanged.emit()
 
+    def set_symbol_filter(self, symbol):
+        if symbol != self.symbol_filter:
+            self.symbol_filter = symbol
+            self.rebuild()
+
+    # --- Incremental updates ------------------------------------------
+    def update_trades(self, new_trades, source=""):
+        """
+        Applies a new snapshot from one source as a diff against that source's current rows.
+        Closed tickets are removed, new tickets are inserted at their sorted position and only
+        the cells whose values changed are reported (moving the row if its sort value changed),
+        so the view keeps its selection and scroll position. Other sources are untouched.
+        """
+        incoming = {trade.key: trade for trade in new_trades}
+        self.apply_changes(incoming.values(), self.by_source.get(source, set()) - incoming.keys())
+
+    def apply_changes(self, changed, closed=()):
+        """
+        Applies a diff that was already computed elsewhere (the ingest process): changed holds the
+        new or changed TradeRecords, closed the keys of positions that are gone.
+        """
+        symbols_before = len(self.by_symbol)
+
+        for key in closed:
+            self._remove(self.all_trades[key])
+
+        if self.confirmed:
+            for trade in changed:
+                self.confirmed.pop(trade.key, None)  # The relay's record replaces the optimistic one
+
+        opened = []
+        all_trades = self.all_trades
+        for trade in changed:
+            old = all_trades.get(trade.key)
+            if old is None:
+                opened.append(trade)
+            elif old is not trade:
+                self._replace(old, trade)
+
+        if opened:
+            # A bulk load (e.g. the first snapshot) is cheaper as one reset than thousands of inserts
+            bulk = len(opened) > len(self.trades)
+            for trade in opened:
+                self._insert(trade, notify=not bulk)
+            if bulk:
+                self.rebuild()
+
+        if len(self.by_symbol) != symbols_before or opened:
+            self.symbols_changed.emit()
+        self.aggregates_changed.emit()
+
+    def _insert(self, trade, notify=True):
+        key = trade.key
+        self.all_trades[key] = trade
+        self.arrival[key] = self.next_arrival
+        self.next_arrival += 1
+        self.by_source.setdefault(trade.source, set()).add(key)
+        self.by_symbol.setdefault(trade.symbol, set()).add(key)
+        self.symbol_stats.setdefault(trade.symbol, SymbolStats()).add(trade)
+        if self.alerts is not None:
+            self.alerts.ticket(key, trade.symbol, None, trade.profit)
+        if notify and self.is_visible(trade):
+            key = self.key_of(trade)
+            pos = bisect_left(self.keys, key)
+            row = self.visible_row(pos, len(self.trades) + 1)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.keys.insert(pos, key)
+            self.trades.insert(pos, trade)
+            self.endInsertRows()
+
+    def _remove(self, trade):
+        key = trade.key
+        if self.is_visible(trade):
+            pos = bisect_left(self.keys, self.key_of(trade))
+            row = self.visible_row(pos)
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.keys[pos]
+            del self.trades[pos]
+            self.endRemoveRows()
+        del self.all_trades[key]
+        del self.arrival[key]
+        self.confirmed.pop(key, None)
+        self.by_source[trade.source].discard(key)
+        keys = self.by_symbol[trade.symbol]
+        keys.discard(key)
+        stats = self.symbol_stats[trade.symbol]
+        stats.add(trade, -1)
+        if self.alerts is not None:
+            self.alerts.ticket(key, trade.symbol, trade.profit, None)
+        if not keys:
+            del self.by_symbol[trade.symbol]
+            del self.symbol_stats[trade.symbol]
+
+    def _replace(self, old, new):
+        changed_cols = [col for field, col in self.FIELD_COLUMNS if getattr(old, field) != getattr(new, field)]
+        self.all_trades[new.key] = new
+        stats = self.symbol_stats[old.symbol]
+        stats.add(old, -1)
+        stats.add(new)
+        if self.alerts is not None and old.profit != new.profit:
+            self.alerts.ticket(new.key, new.symbol, old.profit, new.profit)
+        if not changed_cols or not self.is_visible(new):
+            return
+        old_key = self.key_of(old)
+        pos = bisect_left(self.keys, old_key)
+        new_key = self.key_of(new)
+        if new_key != old_key:
+            del self.keys[pos]
+            del self.trades[pos]
+            new_pos = bisect_left(self.keys, new_key)
+            if new_pos != pos:
+                src = self.visible_row(pos, len(self.trades) + 1)
+                dst = self.visible_row(new_pos, len(self.trades) + 1)
+                self.beginMoveRows(QModelIndex(), src, src, QModelIndex(), dst + 1 if dst > src else dst)
+                self.keys.insert(new_pos, new_key)
+                self.trades.insert(new_pos, new)
+                self.endMoveRows()
+                pos = new_pos
+            else:
+                self.keys.insert(pos, new_key)
+                self.trades.insert(pos, new)
+        else:
+            self.trades[pos] = new
+        row = self.visible_row(pos)
+        self.dataChanged.emit(self.index(row, min(changed_cols)), self.index(row, max(changed_cols)))
+
     def get_trade_at_row(self, row):
-        return self.trades[row] if 0 <= row < len(self.trades) else None
+        if not 0 <= row < len(self.trades):
+            return None
+        return self.trades[len(self.trades) - 1 - row if self.descending else row]
+
+    def get_trade(self, key):
+        return self.all_trades.get(key)
+
+    def confirmed_trade(self, key):
+        """ The row as the relay last reported it, without the optimistic ATM state. """
+        return self.confirmed.get(key) or self.all_trades.get(key)
+
+    def trades_of(self, source):
+        all_trades = self.all_trades
+        return [all_trades[key] for key in self.by_source.get(source, ())]
+
+    def set_atm_enabled(self, key, state):
+        """
+        Optimistically reflects an ATM toggle until a snapshot confirms it. The relay's record is
+        kept aside meanwhile, since the ingest process only sends rows that changed on the EA's side.
+        """
+        trade = self.all_trades.get(key)
+        if trade is None or trade.atm_enabled == state:
+            return
+        reported = self.confirmed.get(key, trade)
+        if reported.atm_enabled == state:
+            del self.confirmed[key]
+            self._replace(trade, reported)
+        else:
+            self.confirmed[key] = reported
+            self._replace(trade, trade.replace(atm_enabled=state))
+
+    def resolve_pending(self, source):
+        """
+        Resolves the pending commands of one source against what its relay reported, drops the
+        expired ones and keeps the unconfirmed ATM toggles on screen.
+        """
+        pending = self.pending
+        changed = pending.observe(source, lambda ticket: self.confirmed_trade((source, ticket)))
+        changed += self.expire_pending(refresh=False)
+        for key, state in pending.pending_atm(source):
+            self.set_atm_enabled(key, state)
+        self.refresh_keys(changed)
+
+    def expire_pending(self, refresh=True):
+        """ Drops the commands that were never confirmed, with their optimistic ATM state. Returns their keys. """
+        keys = []
+        for key, entry in self.pending.expire():
+            if entry.action == "toggle_atm_trade":
+                self.set_atm_enabled(key, not entry.target)
+            keys.append(key)
+        if refresh:
+            self.refresh_keys(keys)
+        return keys
+
+    def refresh_keys(self, keys):
+        """ Repaints the button columns of these rows, e.g. when their pending state changed. """
+        for key in set(keys):
+            row = self.row_for_key(key)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, 5), self.index(row, 6))
+
+    def stats_for(self, symbol=None):
+        """ Aggregates for one symbol, or for all positions when symbol is None. """
+        if symbol is not None:
+            return self.symbol_stats.get(symbol) or SymbolStats()
+        total = SymbolStats()
+        for stats in self.symbol_stats.values():
+            for field in SymbolStats.__slots__:
+                setattr(total, field, getattr(total, field) + getattr(stats, field))
+        return total
+
+
+class TradeTableView(QTableView):
+    """ QTableView that can report when a paint of its viewport has finished. """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.paint_hook = None
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.paint_hook is not None:
+            self.paint_hook()
+
+
+class ActionButtonDelegate(QStyledItemDelegate):
+    """
+    Paints the ATM toggle (column 5) and the BE/Close buttons (column 6) directly,
+    instead of attaching real widgets to every row. Clicks are hit-tested in editorEvent.
+    A single hidden prototype button per style is used so the .qss theme still applies.
+    Buttons whose command is still waiting for confirmation are drawn disabled and ignore clicks.
+    """
+    ATM_COLUMN = 5
+    ACTIONS_COLUMN = 6
+    SPACING = 6
+    ACTIONS = {"atm": "toggle_atm_trade", "be": "breakeven", "close": "close"}
+
+    button_clicked = pyqtSignal(str, object)  # (button name, (source, ticket))
+
+    def __init__(self, translator, parent):
+        super().__init__(parent)
+        self.translator = translator
+        self.hovered = None  # (row, button name)
+        self.prototypes = {}
+        for name in ("AtmOn", "AtmOff", "BEBtn", "CloseBtn"):
+            button = QPushButton(parent)
+            button.setObjectName(name)
+            button.hide()
+            self.prototypes[name] = button
+
+    def buttons_for(self, index):
+        """ Returns (name, text, style, enabled) for each button drawn in the cell. """
+        if index.column() == self.ATM_COLUMN:
+            if index.data(TradeTableModel.AtmEnabledRole):
+                buttons = [("atm", self.translator.tr("atm_on"), "AtmOn")]
+            else:
+                buttons = [("atm", self.translator.tr("atm_off"), "AtmOff")]
+        elif index.column() == self.ACTIONS_COLUMN:
+            buttons = [("be", self.translator.tr("action_be"), "BEBtn"),
+                       ("close", self.translator.tr("action_close"), "CloseBtn")]
+        else:
+            return []
+        blocked = index.data(TradeTableModel.PendingRole)
+        if not blocked:
+            return [(name, text, style_name, True) for name, text, style_name in buttons]
+        return [(name, f"{text} …", style_name, False) if self.ACTIONS[name] in blocked else (name, text, style_name, True)
+                for name, text, style_name in buttons]
+
+    def button_rects(self, option, buttons):
+        """ Lays the buttons out centered in the cell rect, sized by the themed prototypes. """
+        height = option.rect.height() - 4
+        widths = []
+        for _, text, style_name, _ in buttons:
+            prototype = self.prototypes[style_name]
+            prototype.ensurePolished()
+            fm = prototype.fontMetrics()
+            button_option = QStyleOptionButton()
+            button_option.initFrom(prototype)
+            button_option.text = text
+            size = prototype.style().sizeFromContents(
+                QStyle.ContentsType.CT_PushButton, button_option, QSize(fm.horizontalAdvance(text), fm.height()), prototype)
+            widths.append(size.width())
+            height = min(height, size.height())
+        x = option.rect.x() + (option.rect.width() - sum(widths) - self.SPACING * (len(widths) - 1)) // 2
+        y = option.rect.y() + (option.rect.height() - height) // 2
+        rects = []
+        for width in widths:
+            rects.append(QRect(x, y, width, height))
+            x += width + self.SPACING
+        return rects
+
+    def paint(self, painter, option, index):
+        buttons = self.buttons_for(index)
+        if not buttons:
+            return super().paint(painter, option, index)
+        self.initStyleOption(option, index)
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_PanelItemViewItem, option, painter, option.widget)
+        for (name, text, style_name, enabled), rect in zip(buttons, self.button_rects(option, buttons)):
+            prototype = self.prototypes[style_name]
+            button_option = QStyleOptionButton()
+            button_option.initFrom(prototype)
+            button_option.rect = rect
+            button_option.text = text
+            if not enabled:
+                button_option.state = QStyle.StateFlag.State_Raised
+                button_option.palette.setCurrentColorGroup(button_option.palette.ColorGroup.Disabled)
+            else:
+                button_option.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+            if enabled and self.hovered == (index.row(), name):
+                button_option.state |= QStyle.StateFlag.State_MouseOver
+            prototype.style().drawControl(QStyle.ControlElement.CE_PushButton, button_option, painter, prototype)
+
+    def editorEvent(self, event, model, option, index):
+        buttons = self.buttons_for(index)
+        if not buttons or event.type() not in (QEvent.Type.MouseMove, QEvent.Type.MouseButtonPress, QEvent.Type.MouseButtonRelease):
+            return super().editorEvent(event, model, option, index)
+        hit = None
+        enabled = False
+        pos = event.position().toPoint()
+        for (name, _, _, enabled), rect in zip(buttons, self.button_rects(option, buttons)):
+            if rect.contains(pos):
+                hit = name
+                break
+        if event.type() == QEvent.Type.MouseMove:
+            hovered = (index.row(), hit) if hit and enabled else None
+            if hovered != self.hovered:
+                self.hovered = hovered
+                option.widget.viewport().update()
+            return False
+        if hit and event.button() == Qt.MouseButton.LeftButton:
+            # Swallow the press as well so clicking a button doesn't select the cell
+            if event.type() == QEvent.Type.MouseButtonRelease and enabled:
+                self.button_clicked.emit(hit, index.data(TradeTableModel.KeyRole))
+            return True
+        return False
 
 # ===================================================================
 # Other application classes and logic
@@ -199,12 +758,91 @@ def _load_stylesheet(filename):
         print(f"Warning: Stylesheet file not found: {filename}")
         return ""
 
+class RulePreviewModel(QAbstractTableModel):
+    """
+    Rows of an atm_rules preview, straight from its NumPy arrays. Only the eligible positions are
+    listed (the ones that would trigger first); cells are formatted when the view asks for them,
+    so a new preview on every keystroke costs one model reset no matter how many positions are open.
+    """
+    HEADERS = ("table_header_ticket", "table_header_type", "table_header_volume", "preview_header_trigger",
+               "preview_header_price", "preview_header_progress", "preview_header_close", "action_be",
+               "preview_header_status")
+
+    def __init__(self, inputs, translator, parent=None):
+        super().__init__(parent)
+        self.inputs = inputs
+        self.translator = translator
+        self.preview = None
+
+    def set_preview(self, preview):
+        self.beginResetModel()
+        self.preview = preview
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.preview.order) if self.preview is not None else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self.preview.order[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            inputs, preview, tr = self.inputs, self.preview, self.translator.tr
+            digits = inputs.price_digits[i]
+            if col == 0: return str(inputs.ticket[i])
+            if col == 1: return "Buy" if inputs.is_buy[i] else "Sell"
+            if col == 2: return f"{inputs.volume[i]:.2f}"
+            if col == 3: return f"{preview.trigger_price[i]:.{digits}f}"
+            if col == 4: return f"{inputs.price[i]:.{digits}f}"
+            if col == 5: return f"{preview.progress[i]:.0f}%"
+            if col == 6: return f"{preview.close_volume[i]:.2f}" if preview.closes[i] else "—"
+            if col == 7: return tr("preview_be_yes") if preview.moves_to_be[i] else tr("preview_be_no")
+            if col == 8: return tr("preview_status_now") if preview.triggered[i] else tr("preview_status_waiting")
+        elif role == Qt.ItemDataRole.ForegroundRole and col == 8 and self.preview.triggered[i]:
+            return TradeTableModel.PROFIT_COLOR
+        elif role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.translator.tr(self.HEADERS[section])
+        return None
+
+    def retranslate(self):
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(self.HEADERS) - 1)
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, len(self.HEADERS) - 1))
+
+
 class SettingsDialog(QDialog):
-    def __init__(self, current_settings, translator, parent=None):
+    def __init__(self, current_settings, translator, parent=None, trades=(), source_data=None):
         super().__init__(parent)
         self.translator = translator
-        self.setFixedSize(500, 200)
-        
+
+        # Live preview of the rules on the open positions, re-evaluated on every keystroke
+        self.preview_inputs = RuleInputs(trades, source_data or {}) if RuleInputs is not None else None
+        self.preview_title = QLabel(objectName="PreviewTitle")
+        self.preview_label = QLabel()
+        self.preview_label.setWordWrap(True)
+        self.preview_model = None
+        self.preview_table = None
+        if self.preview_inputs is not None and self.preview_inputs.has_prices:
+            self.preview_model = RulePreviewModel(self.preview_inputs, translator, self)
+            self.preview_table = QTableView()
+            self.preview_table.setModel(self.preview_model)
+            self.preview_table.verticalHeader().setVisible(False)
+            self.preview_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+            self.preview_table.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+            self.setMinimumSize(500, 200)
+            self.resize(820, 520)
+        else:
+            self.setFixedSize(500, 240)
+
         self.trigger_label_1 = QLabel()
         self.trigger_edit = QLineEdit(str(current_settings.get("triggerPercent", 40.0)))
         self.trigger_label_2 = QLabel()
@@ -233,19 +871,56 @@ class SettingsDialog(QDialog):
         partial_layout.addWidget(self.partial_edit)
         partial_layout.addWidget(self.partial_label_2)
         
+        self.backtest_button = QPushButton()
+        self.backtest_button.clicked.connect(self.open_backtest)
+        self.backtest_button.setVisible(BacktestDialog is not None)
+
         be_layout = QHBoxLayout()
         be_layout.addWidget(self.be_button)
         be_layout.addStretch()
+        be_layout.addWidget(self.backtest_button)
         
         layout.addLayout(trigger_layout)
         layout.addLayout(partial_layout)
         layout.addLayout(be_layout)
-        layout.addStretch()
+        layout.addWidget(self.preview_title)
+        layout.addWidget(self.preview_label)
+        if self.preview_table is not None:
+            layout.addWidget(self.preview_table, 1)
+        else:
+            layout.addStretch()
         layout.addWidget(self.save_button)
 
+        self.trigger_edit.textChanged.connect(self.update_preview)
+        self.partial_edit.textChanged.connect(self.update_preview)
+        self.be_button.toggled.connect(self.update_preview)
+
         self.retranslate_ui()
         self.apply_theme(parent.is_light_theme())
 
+    def update_preview(self):
+        """ Evaluates the rules as typed against the open positions, exactly as the EA would now. """
+        tr = self.translator.tr
+        if self.preview_inputs is None:
+            self.preview_label.setText(tr("preview_no_numpy"))
+            return
+        if not len(self.preview_inputs):
+            self.preview_label.setText(tr("preview_no_positions"))
+            return
+        if self.preview_model is None:
+            self.preview_label.setText(tr("preview_no_data"))
+            return
+        try:
+            trigger = float(self.trigger_edit.text() or 0)
+            partial = float(self.partial_edit.text() or 0)
+        except ValueError:
+            self.preview_label.setText(tr("settings_input_error_message"))
+            return
+        preview = evaluate_rules(self.preview_inputs, trigger, partial, self.be_button.isChecked())
+        self.preview_model.set_preview(preview)
+        self.preview_label.setText(tr(
+            "preview_summary", managed=preview.managed_count, triggered=preview.triggered_count,
+            volume=preview.closing_volume, be=preview.be_count))
 
     def retranslate_ui(self):
         self.setWindowTitle(self.translator.tr("settings_title"))
@@ -254,7 +929,22 @@ class SettingsDialog(QDialog):
         self.partial_label_1.setText(self.translator.tr("settings_partial_label_1"))
         self.partial_label_2.setText(self.translator.tr("settings_partial_label_2"))
         self.save_button.setText(self.translator.tr("settings_save"))
+        self.preview_title.setText(self.translator.tr("preview_title"))
+        self.backtest_button.setText(self.translator.tr("backtest_open"))
+        if self.preview_model is not None:
+            self.preview_model.retranslate()
         self.update_be_button_style()
+        self.update_preview()
+
+    def open_backtest(self):
+        """ Sweeps the settings over recorded trades; the chosen row fills in the fields. """
+        dialog = BacktestDialog(self.translator, self.parent().settings, self)
+        if dialog.exec() and dialog.selected_setting:
+            chosen = dialog.selected_setting
+            self.trigger_edit.setText(f"{chosen['triggerPercent']:g}")
+            self.partial_edit.setText(f"{chosen['closePercent']:g}")
+            self.be_button.setChecked(chosen["moveToBE"])
+            self.update_be_button_style()
 
     def update_be_button_style(self):
         is_light = self.parent().is_light_theme()
@@ -279,59 +969,125 @@ class SettingsDialog(QDialog):
         self.update_be_button_style()
 
 class WebSocketThread(QThread):
-    message_received = pyqtSignal(dict)
-    connection_status_changed = pyqtSignal(str)
+    """ Runs the RelayListener's asyncio loop off the GUI thread and wakes the UI when frames are waiting. """
+    messages_pending = pyqtSignal()
+    connection_status_changed = pyqtSignal(str, str)  # (source, status)
     
-    def __init__(self):
+    def __init__(self, coalescer, endpoints, latency=None):
         super().__init__()
+        self.coalescer = coalescer
+        self.listener = RelayListener(endpoints, self.on_message, self.connection_status_changed.emit, latency)
+
+    @property
+    def stats(self):
+        return self.listener.stats
+
+    def on_message(self, message):
+        # Only wake the UI once per frame; later messages are merged into the buffer
+        if self.coalescer.push(message):
+            self.messages_pending.emit()
+
+    def run(self):
+        asyncio.run(self.listener.run())
+
+    def stop(self):
+        """ Cancels the listeners and closes their sockets; the thread finishes right after. """
+        self.listener.stop()
+
+
+class IngestProcessThread(QThread):
+    """
+    Stand-in for WebSocketThread when the relays are read by a separate ingest process: trade_data
+    arrives through shared memory (SnapshotReader, polled on the render tick), and this thread only
+    waits for the process's other events: segments to map, connection status and control messages.
+    A process that dies is restarted after a second.
+    """
+    messages_pending = pyqtSignal()
+    connection_status_changed = pyqtSignal(str, str)  # (source, status)
+    RESTART_DELAY = 1.0
+
+    def __init__(self, coalescer, endpoints):
+        super().__init__()
+        self.coalescer = coalescer
+        self.endpoints = endpoints
+        self.process = IngestProcess(endpoints)
+        self.stats = {endpoint.name: ConnectionStats() for endpoint in endpoints}
         self.running = True
 
-    async def listen(self):
-        uri = "ws://127.0.0.1:5000"
-        while self.running:
-            try:
-                self.connection_status_changed.emit("connecting")
-                async with websockets.connect(uri) as websocket:
-                    self.connection_status_changed.emit("connected")
-                    while self.running:
-                        message = await websocket.recv()
-                        self.message_received.emit(json.loads(message))
-            except Exception as e:
-                self.connection_status_changed.emit("disconnected")
-                if self.running:
-                    await asyncio.sleep(3)
+    def push(self, message):
+        if self.coalescer.push(message):
+            self.messages_pending.emit()
 
     def run(self):
-        asyncio.run(self.listen())
+        while self.running:
+            self.process.start()
+            for event in self.process.events():
+                kind = event[0]
+                if kind == "status":
+                    _, source, status, stats = event
+                    for field, value in stats.items():
+                        setattr(self.stats[source], field, value)
+                    self.connection_status_changed.emit(source, status)
+                elif kind == "segment":
+                    self.push({"type": "ingest_segment", "source": event[1], "name": event[2]})
+                elif kind == "message":
+                    self.push(event[1])
+            if self.running:
+                process = self.process.process
+                self.process.stop()
+                print(f"[Ingest] ❌ Ingest process exited (code {process.exitcode}), restarting")
+                for endpoint in self.endpoints:
+                    self.connection_status_changed.emit(endpoint.name, "disconnected")
+                self.msleep(int(self.RESTART_DELAY * 1000))
 
     def stop(self):
+        """ Stops the ingest process; run() returns once its pipe closes. """
         self.running = False
-        # A small delay to allow the listen loop to exit
-        self.msleep(100) 
+        self.process.stop()
 
 
-def send_command(payload):
-    """ Sends a command to the server and returns the success status. """
-    API_URL = "http://127.0.0.1:5000/command"
-    try:
-        print(f"[API Client] 📤 Sending command: {payload}")
-        response = requests.post(API_URL, json=payload, timeout=2)
-        if response.status_code == 200:
-            return True
-        else:
-            print(f"[API Client] ❌ Error sending command: {response.text}")
-            return False
-    except Exception as e:
-        print(f"[API Client] ❌ Server connection error while sending command: {e}")
-        return False
+class CommandDispatcher(QObject):
+    """
+    Qt front-end for CommandClient.
+    Results arrive on the client's worker thread and are re-emitted as a signal,
+    so callbacks (error dialogs, reverting optimistic state) always run on the GUI thread.
+    """
+    command_finished = pyqtSignal(object, object, bool)  # (payload, callback, success)
+
+    def __init__(self, client, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.command_finished.connect(self._on_finished)
+
+    def send(self, payload, callback=None, url=None):
+        future = self.client.submit(payload, url)
+        future.add_done_callback(lambda f: self.command_finished.emit(payload, callback, f.result()))
+        return future
+
+    def _on_finished(self, payload, callback, success):
+        if callback:
+            callback(success)
+
+    def close(self):
+        self.client.close()
+
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, relays=None, latency=None, ingest_process=None, settings=None):
         super().__init__()
-        self.settings = QSettings("GeminiTrader", "HybridPanel")
+        # settings: a QSettings to use instead of the user's, e.g. a temporary one for benchmarks
+        self.settings = settings if settings is not None else QSettings("GeminiTrader", "HybridPanel")
         self.translator = Translator(self.settings)
         self.current_settings = {}
         self.setGeometry(100, 100, 950, 600)
+
+        # Relays to watch, e.g. "Live=127.0.0.1:5000, Demo=127.0.0.1:5001"
+        if not relays:
+            relays = self.settings.value("relays", DEFAULT_RELAY)
+            relays = [relays] if isinstance(relays, str) else relays
+        self.endpoints = {endpoint.name: endpoint for endpoint in parse_endpoints(relays or [])}
+        self.source_status = {name: "connecting" for name in self.endpoints}
+        self.source_data = {}
         
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -344,22 +1100,172 @@ class MainWindow(QMainWindow):
         self.trade_model = TradeTableModel(self.translator)
         self.trade_table = self.create_trade_table()
         self.trade_table.setModel(self.trade_model)
+        # The model keeps its own sorted index; start in arrival order
+        self.trade_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.trade_table.setSortingEnabled(True)
+        self.trade_model.symbols_changed.connect(self.refresh_symbol_filter)
+        self.trade_model.aggregates_changed.connect(self.update_group_summary)
+        self.button_delegate = ActionButtonDelegate(self.translator, self.trade_table)
+        self.button_delegate.button_clicked.connect(self.handle_row_button)
+        self.trade_table.setItemDelegateForColumn(ActionButtonDelegate.ATM_COLUMN, self.button_delegate)
+        self.trade_table.setItemDelegateForColumn(ActionButtonDelegate.ACTIONS_COLUMN, self.button_delegate)
         main_layout.addWidget(self.trade_table)
         
         main_layout.addWidget(self.create_footer())
         
-        self.ws_thread = WebSocketThread()
-        self.ws_thread.message_received.connect(self.handle_message)
+        self.commands = CommandDispatcher(CommandClient(), self)
+        # Ticket commands are collected briefly and sent as one batch per relay
+        self.batcher = CommandBatcher()
+        self.batch_timer = QTimer(self)
+        self.batch_timer.setSingleShot(True)
+        self.batch_timer.setInterval(self.settings.value("batch_window_ms", 300, type=int))
+        self.batch_timer.timeout.connect(self.flush_commands)
+        # Sent ticket commands stay pending until a snapshot shows their effect (or command_timeout_s passes)
+        self.pending_commands = PendingCommands(self.settings.value("command_timeout_s", 30.0, type=float))
+        self.trade_model.pending = self.pending_commands
+        # ... and time out on their own when a relay goes quiet, not only when the next snapshot arrives
+        self.expire_timer = QTimer(self)
+        self.expire_timer.setInterval(1000)
+        self.expire_timer.timeout.connect(self.expire_pending_commands)
+        self.expire_timer.start()
+
+        # Frames are coalesced and rendered at most render_hz times per second
+        render_hz = min(max(self.settings.value("render_hz", 20, type=int), 1), 60)
+        self.render_interval_ms = 1000 // render_hz
+        self.render_clock = QElapsedTimer()
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self.render_pending)
+        self.coalescer = MessageCoalescer()
+
+        # Per-stage latency instrumentation (F12 toggles it with its overlay, Ctrl+Shift+L saves a report)
+        if latency is None:
+            latency = self.settings.value("latency_overlay", False, type=bool)
+        self.latency = LatencyTracker()
+        self.latency_overlay = QLabel(self.trade_table.viewport(), objectName="LatencyOverlay")
+        self.latency_overlay.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 170); color: #e0e0e0; font-family: monospace; padding: 6px;")
+        self.latency_overlay.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.latency_overlay.hide()
+        self.latency_timer = QTimer(self)
+        self.latency_timer.setInterval(500)
+        self.latency_timer.timeout.connect(self.refresh_latency_overlay)
+        QShortcut(QKeySequence("F12"), self, activated=self.toggle_latency_overlay)
+        QShortcut(QKeySequence("Ctrl+Shift+L"), self, activated=self.dump_latency)
+
+        self.history = self.create_history_recorder()
+
+        # Threshold alerts from alert_rules_path, fired into a tray notification and an audit log
+        self.alerts = self.create_alert_engine()
+        self.tray_icon = None
+        if self.alerts:
+            self.trade_model.alerts = self.alerts
+            if QSystemTrayIcon.isSystemTrayAvailable():
+                self.tray_icon = QSystemTrayIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MessageBoxWarning), self)
+                self.tray_icon.show()
+            if any(rule.debounce for rule in self.alerts.rules):
+                self.alert_timer = QTimer(self)
+                self.alert_timer.setInterval(250)
+                self.alert_timer.timeout.connect(self.tick_alerts)
+                self.alert_timer.start()
+
+        # Stalls of the event loop longer than stall_threshold_ms are logged with the stack that caused them (0 = off)
+        self.watchdog = None
+        stall_threshold_ms = self.settings.value("stall_threshold_ms", 500, type=int)
+        if stall_threshold_ms > 0:
+            self.watchdog = StallWatchdog(stall_threshold_ms / 1000, on_stall=self.log_stall)
+            self.heartbeat_timer = QTimer(self)
+            self.heartbeat_timer.setInterval(int(self.watchdog.interval * 1000))
+            self.heartbeat_timer.timeout.connect(self.watchdog.beat)
+            self.heartbeat_timer.start()
+            self.watchdog.start()
+
+        # Optionally the relays are read, decoded and diffed in a separate process (ingest_process setting)
+        if ingest_process is None:
+            ingest_process = self.settings.value("ingest_process", False, type=bool)
+        if ingest_process and IngestProcess is None:
+            print("[Ingest] ⚠️ The ingest process needs NumPy; reading the relays in-process")
+        self.snapshot_reader = None
+        if ingest_process and IngestProcess is not None:
+            self.snapshot_reader = SnapshotReader()
+            self.ws_thread = IngestProcessThread(self.coalescer, list(self.endpoints.values()))
+            # Shared memory has no wake-up; it is checked on every render tick
+            self.ingest_timer = QTimer(self)
+            self.ingest_timer.setInterval(self.render_interval_ms)
+            self.ingest_timer.timeout.connect(self.schedule_render)
+            self.ingest_timer.start()
+        else:
+            self.ws_thread = WebSocketThread(self.coalescer, list(self.endpoints.values()), self.latency)
+        self.ws_thread.messages_pending.connect(self.schedule_render)
         self.ws_thread.connection_status_changed.connect(self.update_connection_status)
         self.ws_thread.start()
         
         self.load_theme()
         self.retranslate_ui()
+        self.set_latency_tracking(latency)
+
+    def create_history_recorder(self):
+        """ Snapshot history in a size-capped ring file (history_path, history_max_mb), unless disabled. """
+        if HistoryRecorder is None or not self.settings.value("history_enabled", True, type=bool):
+            return None
+        path = self.settings.value("history_path", "", type=str) or os.path.join(
+            QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericDataLocation),
+            "GeminiTrader", "HybridPanel", "history.bin")
+        max_mb = max(self.settings.value("history_max_mb", 256, type=int), 1)
+        try:
+            return HistoryRecorder(path, max_mb * 1024 * 1024)
+        except (OSError, ValueError) as e:
+            print(f"[History] ❌ Recording disabled: {e!r}")
+            return None
+
+    def create_alert_engine(self):
+        """ The alert rules (a JSON list in alert_rules_path) with their audit log next to them; None without rules. """
+        folder = os.path.join(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericDataLocation),
+                              "GeminiTrader", "HybridPanel")
+        path = self.settings.value("alert_rules_path", "", type=str) or os.path.join(folder, "alerts.json")
+        try:
+            rules = load_rules(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[Alerts] ❌ Could not load {path}: {e!r}")
+            return None
+        if not rules:
+            return None
+        print(f"[Alerts] ✅ {len(rules)} rules loaded from {path}")
+        return AlertEngine(rules, self.settings.value("alert_log_path", "", type=str) or os.path.join(folder, "alerts.log"))
+
+    def schedule_render(self):
+        """ Drains the coalescer on the next render tick, never sooner than one frame after the last render. """
+        if self.render_timer.isActive():
+            return
+        elapsed = self.render_clock.elapsed() if self.render_clock.isValid() else self.render_interval_ms
+        self.render_timer.start(max(0, self.render_interval_ms - elapsed))
+
+    def render_pending(self):
+        self.render_clock.start()
+        latency = self.latency
+        messages = self.coalescer.drain()
+        if self.snapshot_reader is not None:
+            messages += self.snapshot_reader.poll(self.trade_model.all_trades.get, latency.enabled)
+        for message in messages:
+            if latency.enabled:
+                latency.dispatched(message)
+                self.handle_message(message)
+                latency.applied(message)
+            else:
+                self.handle_message(message)
+        if latency.awaiting_paint:
+            # Rows that changed off-screen don't repaint anything; make sure the pass is measured
+            self.trade_table.viewport().update()
 
     def handle_message(self, message):
         msg_type = message.get("type")
+        source = message.get("source", "")
         if msg_type == "trade_data":
-            self.update_ui(message.get("data", {}))
+            self.update_ui(message.get("data", {}), source)
+        elif msg_type == "trade_frame":
+            self.apply_frame(message)
+        elif msg_type == "ingest_segment":
+            self.snapshot_reader.attach(source, message["name"])
         elif msg_type == "settings":
             self.current_settings = message.get("data", {})
 
@@ -373,6 +1279,11 @@ class MainWindow(QMainWindow):
         self.theme_toggle_btn.setObjectName("ThemeBtn")
         self.theme_toggle_btn.clicked.connect(self.toggle_theme)
 
+        self.symbol_filter_combo = QComboBox()
+        self.symbol_filter_combo.addItem("", None)
+        self.symbol_filter_combo.currentIndexChanged.connect(self.change_symbol_filter)
+        self.group_summary_label = QLabel()
+
         self.lang_combo = QComboBox()
         self.lang_combo.addItem("English", "en")
         self.lang_combo.addItem("فارسی", "fa")
@@ -381,16 +1292,24 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.connection_status_label)
         layout.addWidget(self.symbol_label)
         layout.addStretch()
+        layout.addWidget(self.group_summary_label)
+        layout.addWidget(self.symbol_filter_combo)
         layout.addWidget(self.lang_combo)
         layout.addWidget(self.theme_toggle_btn)
         return header_widget
 
     def create_trade_table(self):
         """ Use QTableView instead of QTableWidget for performance. """
-        table = QTableView()
+        table = TradeTableView()
         table.verticalHeader().setVisible(False)
         table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         table.setAlternatingRowColors(True)
+        table.setMouseTracking(True)  # Hover feedback for delegate-painted buttons
+        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        table.customContextMenuRequested.connect(self.show_table_menu)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Delete), table, activated=lambda: self.close_trades(self.selected_keys()))
         # Set fixed widths for specific columns
         table.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeMode.Fixed)
         table.setColumnWidth(6, 150)
@@ -403,8 +1322,16 @@ class MainWindow(QMainWindow):
         layout = QHBoxLayout(footer_widget)
         self.pnl_label = QLabel()
         self.pnl_value = QLabel("...")
+        self.pnl_chart = PnlSparkline()
+        self.sources_label = QLabel()
+        self.sources_label.setVisible(len(self.endpoints) > 1)
         layout.addWidget(self.pnl_label)
         layout.addWidget(self.pnl_value)
+        layout.addWidget(self.pnl_chart)
+        layout.addWidget(self.sources_label)
+        self.alert_label = QLabel(objectName="AlertLabel")
+        self.alert_label.hide()
+        layout.addWidget(self.alert_label)
         layout.addStretch()
         
         self.btn_close_profit = QPushButton()
@@ -423,111 +1350,287 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.btn_settings)
         return footer_widget
 
-    def update_ui(self, data):
-        """ The UI update function is now much simpler and more efficient. """
-        symbol = data.get('symbol', 'N/A')
-        self.symbol_label.setText(self.translator.tr("main_chart_symbol", symbol=symbol))
-        
-        total_pl = data.get('total_pl', 0.0)
+    def update_ui(self, data, source=""):
+        """ Applies one source's snapshot to the shared table and refreshes the totals. """
+        self.source_data[source] = {key: value for key, value in data.items() if key != 'trades'}
+        self.trade_model.update_trades(data.get('trades', []), source)
+        self.snapshot_applied(source, data)
+
+    def apply_frame(self, message):
+        """ Applies a diff from the ingest process: only changed rows, plus the ticket list when positions opened or closed. """
+        source = message["source"]
+        data = self.source_data[source] = message["data"]
+        closed = ()
+        if message["tickets"] is not None:
+            closed = self.trade_model.by_source.get(source, set()) - {(source, ticket) for ticket in message["tickets"]}
+        self.trade_model.apply_changes(message["changed"], closed)
+        self.snapshot_applied(source, data)
+
+    def snapshot_applied(self, source, data):
+        if self.pending_commands:
+            self.observe_pending_commands(source)
+        self.refresh_totals()
+        if self.alerts:
+            self.evaluate_alerts()
+        if self.history is not None and self.history.due(source):
+            self.history.record(source, data if "trades" in data else dict(data, trades=self.trade_model.trades_of(source)))
+
+    def observe_pending_commands(self, source):
+        """ Resolves the pending commands this snapshot confirms and keeps unconfirmed ATM toggles on screen. """
+        self.trade_model.resolve_pending(source)
+
+    def expire_pending_commands(self):
+        if self.pending_commands:
+            self.trade_model.expire_pending()
+
+    def evaluate_alerts(self):
+        """ The per-ticket rules ran while the model applied the diff; the symbol and account rules run here. """
+        alerts = self.alerts
+        stats = self.trade_model.symbol_stats
+        alerts.symbols(lambda symbol: stats[symbol].profit if symbol in stats else None)
+        sources = self.source_data.values()
+        balances = [data.get("balance") for data in sources]
+        balance = sum(balances) if balances and None not in balances else None  # Only with every EA reporting it
+        alerts.totals(sum(data.get('total_pl', 0.0) for data in sources), balance)
+        self.show_alerts(alerts.drain())
+
+    def tick_alerts(self):
+        def value_of(metric, key):
+            trade = self.trade_model.get_trade(key)
+            return trade.profit if trade is not None else None
+        self.alerts.tick(value_of)
+        self.show_alerts(self.alerts.drain())
+
+    def show_alerts(self, events):
+        """ Fired alerts go to the footer and the tray; cleared ones only to the audit log. """
+        tr = self.translator.tr
+        lines = [tr("alert_fired", subject=event.subject_text, condition=event.rule.describe(),
+                    value=f"{event.value:+.2f}" if event.value is not None else "?", rule=event.rule.id)
+                 for event in events if event.kind == "fired"]
+        if not lines:
+            return
+        for line in lines:
+            print(f"[Alerts] 🔔 {line}")
+        self.alert_label.setText(f"🔔 {lines[-1]}")
+        self.alert_label.setToolTip("\n".join(lines[-20:]))
+        self.alert_label.show()
+        if self.tray_icon is not None:
+            title = tr("alert_title") if len(lines) == 1 else tr("alerts_title", count=len(lines))
+            self.tray_icon.showMessage(title, "\n".join(lines[:5]), QSystemTrayIcon.MessageIcon.Warning, 10000)
+
+    def refresh_totals(self):
+        """ Header symbol, total P/L across all sources and per-source subtotals. """
+        symbols = sorted({data.get('symbol', 'N/A') for data in self.source_data.values()})
+        if symbols:
+            self.symbol_label.setText(self.translator.tr("main_chart_symbol", symbol=", ".join(symbols)))
+
+        total_pl = sum(data.get('total_pl', 0.0) for data in self.source_data.values())
         self.pnl_value.setText(f"{total_pl:+.2f} $")
         self.pnl_value.setObjectName("ProfitLabel" if total_pl >= 0 else "LossLabel")
-        
-        trades = data.get('trades', [])
-        self.trade_model.update_trades(trades)
-        
-        has_profit = False
-        has_loss = False
-        for row, trade in enumerate(trades):
-            if trade.get('profit', 0) > 0: has_profit = True
-            if trade.get('profit', 0) < 0: has_loss = True
-            self.add_action_buttons(row)
-        
-        self.btn_close_profit.setEnabled(has_profit)
-        self.btn_close_loss.setEnabled(has_loss)
+        if self.source_data:
+            self.pnl_chart.append(time.time(), total_pl)
+        self.sources_label.setText("  ·  ".join(
+            f"{name}: {self.source_data.get(name, {}).get('total_pl', 0.0):+.2f} $" for name in self.endpoints))
 
-    def add_action_buttons(self, row):
-        """ This function now just takes the row and reads data from the model. """
-        trade = self.trade_model.get_trade_at_row(row)
-        if not trade: return
-        
-        ticket = trade.get('ticket')
-        profit = trade.get('profit')
-        atm_enabled = trade.get('atm_enabled', True)
-        
-        # ATM Toggle Button
-        model_index_atm = self.trade_model.index(row, 5)
-        atm_widget = QWidget()
-        atm_layout = QHBoxLayout(atm_widget); atm_layout.setContentsMargins(0,0,0,0); atm_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        btn_atm = QPushButton(self.translator.tr("atm_on") if atm_enabled else self.translator.tr("atm_off"))
-        btn_atm.setObjectName("AtmOn" if atm_enabled else "AtmOff")
-        btn_atm.setCheckable(True)
-        btn_atm.setChecked(atm_enabled)
-        btn_atm.clicked.connect(lambda state, t=ticket, b=btn_atm: self.toggle_atm_for_trade(state, t, b))
-        atm_layout.addWidget(btn_atm)
-        self.trade_table.setIndexWidget(model_index_atm, atm_widget)
-
-        # Actions Buttons
-        model_index_actions = self.trade_model.index(row, 6)
-        actions_widget = QWidget()
-        actions_layout = QHBoxLayout(actions_widget); actions_layout.setContentsMargins(5,0,5,0); actions_layout.addStretch()
-        btn_be = QPushButton(self.translator.tr("action_be"))
-        btn_be.setObjectName("BEBtn")
-        btn_be.clicked.connect(lambda: self.handle_be_click(ticket, profit))
-        btn_close = QPushButton(self.translator.tr("action_close"))
-        btn_close.setObjectName("CloseBtn")
-        handler = partial(self.confirm_and_send, "close", self.translator.tr("confirm_close_ticket", ticket=ticket), ticket=ticket)
-        btn_close.clicked.connect(handler)
-        actions_layout.addWidget(btn_be)
-        actions_layout.addWidget(btn_close)
-        actions_layout.addStretch()
-        self.trade_table.setIndexWidget(model_index_actions, actions_widget)
-
-    def handle_be_click(self, ticket, profit):
-        if profit <= 0:
+        trades = self.trade_model.all_trades.values()
+        self.btn_close_profit.setEnabled(any(trade.profit > 0 for trade in trades))
+        self.btn_close_loss.setEnabled(any(trade.profit < 0 for trade in trades))
+        self.refresh_connection_status()
+
+    def refresh_symbol_filter(self):
+        """ Keeps the symbol filter in sync with the symbols that currently have positions. """
+        combo = self.symbol_filter_combo
+        symbols = sorted(self.trade_model.by_symbol)
+        current = combo.currentData()
+        if [combo.itemData(i) for i in range(1, combo.count())] == symbols:
+            return
+        combo.blockSignals(True)
+        while combo.count() > 1:
+            combo.removeItem(1)
+        for symbol in symbols:
+            combo.addItem(symbol, symbol)
+        # A filtered symbol whose positions all closed stays selectable until the user changes it
+        if current is not None and current not in symbols:
+            combo.addItem(current, current)
+        combo.setCurrentIndex(max(combo.findData(current), 0))
+        combo.blockSignals(False)
+
+    def change_symbol_filter(self, index):
+        self.trade_model.set_symbol_filter(self.symbol_filter_combo.itemData(index))
+        self.update_group_summary()
+
+    def update_group_summary(self):
+        stats = self.trade_model.stats_for(self.trade_model.symbol_filter)
+        self.group_summary_label.setText(self.translator.tr(
+            "symbol_summary", count=stats.count, buys=stats.buys, sells=stats.sells,
+            net=stats.net_volume, profit=stats.profit))
+
+    def selected_keys(self):
+        rows = sorted(index.row() for index in self.trade_table.selectionModel().selectedRows())
+        trades = (self.trade_model.get_trade_at_row(row) for row in rows)
+        return [trade.key for trade in trades if trade is not None]
+
+    def show_table_menu(self, pos):
+        keys = self.selected_keys()
+        if not keys:
+            return
+        tr = self.translator.tr
+        menu = QMenu(self)
+        menu.addAction(tr("menu_close_selected", count=len(keys)), lambda: self.close_trades(keys))
+        menu.addAction(tr("menu_be_selected", count=len(keys)), lambda: self.handle_be_click(keys))
+        menu.addSeparator()
+        menu.addAction(tr("menu_atm_on_selected", count=len(keys)), lambda: self.set_atm_for_trades(True, keys))
+        menu.addAction(tr("menu_atm_off_selected", count=len(keys)), lambda: self.set_atm_for_trades(False, keys))
+        menu.exec(self.trade_table.viewport().mapToGlobal(pos))
+
+    def handle_row_button(self, name, key):
+        """
+        Dispatches clicks on the delegate-painted row buttons; key is (source, ticket).
+        A button on a row that is part of a multi-row selection acts on the whole selection.
+        """
+        selected = self.selected_keys()
+        keys = selected if len(selected) > 1 and key in selected else [key]
+        if name == "atm":
+            trade = self.trade_model.get_trade(key)
+            if trade:
+                self.set_atm_for_trades(not trade.atm_enabled, keys)
+        elif name == "be":
+            self.handle_be_click(keys)
+        elif name == "close":
+            self.close_trades(keys)
+
+    def close_trades(self, keys):
+        # Tickets already being closed are left out rather than closed twice
+        keys = [key for key in keys if "close" not in self.pending_commands.blocked(key)]
+        if not keys:
+            return
+        tr = self.translator.tr
+        message = tr("confirm_close_ticket", ticket=keys[0][1]) if len(keys) == 1 else tr("confirm_close_selected", count=len(keys))
+        reply = QMessageBox.question(self, tr("confirm_op"), message, QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            for source, ticket in keys:
+                self.queue_ticket_command({"action": "close", "ticket": ticket}, source)
+
+    def handle_be_click(self, keys):
+        # Read the live profit; the button outlives the snapshot it was created for.
+        trades = [trade for trade in map(self.trade_model.get_trade, keys) if trade and trade.profit > 0]
+        if not trades:
             QMessageBox.information(self, self.translator.tr("be_fail_title"), self.translator.tr("be_fail_message"))
             return
-        if not send_command({"action": "breakeven", "ticket": ticket}):
-            self.show_command_error()
-            
-    def toggle_atm_for_trade(self, state, ticket, button):
-        if not send_command({"action": "toggle_atm_trade", "ticket": ticket, "atm_trade_state": state}):
-            self.show_command_error()
-            button.setChecked(not state) # Revert button state on failure
-        else:
-            button.setText(self.translator.tr("atm_on") if state else self.translator.tr("atm_off"))
-            button.setObjectName("AtmOn" if state else "AtmOff")
-            button.style().unpolish(button); button.style().polish(button)
+        for trade in trades:
+            self.queue_ticket_command({"action": "breakeven", "ticket": trade.ticket}, trade.source)
+
+    def set_atm_for_trades(self, state, keys):
+        for key in keys:
+            trade = self.trade_model.get_trade(key)
+            if trade and trade.atm_enabled != state:
+                self.toggle_atm_for_trade(state, key)
+
+    def toggle_atm_for_trade(self, state, key):
+        source, ticket = key
+        def on_result(success):
+            if not success:
+                self.trade_model.set_atm_enabled(key, not state) # Revert optimistic state on failure
+        if self.queue_ticket_command({"action": "toggle_atm_trade", "ticket": ticket, "atm_trade_state": state}, source, on_result):
+            self.trade_model.set_atm_enabled(key, state)
+
+    def queue_ticket_command(self, payload, source, on_result=None):
+        """
+        Adds a ticket command to the current batch; the batch is sent batch_window_ms after its first command.
+        Returns False, without queueing, when the same command is still pending for the ticket.
+        """
+        key = (source, payload["ticket"])
+        trade = self.trade_model.get_trade(key)
+        if trade is not None:
+            if not self.pending_commands.begin(key, payload["action"], trade, payload.get("atm_trade_state")):
+                return False
+            self.trade_model.refresh_keys([key])
+        self.batcher.add(source, payload, on_result)
+        if self.batcher and not self.batch_timer.isActive():
+            self.batch_timer.start()
+        return True
+
+    def flush_commands(self):
+        for source, payload, callbacks in self.batcher.take():
+            self.pending_commands.sent(source, payload)
+            def on_result(success, source=source, payload=payload, callbacks=callbacks):
+                if not success:
+                    self.trade_model.refresh_keys(self.pending_commands.failed(source, payload))
+                for callback in callbacks:
+                    callback(success)
+                if not success:
+                    self.show_command_error()
+            self.send_command(payload, on_result, source)
 
     def open_settings_dialog(self):
-        dialog = SettingsDialog(self.current_settings, self.translator, self)
+        dialog = SettingsDialog(self.current_settings, self.translator, self,
+                                self.trade_model.all_trades.values(), self.source_data)
         if dialog.exec():
             new_settings = dialog.get_settings()
             if new_settings:
-                if not send_command({"action": "update_settings", "settings": new_settings}):
-                    self.show_command_error()
+                self.send_command({"action": "update_settings", "settings": new_settings})
         
-    def confirm_and_send(self, action, message, ticket=0):
+    def confirm_and_send(self, action, message, ticket=0, source=None):
         reply = QMessageBox.question(self, self.translator.tr("confirm_op"), message, QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
             payload = {"action": action}
             if ticket: payload["ticket"] = ticket
-            if not send_command(payload):
-                self.show_command_error()
+            self.send_command(payload, source=source)
+
+    def send_command(self, payload, on_result=None, source=None):
+        """
+        Sends a command without blocking; by default a failure shows the error dialog.
+        Ticket commands go to the relay that reported the ticket (source); account-wide
+        commands (source=None) go to every relay and succeed only if all of them accept.
+        """
+        if on_result is None:
+            on_result = lambda success: success or self.show_command_error()
+        targets = [self.endpoints[source]] if source is not None else list(self.endpoints.values())
+        results = []
+        def collect(success):
+            results.append(success)
+            if len(results) == len(targets):
+                on_result(all(results))
+        for endpoint in targets:
+            self.commands.send(payload, collect, endpoint.command_url)
 
     def show_command_error(self):
         """ Helper function to show a consistent error message. """
         QMessageBox.critical(self, self.translator.tr("command_error_title"), self.translator.tr("command_error_message"))
 
-    def update_connection_status(self, status):
-        if status == "connected": 
-            self.connection_status_label.setText("�")
-            self.connection_status_label.setToolTip(self.translator.tr("connection_status_connected"))
-        elif status == "disconnected": 
+    def update_connection_status(self, source, status):
+        self.source_status[source] = status
+        self.refresh_connection_status()
+
+    def refresh_connection_status(self):
+        """ Green when every relay is connected, red when none is, yellow otherwise; the tooltip lists each relay. """
+        statuses = set(self.source_status.values())
+        if statuses == {"connected"}:
+            self.connection_status_label.setText("🟢")
+        elif statuses == {"disconnected"}:
             self.connection_status_label.setText("🔴")
-            self.connection_status_label.setToolTip(self.translator.tr("connection_status_disconnected"))
-        else: 
+        else:
             self.connection_status_label.setText("🟡")
-            self.connection_status_label.setToolTip(self.translator.tr("connection_status_connecting"))
+        tooltip = {
+            "connected": self.translator.tr("connection_status_connected"),
+            "disconnected": self.translator.tr("connection_status_disconnected"),
+        }
+        if len(self.source_status) == 1:
+            name, status = next(iter(self.source_status.items()))
+            self.connection_status_label.setToolTip(
+                tooltip.get(status, self.translator.tr("connection_status_connecting")) + self.connection_timing(name))
+            return
+        self.connection_status_label.setToolTip("\n".join(
+            f"{name}: {tooltip.get(status, self.translator.tr('connection_status_connecting'))}"
+            f" · {self.source_data.get(name, {}).get('total_pl', 0.0):+.2f} $" + self.connection_timing(name)
+            for name, status in self.source_status.items()))
+
+    def connection_timing(self, source):
+        stats = self.ws_thread.stats.get(source)
+        if stats is None or not stats.connects:
+            return ""
+        return "\n" + self.translator.tr("connection_timing", handshake=stats.handshake_ms,
+                                          reconnects=stats.connects - 1, downtime=stats.last_downtime)
             
     def toggle_theme(self):
         new_theme = "dark" if self.is_light_theme() else "light"
@@ -565,7 +1668,7 @@ class MainWindow(QMainWindow):
         tr = self.translator.tr
         self.setWindowTitle(tr("window_title"))
         self.symbol_label.setText(tr("connecting"))
-        self.update_connection_status(self.ws_thread.connection_status_changed.emit) # Re-evaluate tooltip
+        self.refresh_connection_status() # Re-evaluate tooltip
         
         # Footer
         self.pnl_label.setText(tr("total_pl"))
@@ -573,15 +1676,70 @@ class MainWindow(QMainWindow):
         self.btn_close_profit.setText(tr("close_profits"))
         self.btn_close_loss.setText(tr("close_losses"))
         self.btn_settings.setText(tr("settings"))
+        self.symbol_filter_combo.setItemText(0, tr("filter_all_symbols"))
 
         # Table Headers
         self.trade_model.update_headers()
         
-        # Force a repaint of the table to update widgets inside
-        self.update_ui(data={"trades": self.trade_model.trades, "total_pl": 0})
+        # Force a repaint of the table so the painted buttons pick up the new texts
+        self.refresh_totals()
+        self.update_group_summary()
+        self.trade_table.viewport().update()
+
+
+    # --- Latency instrumentation ---
+    def set_latency_tracking(self, enabled):
+        """ Turns the per-stage instrumentation and its overlay on or off. """
+        self.latency.reset()
+        self.latency.enabled = enabled
+        self.trade_table.paint_hook = self.latency.painted if enabled else None
+        self.latency_overlay.setVisible(enabled)
+        if enabled:
+            self.latency_timer.start()
+            self.refresh_latency_overlay()
+        else:
+            self.latency_timer.stop()
+        self.settings.setValue("latency_overlay", enabled)
+
+    def toggle_latency_overlay(self):
+        self.set_latency_tracking(not self.latency.enabled)
+
+    def refresh_latency_overlay(self):
+        tr = self.translator.tr
+        text = (f"{tr('latency_overlay_title', seconds=self.latency.window_seconds)}\n{self.latency.format_table()}\n\n"
+                f"{tr('command_latency_title')}\n{self.pending_commands.format_table()}")
+        watchdog = self.watchdog
+        if watchdog is not None:
+            text += (f"\n\n{tr('stall_title', threshold=round(watchdog.threshold * 1000), count=watchdog.stalls, seconds=watchdog.stalled_time)}"
+                     + (f"\n{watchdog.format_table()}" if watchdog.stalls else ""))
+        self.latency_overlay.setText(text)
+        self.latency_overlay.adjustSize()
+        self.latency_overlay.move(8, 8)
+        self.latency_overlay.raise_()
+
+    def dump_latency(self, path=None):
+        path = path or time.strftime("latency-%Y%m%d-%H%M%S.json")
+        self.latency.dump(path, commands=self.pending_commands.summary(),
+                          stalls=self.watchdog.summary() if self.watchdog is not None else None)
+        print(f"[Latency] 📝 Report written to {path}")
+        return path
 
+    def log_stall(self, duration, offender):
+        """ Watchdog thread: one line per stall; the aggregate is in the F12 overlay, the saved report and the exit log. """
+        print(f"[Watchdog] ⚠️ UI blocked for {duration * 1000:.0f} ms in {offender.site}")
 
     def closeEvent(self, event):
         self.ws_thread.stop()
         self.ws_thread.wait() # Wait for thread to finish
+        if self.snapshot_reader is not None:
+            self.snapshot_reader.close()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            if self.watchdog.stalls:
+                print(f"[Watchdog] Top UI stalls:\n{self.watchdog.format_report()}")
+        self.commands.close()
+        if self.history is not None:
+            self.history.close()
+        if self.alerts is not None:
+            self.alerts.close()
         super().closeEvent(event)
@@ -0,0 +1,98 @@
+# FILE: atm_rules.py
+import numpy as np
+
+# ===================================================================
+# 1. Position columns
+# ===================================================================
+class RuleInputs:
+    """
+    The open positions as ProcessAutoManagement sees them, as NumPy columns.
+    Built once (e.g. when the settings dialog opens) so each rule evaluation is pure array math.
+    source_data maps each relay to its latest payload header: the chart symbol (the only one the EA
+    manages) and that symbol's volume_step, volume_min, volume_digits and point.
+    """
+    def __init__(self, trades, source_data):
+        trades = list(trades)
+        count = len(trades)
+        self.trades = trades
+        self.ticket = np.fromiter((t.ticket for t in trades), np.int64, count)
+        self.is_buy = np.fromiter((t.type == "Buy" for t in trades), bool, count)
+        self.volume = np.fromiter((t.volume for t in trades), np.float64, count)
+        self.entry = np.fromiter((t.open_price for t in trades), np.float64, count)
+        self.sl = np.fromiter((t.sl for t in trades), np.float64, count)
+        self.tp = np.fromiter((t.tp for t in trades), np.float64, count)
+        self.price = np.fromiter((t.price for t in trades), np.float64, count)
+        self.atm_enabled = np.fromiter((t.atm_enabled for t in trades), bool, count)
+        self.rule_applied = np.fromiter((t.rule_applied for t in trades), bool, count)
+
+        def header(trade, field, default):
+            return (source_data.get(trade.source) or {}).get(field, default)
+        self.chart_symbol = np.fromiter(
+            (trade.symbol == header(trade, "symbol", None) for trade in trades), bool, count)
+        self.volume_step = np.fromiter((header(t, "volume_step", 0.01) or 0.01 for t in trades), np.float64, count)
+        self.volume_min = np.fromiter((header(t, "volume_min", 0.01) for t in trades), np.float64, count)
+        self.volume_digits = np.fromiter((header(t, "volume_digits", 2) for t in trades), np.int64, count)
+        self.point = np.fromiter((header(t, "point", 0.00001) or 0.00001 for t in trades), np.float64, count)
+        self.price_digits = np.clip(np.round(-np.log10(self.point)), 0, 10).astype(np.int64)
+        # Old EAs send neither prices nor targets; there is nothing to preview then
+        self.has_prices = bool(count) and bool(np.any(self.price != 0.0))
+
+    def __len__(self):
+        return len(self.trades)
+
+# ===================================================================
+# 2. Rule evaluation
+# ===================================================================
+class RulePreview:
+    """ Result of evaluate(): per-position arrays plus the totals shown in the dialog. """
+    def __init__(self, **arrays):
+        self.__dict__.update(arrays)
+
+
+def normalize(values, digits):
+    """ MQL5's NormalizeDouble: round half away from zero to `digits` decimals. """
+    scale = 10.0 ** digits
+    return np.sign(values) * np.floor(np.abs(values) * scale + 0.5) / scale
+
+
+def evaluate(inputs, trigger_percent, close_percent, move_to_be, auto_enabled=True):
+    """
+    Mirrors ProcessAutoManagement on the current prices: which positions trigger, at what price,
+    how much volume the partial close takes, and whether the stop moves to break-even.
+    The EA skips positions on other symbols, without a TP, with a target closer than 5 points,
+    with ATM disabled or with the rule already applied; `eligible` marks the rest.
+    """
+    entry, tp = inputs.entry, inputs.tp
+    target_distance = np.abs(tp - entry)
+    eligible = (inputs.chart_symbol & inputs.atm_enabled & ~inputs.rule_applied
+                & (tp != 0.0) & (target_distance > inputs.point * 5))
+    if not auto_enabled or trigger_percent <= 0:
+        eligible = np.zeros_like(eligible)
+
+    trigger_distance = target_distance * (trigger_percent / 100.0)
+    trigger_price = np.where(inputs.is_buy, entry + trigger_distance, entry - trigger_distance)
+    reached = np.where(inputs.is_buy, inputs.price >= trigger_price, inputs.price <= trigger_price)
+    triggered = eligible & reached
+    with np.errstate(divide="ignore", invalid="ignore"):
+        progress = np.where(target_distance > 0,
+                            np.where(inputs.is_buy, inputs.price - entry, entry - inputs.price) / target_distance * 100.0, 0.0)
+
+    if 0 < close_percent < 100:
+        ideal = inputs.volume * (close_percent / 100.0)
+        close_volume = normalize(np.floor(ideal / inputs.volume_step) * inputs.volume_step, inputs.volume_digits)
+        closes = close_volume >= inputs.volume_min
+    else:
+        close_volume = np.zeros_like(inputs.volume)
+        closes = np.zeros(len(inputs), bool)
+    moves_to_be = np.full(len(inputs), bool(move_to_be)) & (inputs.sl != entry)
+
+    # Rows to show: eligible positions, the ones that would trigger now first, then the closest to triggering
+    order = np.flatnonzero(eligible)
+    order = order[np.lexsort((-progress[order], ~triggered[order]))]
+    return RulePreview(
+        eligible=eligible, triggered=triggered, trigger_price=trigger_price, progress=progress,
+        close_volume=np.where(closes, close_volume, 0.0), closes=closes, moves_to_be=moves_to_be, order=order,
+        managed_count=int(eligible.sum()), triggered_count=int(triggered.sum()),
+        closing_volume=float(close_volume[triggered & closes].sum()),
+        be_count=int((triggered & moves_to_be).sum()),
+    )
@@ -0,0 +1,502 @@
+# FILE: backtest.py
+"""
+Offline what-if engine for the auto-management rules.
+
+Replays recorded trades (entry, SL, TP, volume, side) over tick files and simulates what
+ProcessAutoManagement would have done with every combination of a grid of settings
+(triggerPercent x closePercent x moveToBE), then reports the realized P/L distribution per setting.
+
+Every trade is simulated against the whole grid at once: the ticks are scanned once for the
+first SL/TP hit, a running maximum of the price turns "first tick at or beyond the trigger" into a
+binary search per setting, and a reverse running minimum gives the next break-even/TP hit after any
+trigger. Chunks of trades x slices of the grid are spread over a process pool; tick files are parsed
+once, cached as .npy and memory-mapped by the workers.
+
+    python backtest.py trades.csv EURUSD_2024-05.csv --trigger 10:90:5 --close 0:90:10 --be both
+
+Trades CSV columns (header required, case-insensitive): symbol, type (Buy/Sell), volume,
+open_time, open_price, sl, tp, and optionally ticket and atm_enabled. Tick files are MetaTrader 5
+tick exports (<DATE> <TIME> <BID> <ASK> ...) or CSVs with time, bid and ask columns; times are
+epoch seconds/milliseconds or "YYYY.MM.DD HH:MM:SS[.fff]", in the same clock as open_time.
+P/L is in the quote currency (price difference x volume x contract size), without swap or commission.
+"""
+import argparse
+import calendar
+import csv
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from atm_rules import normalize
+
+TICK_DTYPE = np.dtype([("time_ms", "<i8"), ("bid", "<f8"), ("ask", "<f8")])
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "GeminiTrader", "ticks")
+PERCENTILES = (5, 25, 50, 75, 95)
+TRADES_PER_JOB = 64      # A job is at most this many trades x SETTINGS_PER_JOB settings, so a cancel is never
+SETTINGS_PER_JOB = 100   # stuck behind minutes of work
+
+# ===================================================================
+# 1. Input files
+# ===================================================================
+class SymbolSpec:
+    """ Contract details the simulation needs; point is inferred from the ticks when not given. """
+    __slots__ = ("point", "contract_size", "volume_step", "volume_min", "volume_digits")
+
+    def __init__(self, point=None, contract_size=100000.0, volume_step=0.01, volume_min=0.01):
+        self.point = point
+        self.contract_size = contract_size
+        self.volume_step = volume_step
+        self.volume_min = volume_min
+        self.volume_digits = max(0, -int(math.floor(math.log10(volume_step) + 1e-9)))
+
+
+def parse_specs(items):
+    """ "EURUSD=0.00001,100000,0.01,0.01" -> {symbol: SymbolSpec(point, contract, step, min)}. """
+    specs = {}
+    for item in items or ():
+        symbol, _, values = item.partition("=")
+        numbers = [float(value) for value in values.split(",") if value.strip()]
+        specs[symbol.strip()] = SymbolSpec(*numbers)
+    return specs
+
+
+def parse_range(text):
+    """ "10:90:10" -> 10, 20, ..., 90 (inclusive); "10,25,40" and "40" are taken as listed. """
+    text = str(text).strip()
+    if ":" in text:
+        start, stop, step = (float(part) for part in text.split(":"))
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        return [round(start + i * step, 10) for i in range(max(count, 0))]
+    return [float(part) for part in text.split(",") if part.strip()]
+
+
+_day_cache = {}
+
+def parse_time(text):
+    """ Epoch seconds or milliseconds, "YYYY.MM.DD HH:MM:SS[.fff]" or ISO 8601, as UTC epoch milliseconds. """
+    text = text.strip()
+    try:
+        value = float(text)
+        return int(value if value > 1e11 else value * 1000)
+    except ValueError:
+        pass
+    date, _, clock = text.replace("T", " ").partition(" ")
+    return _day_ms(date) + _clock_ms(clock)
+
+
+def _day_ms(date):
+    day = _day_cache.get(date)
+    if day is None:
+        year, month, mday = (int(part) for part in date.replace("-", ".").split("."))
+        day = _day_cache[date] = calendar.timegm((year, month, mday, 0, 0, 0)) * 1000
+    return day
+
+
+def _clock_ms(clock):
+    if not clock:
+        return 0
+    millis = clock[9:12]
+    return (int(clock[0:2]) * 3600000 + int(clock[3:5]) * 60000 + int(clock[6:8]) * 1000
+            + (int(millis.ljust(3, "0")) if millis else 0))
+
+
+def _columns(header, *names):
+    header = [column.strip().strip("<>").lower() for column in header]
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+def read_trades(path):
+    """ Reads the trades CSV into a list of dicts with parsed values. """
+    trades = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        col = {
+            "ticket": _columns(header, "ticket", "position"), "symbol": _columns(header, "symbol"),
+            "type": _columns(header, "type", "side"), "volume": _columns(header, "volume", "lots"),
+            "open_time": _columns(header, "open_time", "time"), "open_price": _columns(header, "open_price", "entry", "price"),
+            "sl": _columns(header, "sl", "s/l"), "tp": _columns(header, "tp", "t/p"), "atm_enabled": _columns(header, "atm_enabled", "atm"),
+        }
+        missing = [name for name in ("symbol", "type", "volume", "open_time", "open_price") if col[name] is None]
+        if missing:
+            raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+        for number, row in enumerate(reader, 1):
+            if not row:
+                continue
+            value = lambda name, default=None: row[col[name]].strip() if col[name] is not None and row[col[name]].strip() else default
+            side = value("type").lower()
+            trades.append({
+                "ticket": int(value("ticket", number)), "symbol": value("symbol"),
+                "type": "Buy" if side in ("buy", "0") else "Sell", "volume": float(value("volume")),
+                "open_time": parse_time(value("open_time")), "open_price": float(value("open_price")),
+                "sl": float(value("sl", 0.0)), "tp": float(value("tp", 0.0)),
+                "atm_enabled": value("atm_enabled", "true").lower() not in ("false", "0", "no"),
+            })
+    return trades
+
+
+def read_ticks(path):
+    """ Parses one tick file into a TICK_DTYPE array. Empty bid/ask cells (MT5 exports) repeat the previous value. """
+    times, bids, asks = [], [], []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        first = f.readline()
+        delimiter = "\t" if "\t" in first else ("," if "," in first else ";")
+        header = next(csv.reader([first], delimiter=delimiter))
+        date_col, clock_col = _columns(header, "date"), _columns(header, "time")
+        bid_col, ask_col = _columns(header, "bid"), _columns(header, "ask")
+        if bid_col is None or ask_col is None or clock_col is None:
+            raise ValueError(f"{path}: expected time, bid and ask columns")
+        bid = ask = math.nan
+        for row in csv.reader(f, delimiter=delimiter):
+            if not row:
+                continue
+            if date_col is not None:
+                stamp = _day_ms(row[date_col]) + _clock_ms(row[clock_col])
+            else:
+                stamp = parse_time(row[clock_col])
+            if row[bid_col]:
+                bid = float(row[bid_col])
+            if row[ask_col]:
+                ask = float(row[ask_col])
+            times.append(stamp)
+            bids.append(bid)
+            asks.append(ask)
+    ticks = np.empty(len(times), TICK_DTYPE)
+    ticks["time_ms"], ticks["bid"], ticks["ask"] = times, bids, asks
+    return ticks[~(np.isnan(ticks["bid"]) | np.isnan(ticks["ask"]))]
+
+
+def tick_cache(paths, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Merges the tick files of one symbol into a single time-sorted .npy in cache_dir and returns its path.
+    The cache key covers the paths, sizes and modification times, so edited files are parsed again.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = hashlib.sha1()
+    for path in sorted(paths):
+        stat = os.stat(path)
+        key.update(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    cached = os.path.join(cache_dir, key.hexdigest()[:20] + ".npy")
+    if not os.path.exists(cached):
+        ticks = np.concatenate([read_ticks(path) for path in sorted(paths)])
+        ticks = ticks[np.argsort(ticks["time_ms"], kind="stable")]
+        partial = cached + f".{os.getpid()}.tmp"
+        with open(partial, "wb") as f:
+            np.save(f, ticks)
+        os.replace(partial, cached)
+    return cached
+
+
+def infer_point(ticks, sample=2000):
+    """ The smallest price increment the quotes are written with, e.g. 0.00001 for 5-digit FX. """
+    prices = np.concatenate([ticks["bid"][:sample], ticks["ask"][:sample]])
+    for digits in range(9):
+        scaled = prices * 10.0 ** digits
+        if np.all(np.abs(scaled - np.round(scaled)) < 1e-6):
+            return 10.0 ** -digits
+    return 1e-8
+
+
+def symbol_of(path):
+    """ Symbol of a tick file named like EURUSD_202405.csv or EURUSD.csv. """
+    name = os.path.basename(path)
+    for separator in ("_", "-", ".", " "):
+        name = name.split(separator)[0]
+    return name
+
+# ===================================================================
+# 2. Simulation
+# ===================================================================
+def make_grid(triggers, closes, be_modes):
+    """ The cartesian product of the settings, as parallel arrays. """
+    trigger, close, be = np.meshgrid(np.asarray(triggers, float), np.asarray(closes, float),
+                                     np.asarray(be_modes, bool), indexing="ij")
+    return {"trigger": trigger.ravel(), "close": close.ravel(), "be": be.ravel()}
+
+
+def _first_hit(signed, start, stop_level, take_level, chunk=4096):
+    """ Index of the first tick from start on at or beyond the stop or take level (signed prices), or len. """
+    end = len(signed)
+    while start < end:
+        window = signed[start:min(end, start + chunk)]
+        hit = (window <= stop_level) | (window >= take_level)
+        if hit.any():
+            return start + int(hit.argmax())
+        start += len(window)
+        chunk *= 2
+    return end
+
+
+def simulate_trade(ticks, trade, spec, grid, timer_ms=1000):
+    """
+    One trade against every setting of the grid. Returns (pnl per setting, triggered per setting,
+    still open per setting, pnl without auto-management), or None when there are no ticks after the open.
+
+    As in the EA, the rule is checked on the timer (timer_ms, 0 = every tick) using the latest
+    bid (buys) or ask (sells); SL and TP are server-side and hit on any tick. A triggered trade closes
+    the partial volume at that price and, with moveToBE, continues with its stop at the entry.
+    Trades still open at the end of the ticks are valued at the last price.
+    """
+    times = ticks["time_ms"]
+    start = int(np.searchsorted(times, trade["open_time"], "left"))
+    if start >= len(times):
+        return None
+    buy = trade["type"] == "Buy"
+    sign = 1.0 if buy else -1.0
+    signed_all = ticks["bid"] if buy else -ticks["ask"]
+    entry, sl, tp, volume = trade["open_price"], trade["sl"], trade["tp"], trade["volume"]
+    stop = sign * sl if sl else -math.inf
+    take = sign * tp if tp else math.inf
+    be_possible = bool(grid["be"].any()) and sl != entry
+
+    # Every exit of every setting happens by the time the looser of the original stop and the entry is crossed
+    loose_stop = min(stop, sign * entry) if be_possible else stop
+    end = min(_first_hit(signed_all, start, loose_stop, take) + 1, len(times))
+    signed = np.asarray(signed_all[start:end])
+    n = len(signed)
+    exit_original = int(np.argmax((signed <= stop) | (signed >= take))) if n else 0
+    if not ((signed[exit_original] <= stop) or (signed[exit_original] >= take)):
+        exit_original = n  # Still open at the end of the ticks
+
+    def value_at(index):
+        return sign * signed[np.minimum(index, n - 1)]  # back to the real bid/ask
+
+    contract = spec.contract_size
+    baseline = sign * (value_at(exit_original) - entry) * volume * contract
+
+    target_distance = abs(tp - entry)
+    eligible = trade.get("atm_enabled", True) and tp != 0.0 and target_distance > spec.point * 5
+    settings = len(grid["trigger"])
+    if not eligible:
+        return (np.full(settings, baseline), np.zeros(settings, bool),
+                np.full(settings, exit_original >= n), baseline)
+
+    # Prices the timer sees: the last tick of each timer period
+    if timer_ms > 0:
+        period = np.asarray(times[start:end]) // timer_ms
+        sampled = np.append(np.flatnonzero(period[1:] != period[:-1]), n - 1)
+    else:
+        sampled = np.arange(n)
+    running_best = np.maximum.accumulate(signed[sampled])
+    trigger_distance = target_distance * (grid["trigger"] / 100.0)
+    levels = np.where(buy, entry + trigger_distance, entry - trigger_distance) * sign
+    position = np.searchsorted(running_best, levels, "left")
+    trigger_at = np.where(position < len(sampled), sampled[np.minimum(position, len(sampled) - 1)], n)
+    triggered = (grid["trigger"] > 0) & (trigger_at < exit_original)
+
+    close_percent = grid["close"]
+    close_volume = normalize(np.floor(volume * (close_percent / 100.0) / spec.volume_step) * spec.volume_step,
+                             spec.volume_digits)
+    closes = triggered & (close_percent > 0) & (close_percent < 100) & (close_volume >= spec.volume_min)
+    close_volume = np.where(closes, close_volume, 0.0)
+
+    exit_at = np.full(settings, exit_original)
+    moved = triggered & grid["be"] & (sl != entry)
+    if moved.any():
+        # Next tick at or beyond the entry (new stop) or the TP, from every index on
+        hits = np.where((signed <= sign * entry) | (signed >= take), np.arange(n), n)
+        next_hit = np.append(np.minimum.accumulate(hits[::-1])[::-1], n)
+        exit_at = np.where(moved, next_hit[np.minimum(trigger_at + 1, n)], exit_at)
+
+    pnl = sign * ((value_at(trigger_at) - entry) * close_volume + (value_at(exit_at) - entry) * (volume - close_volume)) * contract
+    return pnl, triggered, exit_at >= n, baseline
+
+
+_mapped_ticks = {}
+
+def simulate_chunk(tick_path, trades, spec, grid, timer_ms):
+    """ Worker: a batch of trades of one symbol. Rows of trades without ticks are NaN. """
+    ticks = _mapped_ticks.get(tick_path)
+    if ticks is None:
+        ticks = _mapped_ticks[tick_path] = np.load(tick_path, mmap_mode="r")
+    settings = len(grid["trigger"])
+    pnl = np.full((len(trades), settings), np.nan)
+    triggered = np.zeros((len(trades), settings), bool)
+    still_open = np.zeros((len(trades), settings), bool)
+    baseline = np.full(len(trades), np.nan)
+    for row, trade in enumerate(trades):
+        result = simulate_trade(ticks, trade, spec, grid, timer_ms)
+        if result is not None:
+            pnl[row], triggered[row], still_open[row], baseline[row] = result
+    return pnl, triggered, still_open, baseline
+
+# ===================================================================
+# 3. Sweep
+# ===================================================================
+class SweepResult:
+    """ Per-trade P/L of every setting (trades x settings) and the summary statistics over trades. """
+    def __init__(self, grid, trades, pnl, triggered, still_open, baseline, elapsed):
+        simulated = ~np.isnan(baseline)
+        self.grid = grid
+        self.trades = [trade for trade, ok in zip(trades, simulated) if ok]
+        self.skipped = int((~simulated).sum())
+        self.pnl = pnl[simulated]
+        self.triggered = triggered[simulated]
+        self.still_open = still_open[simulated]
+        self.baseline = baseline[simulated]
+        self.elapsed = elapsed
+
+    def stats(self):
+        pnl = self.pnl
+        if not len(pnl):
+            pnl = np.zeros((1, len(self.grid["trigger"])))
+        quantiles = np.percentile(pnl, PERCENTILES, axis=0)
+        stats = {
+            "total": pnl.sum(axis=0), "mean": pnl.mean(axis=0), "std": pnl.std(axis=0),
+            "min": pnl.min(axis=0), "max": pnl.max(axis=0), "win_rate": (pnl > 0).mean(axis=0),
+            "triggered": self.triggered.sum(axis=0), "open": self.still_open.sum(axis=0),
+        }
+        for percentile, values in zip(PERCENTILES, quantiles):
+            stats[f"p{percentile}"] = values
+        return stats
+
+    def baseline_stats(self):
+        pnl = self.baseline if len(self.baseline) else np.zeros(1)
+        return {"total": float(pnl.sum()), "mean": float(pnl.mean()), "win_rate": float((pnl > 0).mean())}
+
+    def ranking(self, key="total"):
+        """ Setting indexes, best first. """
+        return np.argsort(-self.stats()[key], kind="stable")
+
+    def rows(self, key="total", limit=None):
+        stats = self.stats()
+        order = self.ranking(key)[:limit]
+        return [dict({"trigger": float(self.grid["trigger"][i]), "close": float(self.grid["close"][i]),
+                      "be": bool(self.grid["be"][i])}, **{name: float(values[i]) for name, values in stats.items()})
+                for i in order]
+
+    def to_json(self, path, key="total"):
+        report = {"trades": len(self.trades), "skipped": self.skipped, "elapsed_s": self.elapsed,
+                  "baseline": self.baseline_stats(), "settings": self.rows(key)}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return path
+
+
+def run_sweep(trades, tick_files, grid, specs=None, timer_ms=1000, workers=None, cache_dir=DEFAULT_CACHE_DIR,
+              progress=None, should_stop=None):
+    """
+    Simulates every trade against every grid setting on a process pool.
+    tick_files maps each symbol to its tick files; trades on other symbols are skipped.
+    progress(done, total) is called as batches finish; returning from should_stop() with True cancels.
+    """
+    started = time.perf_counter()
+    specs = dict(specs or {})
+    workers = workers or os.cpu_count() or 1
+    by_symbol = {}
+    for row, trade in enumerate(trades):
+        if trade["symbol"] in tick_files:
+            by_symbol.setdefault(trade["symbol"], []).append(row)
+
+    settings = len(grid["trigger"])
+    pnl = np.full((len(trades), settings), np.nan)
+    triggered = np.zeros((len(trades), settings), bool)
+    still_open = np.zeros((len(trades), settings), bool)
+    baseline = np.full(len(trades), np.nan)
+
+    jobs = []
+    for symbol, rows in by_symbol.items():
+        tick_path = tick_cache(tick_files[symbol], cache_dir)
+        spec = specs.get(symbol) or SymbolSpec()
+        if spec.point is None:
+            spec.point = infer_point(np.load(tick_path, mmap_mode="r"))
+        size = max(1, min(TRADES_PER_JOB, math.ceil(len(rows) / (workers * 4))))
+        for first in range(0, len(rows), size):
+            chunk = rows[first:first + size]
+            for start in range(0, settings, SETTINGS_PER_JOB):
+                columns = slice(start, start + SETTINGS_PER_JOB)
+                part = {name: values[columns] for name, values in grid.items()}
+                jobs.append((chunk, columns, (tick_path, [trades[row] for row in chunk], spec, part, timer_ms)))
+
+    # spawn: the dashboard runs this from a thread of a Qt process, which must not be forked
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    completed = False
+    try:
+        futures = {pool.submit(simulate_chunk, *args): (rows, columns) for rows, columns, args in jobs}
+        pending, done = set(futures), 0
+        while pending:
+            # Polled rather than blocking on the next result, so a cancel is seen within a fraction of a second
+            finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in finished:
+                rows, columns = futures[future]
+                pnl[rows, columns], triggered[rows, columns], still_open[rows, columns], baseline[rows] = future.result()
+                done += 1
+                if progress is not None:
+                    progress(done, len(jobs))
+            if should_stop is not None and should_stop():
+                return None
+        completed = True
+    finally:
+        # A cancelled or failed sweep drops the queued jobs and doesn't wait for the running ones
+        pool.shutdown(wait=completed, cancel_futures=not completed)
+    return SweepResult(grid, trades, pnl, triggered, still_open, baseline, time.perf_counter() - started)
+
+
+def group_tick_files(items):
+    """ ["EURUSD=a.csv", "GBPUSD_2024.csv"] -> {"EURUSD": ["a.csv"], "GBPUSD": ["GBPUSD_2024.csv"]}. """
+    files = {}
+    for item in items:
+        symbol, separator, path = item.partition("=")
+        if not separator or os.path.exists(item):
+            symbol, path = symbol_of(item), item
+        files.setdefault(symbol, []).append(path)
+    return files
+
+
+def be_modes(text):
+    return {"on": [True], "off": [False]}.get(text, [False, True])
+
+# ===================================================================
+# 4. Command line
+# ===================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep auto-management settings over recorded trades and ticks")
+    parser.add_argument("trades", help="CSV of the trades to replay")
+    parser.add_argument("ticks", nargs="+", metavar="[SYMBOL=]TICKS",
+                        help="tick file(s); the symbol defaults to the file name up to the first _ - or .")
+    parser.add_argument("--trigger", default="10:90:10", help="triggerPercent values, START:STOP:STEP or a list (default 10:90:10)")
+    parser.add_argument("--close", default="0:90:10", help="closePercent values (default 0:90:10)")
+    parser.add_argument("--be", choices=("on", "off", "both"), default="both", help="moveToBE values (default both)")
+    parser.add_argument("--spec", action="append", metavar="SYMBOL=POINT[,CONTRACT[,STEP[,MIN]]]",
+                        help="contract details (default: point from the ticks, 100000, 0.01, 0.01)")
+    parser.add_argument("--timer-ms", type=int, default=1000, help="EA timer period; 0 checks the rule on every tick")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--rank", default="total", choices=("total", "mean", "p5", "p50", "win_rate"), help="ranking statistic")
+    parser.add_argument("--top", type=int, default=20, help="settings to print")
+    parser.add_argument("--output", help="write every setting's statistics as JSON")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="where parsed tick files are cached")
+    args = parser.parse_args(argv)
+
+    trades = read_trades(args.trades)
+    grid = make_grid(parse_range(args.trigger), parse_range(args.close), be_modes(args.be))
+    tick_files = group_tick_files(args.ticks)
+    print(f"{len(trades)} trades x {len(grid['trigger'])} settings on {', '.join(sorted(tick_files))}", file=sys.stderr)
+
+    def progress(done, total):
+        print(f"\r  {done}/{total} batches", end="" if done < total else "\n", file=sys.stderr, flush=True)
+    result = run_sweep(trades, tick_files, grid, parse_specs(args.spec), args.timer_ms, args.workers,
+                       args.cache_dir, progress)
+
+    base = result.baseline_stats()
+    print(f"{len(result.trades)} trades simulated ({result.skipped} without ticks) in {result.elapsed:.1f} s")
+    print(f"without auto-management: total {base['total']:+.2f}  mean {base['mean']:+.2f}  win {base['win_rate']:.0%}")
+    print(f"{'trigger':>8}{'close':>7}{'BE':>5}{'total':>12}{'mean':>10}{'p5':>10}{'p50':>10}{'p95':>10}{'win':>6}{'trig':>6}")
+    for row in result.rows(args.rank, args.top):
+        print(f"{row['trigger']:>8g}{row['close']:>7g}{'on' if row['be'] else 'off':>5}{row['total']:>+12.2f}{row['mean']:>+10.2f}"
+              f"{row['p5']:>+10.2f}{row['p50']:>+10.2f}{row['p95']:>+10.2f}{row['win_rate']:>6.0%}{int(row['triggered']):>6}")
+    if args.output:
+        print(f"written to {result.to_json(args.output, args.rank)}")
+
+
+if __name__ == "__main__":
+    main()
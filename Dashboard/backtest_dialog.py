@@ -0,0 +1,246 @@
+# FILE: backtest_dialog.py
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QLineEdit, QPushButton, QComboBox,
+    QFileDialog, QTableView, QHeaderView, QAbstractItemView, QProgressBar, QMessageBox
+)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QAbstractTableModel, QModelIndex
+
+from backtest import read_trades, run_sweep, make_grid, parse_range, group_tick_files, be_modes
+
+# ===================================================================
+# 1. Background sweep
+# ===================================================================
+class SweepThread(QThread):
+    """ Runs backtest.run_sweep (which fans out to a process pool) without blocking the UI. """
+    progress = pyqtSignal(int, int)
+    result_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, trades_path, tick_items, grid, parent=None):
+        super().__init__(parent)
+        self.trades_path = trades_path
+        self.tick_items = tick_items
+        self.grid = grid
+
+    def run(self):
+        try:
+            trades = read_trades(self.trades_path)
+            result = run_sweep(trades, group_tick_files(self.tick_items), self.grid,
+                               progress=self.progress.emit, should_stop=self.isInterruptionRequested)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        if result is not None:
+            self.result_ready.emit(result)
+
+
+class SweepResultModel(QAbstractTableModel):
+    """ Every setting of a sweep, best first, with its P/L distribution over the trades. """
+    COLUMNS = (("trigger", "backtest_header_trigger", "{:g}"), ("close", "backtest_header_close", "{:g}"),
+               ("be", "action_be", None), ("total", "backtest_header_total", "{:+.2f}"),
+               ("mean", "backtest_header_mean", "{:+.2f}"), ("p5", "backtest_header_p5", "{:+.2f}"),
+               ("p50", "backtest_header_p50", "{:+.2f}"), ("p95", "backtest_header_p95", "{:+.2f}"),
+               ("win_rate", "backtest_header_win", "{:.0%}"), ("triggered", "backtest_header_triggered", "{:.0f}"))
+
+    def __init__(self, translator, parent=None):
+        super().__init__(parent)
+        self.translator = translator
+        self.rows = []
+
+    def set_result(self, result):
+        self.beginResetModel()
+        self.rows = result.rows("total")
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        field, _, fmt = self.COLUMNS[index.column()]
+        value = self.rows[index.row()][field]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if fmt is None:
+                return self.translator.tr("preview_be_yes") if value else self.translator.tr("preview_be_no")
+            return fmt.format(value)
+        elif role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.translator.tr(self.COLUMNS[section][1])
+        return None
+
+# ===================================================================
+# 2. Dialog
+# ===================================================================
+class BacktestDialog(QDialog):
+    """
+    Front end for backtest.py: pick a trades CSV and tick files, a grid of settings, run the sweep
+    and take the chosen row back into the settings dialog (selected_setting).
+    """
+    def __init__(self, translator, settings, parent=None):
+        super().__init__(parent)
+        self.translator = translator
+        self.settings = settings
+        self.sweep_thread = None
+        self.selected_setting = None
+        self.resize(860, 560)
+
+        self.trades_label = QLabel()
+        self.trades_edit = QLineEdit(settings.value("backtest_trades", "", type=str))
+        self.trades_browse = QPushButton()
+        self.trades_browse.clicked.connect(self.browse_trades)
+        self.ticks_label = QLabel()
+        self.ticks_edit = QLineEdit(settings.value("backtest_ticks", "", type=str))
+        self.ticks_browse = QPushButton()
+        self.ticks_browse.clicked.connect(self.browse_ticks)
+        self.trigger_label = QLabel()
+        self.trigger_edit = QLineEdit(settings.value("backtest_trigger", "10:90:10", type=str))
+        self.close_label = QLabel()
+        self.close_edit = QLineEdit(settings.value("backtest_close", "0:90:10", type=str))
+        self.be_label = QLabel()
+        self.be_combo = QComboBox()
+
+        self.run_button = QPushButton(objectName="SaveBtn")
+        self.run_button.clicked.connect(self.toggle_run)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        self.summary_label = QLabel()
+        self.summary_label.setWordWrap(True)
+
+        self.model = SweepResultModel(translator, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.doubleClicked.connect(self.use_selected)
+        self.use_button = QPushButton()
+        self.use_button.setEnabled(False)
+        self.use_button.clicked.connect(self.use_selected)
+
+        form = QGridLayout()
+        form.addWidget(self.trades_label, 0, 0)
+        form.addWidget(self.trades_edit, 0, 1, 1, 3)
+        form.addWidget(self.trades_browse, 0, 4)
+        form.addWidget(self.ticks_label, 1, 0)
+        form.addWidget(self.ticks_edit, 1, 1, 1, 3)
+        form.addWidget(self.ticks_browse, 1, 4)
+        grid_layout = QHBoxLayout()
+        for label, widget in ((self.trigger_label, self.trigger_edit), (self.close_label, self.close_edit),
+                              (self.be_label, self.be_combo)):
+            grid_layout.addWidget(label)
+            grid_layout.addWidget(widget)
+        grid_layout.addWidget(self.run_button)
+        bottom = QHBoxLayout()
+        bottom.addWidget(self.summary_label, 1)
+        bottom.addWidget(self.use_button)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addLayout(grid_layout)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.table, 1)
+        layout.addLayout(bottom)
+
+        self.retranslate_ui()
+        if parent is not None:
+            self.setStyleSheet(parent.styleSheet())
+
+    def retranslate_ui(self):
+        tr = self.translator.tr
+        self.setWindowTitle(tr("backtest_title"))
+        self.trades_label.setText(tr("backtest_trades"))
+        self.ticks_label.setText(tr("backtest_ticks"))
+        self.trades_browse.setText(tr("backtest_browse"))
+        self.ticks_browse.setText(tr("backtest_browse"))
+        self.trigger_label.setText(tr("backtest_trigger"))
+        self.close_label.setText(tr("backtest_close"))
+        self.be_label.setText(tr("action_be"))
+        current = self.be_combo.currentIndex()
+        self.be_combo.clear()
+        for mode in ("both", "on", "off"):
+            self.be_combo.addItem(tr(f"backtest_be_{mode}"), mode)
+        self.be_combo.setCurrentIndex(max(current, 0))
+        self.run_button.setText(tr("backtest_cancel") if self.sweep_thread is not None else tr("backtest_run"))
+        self.use_button.setText(tr("backtest_use"))
+
+    def browse_trades(self):
+        path, _ = QFileDialog.getOpenFileName(self, self.translator.tr("backtest_trades"), self.trades_edit.text(), "CSV (*.csv *.txt)")
+        if path:
+            self.trades_edit.setText(path)
+
+    def browse_ticks(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, self.translator.tr("backtest_ticks"), "", "CSV (*.csv *.txt)")
+        if paths:
+            self.ticks_edit.setText("; ".join(paths))
+
+    # --- running ------------------------------------------------------
+    def toggle_run(self):
+        if self.sweep_thread is not None:
+            self.sweep_thread.requestInterruption()
+            return
+        tick_items = [item.strip() for item in self.ticks_edit.text().split(";") if item.strip()]
+        try:
+            grid = make_grid(parse_range(self.trigger_edit.text()), parse_range(self.close_edit.text()),
+                             be_modes(self.be_combo.currentData()))
+        except ValueError:
+            QMessageBox.warning(self, self.translator.tr("settings_input_error_title"), self.translator.tr("settings_input_error_message"))
+            return
+        for key, edit in (("backtest_trades", self.trades_edit), ("backtest_ticks", self.ticks_edit),
+                          ("backtest_trigger", self.trigger_edit), ("backtest_close", self.close_edit)):
+            self.settings.setValue(key, edit.text())
+
+        self.sweep_thread = SweepThread(self.trades_edit.text().strip(), tick_items, grid, self)
+        self.sweep_thread.progress.connect(self.show_progress)
+        self.sweep_thread.result_ready.connect(self.show_result)
+        self.sweep_thread.failed.connect(self.show_error)
+        self.sweep_thread.finished.connect(self.sweep_finished)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(True)
+        self.summary_label.setText(self.translator.tr("backtest_running", settings=len(grid["trigger"])))
+        self.sweep_thread.start()
+        self.retranslate_ui()
+
+    def show_progress(self, done, total):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def show_result(self, result):
+        self.model.set_result(result)
+        base = result.baseline_stats()
+        self.summary_label.setText(self.translator.tr(
+            "backtest_summary", trades=len(result.trades), skipped=result.skipped,
+            elapsed=result.elapsed, total=base["total"], win=base["win_rate"]))
+        self.use_button.setEnabled(bool(self.model.rows))
+        if self.model.rows:
+            self.table.selectRow(0)
+
+    def show_error(self, message):
+        self.summary_label.setText("")
+        QMessageBox.warning(self, self.translator.tr("backtest_title"), message)
+
+    def sweep_finished(self):
+        self.sweep_thread = None
+        self.progress_bar.setVisible(False)
+        self.retranslate_ui()
+
+    def use_selected(self):
+        rows = self.table.selectionModel().selectedRows()
+        if rows:
+            row = self.model.rows[rows[0].row()]
+            self.selected_setting = {"triggerPercent": row["trigger"], "closePercent": row["close"], "moveToBE": row["be"]}
+            self.accept()
+
+    def done(self, result):
+        # No wait() here: run_sweep sees the request within its poll interval and sweep_finished cleans up
+        if self.sweep_thread is not None:
+            self.sweep_thread.requestInterruption()
+        super().done(result)
@@ -0,0 +1,235 @@
+# FILE: benchmarks/bench_dashboard.py
+"""
+Headless benchmark for the dashboard's model/render path.
+
+Feeds synthetic trade_data frames through the same path a relay frame takes
+(TradeDecoder -> MainWindow.handle_message -> TradeTableModel -> painted viewport)
+under QT_QPA_PLATFORM=offscreen, and records per-update latency percentiles,
+peak RSS and Python object / widget counts. Every scenario runs in a fresh
+subprocess so peak RSS is per scenario. Results are written as JSON so runs
+can be compared across commits:
+
+    python benchmarks/bench_dashboard.py --output before.json
+    python benchmarks/bench_dashboard.py --output after.json --compare before.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Peak memory comes from resource on POSIX and from psutil, if installed, on Windows; otherwise it is left out
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DASHBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, positions, churn, change_ratio)
+SCENARIOS = [
+    (f"{kind}-{positions}", positions, churn, change_ratio)
+    for positions in (10, 100, 1000, 10000, 50000)
+    for kind, churn, change_ratio in (("profit", 0.0, 0.5), ("churn1", 0.01, 0.5), ("churn10", 0.10, 0.2))
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def peak_rss_kb():
+    """ Peak resident set size of this process in KB, or None when it can't be measured here. """
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) // 1024  # peak_wset is the Windows peak
+    return None
+
+
+def format_mb(kb):
+    return f"{kb / 1024:.1f}" if kb is not None else "n/a"
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(ordered, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+# ===================================================================
+# 1. One scenario (runs inside the child process)
+# ===================================================================
+def run_scenario(name, positions, churn, change_ratio, updates, sort_column):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, DASHBOARD_DIR)
+    os.chdir(DASHBOARD_DIR)  # Stylesheets are loaded relative to the dashboard folder
+
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import Qt, QSettings
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    from app_logic import MainWindow
+    from synthetic import SyntheticBook
+    from trade_store import TradeDecoder
+
+    # Settings in a throwaway scope, so no synthetic book reaches the user's history, alert log or preferences
+    scope = tempfile.mkdtemp(prefix="bench_dashboard_")
+    settings = QSettings(os.path.join(scope, "settings.ini"), QSettings.Format.IniFormat)
+    settings.setValue("history_enabled", False)
+    settings.setValue("alert_rules_path", os.path.join(scope, "alerts.json"))  # Missing: no rules
+    settings.setValue("alert_log_path", os.path.join(scope, "alerts.log"))
+
+    # Point the window at a closed port; the benchmark drives it directly
+    window = MainWindow(relays=["bench=127.0.0.1:9"], settings=settings)
+    window.resize(1200, 800)
+    window.show()
+    if sort_column is not None:
+        window.trade_table.sortByColumn(sort_column, Qt.SortOrder.DescendingOrder)
+    app.processEvents()
+
+    book = SyntheticBook(positions, churn=churn, change_ratio=change_ratio, seed=positions)
+    decoder = TradeDecoder("bench")
+    source = "bench"
+
+    def apply(raw):
+        start = time.perf_counter()
+        message = decoder.decode(raw)
+        message["source"] = source
+        decoded = time.perf_counter()
+        window.handle_message(message)
+        app.processEvents()
+        window.trade_table.viewport().repaint()
+        return decoded - start, time.perf_counter() - decoded
+
+    first_decode, first_render = apply(book.message())  # Initial load, reported separately
+    decode_samples, render_samples, total_samples = [], [], []
+    wire_bytes = 0
+    for _ in range(updates):
+        book.step()
+        raw = book.message()
+        wire_bytes += len(raw)
+        decode_time, render_time = apply(raw)
+        decode_samples.append(decode_time)
+        render_samples.append(render_time)
+        total_samples.append(decode_time + render_time)
+
+    gc.collect()
+    result = {
+        "scenario": name,
+        "positions": positions,
+        "churn": churn,
+        "change_ratio": change_ratio,
+        "updates": updates,
+        "sort_column": sort_column,
+        "initial_load_ms": round((first_decode + first_render) * 1000, 3),
+        "decode": summarize(decode_samples),
+        "render": summarize(render_samples),
+        "total": summarize(total_samples),
+        "avg_frame_bytes": wire_bytes // max(updates, 1),
+        "peak_rss_kb": peak_rss_kb(),
+        "python_objects": len(gc.get_objects()),
+        "widgets": len(QApplication.allWidgets()),
+        "rows": window.trade_model.rowCount(),
+    }
+    print(json.dumps(result), flush=True)
+    shutil.rmtree(scope, ignore_errors=True)
+    os._exit(0)  # Skip the teardown of the idle network threads
+
+# ===================================================================
+# 2. Driver
+# ===================================================================
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=DASHBOARD_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    print(f"\n{'scenario':<16}{'p50 total':>22}{'p99 total':>22}{'peak RSS MB':>20}")
+    for r in results:
+        old = baseline.get(r["scenario"])
+        if not old:
+            continue
+        def to_mb(kb):
+            return kb / 1024 if kb is not None else None
+        def fmt(new, prev):
+            if new is None or prev is None:
+                return "n/a"
+            change = (new - prev) / prev * 100 if prev else 0.0
+            return f"{prev:.2f}->{new:.2f} ({change:+.0f}%)"
+        print(f"{r['scenario']:<16}{fmt(r['total']['p50_ms'], old['total']['p50_ms']):>22}"
+              f"{fmt(r['total']['p99_ms'], old['total']['p99_ms']):>22}"
+              f"{fmt(to_mb(r['peak_rss_kb']), to_mb(old.get('peak_rss_kb'))):>20}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless dashboard model/render benchmark.")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--updates", type=int, default=50, help="updates per scenario")
+    parser.add_argument("--max-positions", type=int, default=50000, help="skip scenarios larger than this")
+    parser.add_argument("--filter", default="", help="only run scenarios whose name contains this text")
+    parser.add_argument("--sort-column", type=int, default=None, help="sort the table by this column (4 = profit)")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        spec = json.loads(args.run_one)
+        run_scenario(spec["name"], spec["positions"], spec["churn"], spec["change_ratio"], spec["updates"], spec["sort_column"])
+        return
+
+    results = []
+    for name, positions, churn, change_ratio in SCENARIOS:
+        if positions > args.max_positions or args.filter not in name:
+            continue
+        spec = json.dumps({"name": name, "positions": positions, "churn": churn, "change_ratio": change_ratio,
+                           "updates": args.updates, "sort_column": args.sort_column})
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-one", spec],
+                                   env=env, capture_output=True, text=True)
+        lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+        if completed.returncode != 0 or not lines:
+            print(f"{name}: failed\n{completed.stderr}", file=sys.stderr)
+            continue
+        result = json.loads(lines[-1])
+        results.append(result)
+        print(f"{name:<16} total p50 {result['total']['p50_ms']:>9.2f} ms  p99 {result['total']['p99_ms']:>9.2f} ms  "
+              f"decode p50 {result['decode']['p50_ms']:>8.2f} ms  RSS {format_mb(result['peak_rss_kb']):>7} MB  "
+              f"objects {result['python_objects']:>8}  widgets {result['widgets']:>4}")
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
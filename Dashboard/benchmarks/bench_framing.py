@@ -0,0 +1,96 @@
+# FILE: benchmarks/bench_framing.py
+"""
+Bytes on the wire and decode time of the relay's four encodings of the same EA posts:
+JSON snapshots, JSON deltas, binary snapshots and binary deltas.
+
+Synthetic posts go through relay_stub.Relay.publish to one stand-in client per encoding, so the
+frames are exactly what a dashboard would receive. Sizes are given raw and deflated the way
+permessage-deflate does it (one raw deflate stream per connection, sync-flushed per message);
+decode time is TradeDecoder.decode on the dashboard side.
+
+    python benchmarks/bench_framing.py --positions 1000 --updates 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+
+DASHBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DASHBOARD_DIR)
+
+from relay_stub import Relay
+from synthetic import SyntheticBook
+from trade_store import TradeDecoder
+
+ENCODINGS = (  # (name, delta, binary)
+    ("json-snapshot", False, False),
+    ("json-delta", True, False),
+    ("binary-snapshot", False, True),
+    ("binary-delta", True, True),
+)
+
+
+class Capture:
+    """ Stands in for relay_stub.WsClient and measures what it is sent. """
+    def __init__(self, name, delta, binary):
+        self.name = name
+        self.delta = delta
+        self.binary = binary
+        self.synced = False
+        self.decoder = TradeDecoder("bench")
+        self.compressor = zlib.compressobj(wbits=-15)
+        self.raw_bytes = 0
+        self.deflated_bytes = 0
+        self.decode_s = 0.0
+        self.messages = 0
+
+    def _receive(self, payload):
+        self.raw_bytes += len(payload)
+        # permessage-deflate drops the 4-byte 00 00 ff ff tail of each sync flush
+        self.deflated_bytes += len(self.compressor.compress(payload) + self.compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+        start = time.perf_counter()
+        message = self.decoder.decode(payload)
+        self.decode_s += time.perf_counter() - start
+        if message is None:
+            raise RuntimeError(f"{self.name}: frame was not applied")
+        self.messages += 1
+
+    def send_text(self, text):
+        self._receive(text.encode("utf-8"))
+
+    def send_binary(self, payload):
+        self._receive(payload)
+
+
+def run(positions, updates, churn, change_ratio):
+    relay = Relay(0.0)
+    clients = [Capture(*encoding) for encoding in ENCODINGS]
+    relay.clients.update(clients)
+    book = SyntheticBook(positions, churn=churn, change_ratio=change_ratio, seed=positions)
+    for _ in range(updates):
+        book.step()
+        relay.publish(json.loads(json.dumps(book.payload())))  # A fresh dict per post, as parsed from the EA's POST
+    return clients
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relay frame size and decode time per encoding.")
+    parser.add_argument("--positions", type=int, default=1000)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--churn", type=float, default=0.01)
+    parser.add_argument("--change-ratio", type=float, default=0.3)
+    args = parser.parse_args()
+
+    clients = run(args.positions, args.updates, args.churn, args.change_ratio)
+    print(f"{args.positions} positions, {args.updates} updates, churn {args.churn}, change ratio {args.change_ratio}")
+    print(f"{'encoding':<16} {'raw B/update':>13} {'deflated B/update':>18} {'decode us/update':>17}")
+    for client in clients:
+        n = client.messages or 1
+        print(f"{client.name:<16} {client.raw_bytes / n:>13.0f} {client.deflated_bytes / n:>18.0f} "
+              f"{client.decode_s / n * 1e6:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# FILE: binary_frames.py
+"""
+Binary trade frames, the "binary" feature of protocol 2.
+
+A dashboard that lists "binary" in its hello receives trade_data and trade_delta as binary
+WebSocket messages in this fixed layout instead of JSON; relays that don't know the feature
+ignore it and keep sending JSON, which the dashboard still decodes. Field names are not
+repeated per position, numbers are not formatted and parsed, and the symbol is a small index.
+Everything is little-endian:
+
+    frame header   magic "ATB1", kind (1 snapshot, 2 delta), seq, byte size of the JSON part
+                   and the number of opened, moved, changed and closed rows
+    JSON           the payload header (symbol, total_pl, balance, ts, ...) with the symbol table
+                   entries under "symbols", starting at index "symbols_from"
+    opened rows    OPEN_ROW per new position (every position, in a snapshot)
+    moved rows     MOVE_ROW per position of which only the profit and price changed, the usual case
+    changed rows   CHANGE_ROW per position whose volume, flags, SL or TP changed as well
+    closed rows    the ticket of each position that closed
+
+The symbol table only grows. A snapshot carries all of it and a delta the entries added since
+the previous delta, so a receiver that missed a delta (and with it some entries) has to resync
+anyway and gets the whole table back with the snapshot.
+
+This module only uses the standard library, so relay_stub.py can share it.
+"""
+import json
+import struct
+import sys
+
+MAGIC = b"ATB1"
+KIND_SNAPSHOT = 1
+KIND_DELTA = 2
+
+FRAME_HEADER = struct.Struct("<4sB3xQIIIII")  # magic, kind, seq, JSON bytes, opened, moved, changed, closed
+OPEN_ROW = struct.Struct("<QHBdddddd")         # ticket, symbol index, flags, volume, profit, open_price, sl, tp, price
+MOVE_ROW = struct.Struct("<Qdd")               # ticket, profit, price
+CHANGE_ROW = struct.Struct("<QBddddd")         # ticket, flags, volume, profit, sl, tp, price
+MOVE_FIELDS = ("profit", "price")             # The only fields a MOVE_ROW carries
+TICKET = struct.Struct("<Q")
+
+FLAG_SELL = 0x01
+FLAG_ATM = 0x02
+FLAG_RULE_APPLIED = 0x04
+
+
+def flags_of(trade):
+    return ((FLAG_SELL if trade.get("type") == "Sell" else 0) | (FLAG_ATM if trade.get("atm_enabled", True) else 0)
+            | (FLAG_RULE_APPLIED if trade.get("rule_applied") else 0))
+
+# ===================================================================
+# 1. Encoder (relay side)
+# ===================================================================
+class FrameEncoder:
+    """ Encodes the EA's payloads for binary clients. One encoder, and one symbol table, per relay. """
+    def __init__(self):
+        self.symbols = []
+        self.symbol_index = {}
+        self.sent_symbols = 0  # Entries already carried by a delta
+
+    def _symbol(self, name):
+        index = self.symbol_index.get(name)
+        if index is None:
+            if len(self.symbols) > 0xFFFF:
+                raise ValueError("More than 65536 symbols")
+            index = self.symbol_index[name] = len(self.symbols)
+            self.symbols.append(name)
+        return index
+
+    def _open_rows(self, trades):
+        pack = OPEN_ROW.pack
+        return b"".join(pack(trade.get("ticket", 0), self._symbol(trade.get("symbol", "")), flags_of(trade),
+                             trade.get("volume", 0.0), trade.get("profit", 0.0), trade.get("open_price", 0.0),
+                             trade.get("sl", 0.0), trade.get("tp", 0.0), trade.get("price", 0.0))
+                        for trade in trades)
+
+    def _frame(self, kind, seq, header, opened, moved=(), changed=(), closed=()):
+        rows = self._open_rows(opened)  # May add symbols, so before the header is serialized
+        if kind == KIND_SNAPSHOT:
+            header = dict(header, symbols_from=0, symbols=self.symbols)
+        else:
+            header = dict(header, symbols_from=self.sent_symbols, symbols=self.symbols[self.sent_symbols:])
+            self.sent_symbols = len(self.symbols)
+        text = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        pack = CHANGE_ROW.pack
+        return b"".join((
+            FRAME_HEADER.pack(MAGIC, kind, seq or 0, len(text), len(opened), len(moved), len(changed), len(closed)),
+            text, rows,
+            b"".join(MOVE_ROW.pack(trade.get("ticket", 0), trade.get("profit", 0.0), trade.get("price", 0.0)) for trade in moved),
+            b"".join(pack(trade.get("ticket", 0), flags_of(trade), trade.get("volume", 0.0), trade.get("profit", 0.0),
+                          trade.get("sl", 0.0), trade.get("tp", 0.0), trade.get("price", 0.0)) for trade in changed),
+            struct.pack(f"<{len(closed)}Q", *closed)))
+
+    def snapshot(self, seq, data):
+        """ data is the EA's payload. """
+        trades = data.get("trades") or ()
+        return self._frame(KIND_SNAPSHOT, seq, {key: value for key, value in data.items() if key != "trades"}, trades)
+
+    def delta(self, seq, header, opened, moved, changed, closed):
+        """ opened, moved and changed are the positions' complete current dicts; closed their tickets. """
+        return self._frame(KIND_DELTA, seq, header, opened, moved, changed, closed)
+
+# ===================================================================
+# 2. Decoding (dashboard side)
+# ===================================================================
+def is_frame(raw):
+    return isinstance(raw, (bytes, bytearray, memoryview)) and raw[:4] == MAGIC
+
+
+def read_frame(raw):
+    """
+    Splits a frame into (kind, seq, header, opened, moved, changed, closed): header is the decoded JSON part,
+    opened, moved and changed iterate over row tuples in the OPEN_ROW, MOVE_ROW and CHANGE_ROW layouts,
+    closed is a tuple of tickets.
+    """
+    magic, kind, seq, text_size, opened, moved, changed, closed = FRAME_HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError("Not a binary trade frame")
+    view = memoryview(raw)
+    pos = FRAME_HEADER.size
+    header = json.loads(bytes(view[pos:pos + text_size]))
+    pos += text_size
+    end = pos + opened * OPEN_ROW.size
+    opened_rows = OPEN_ROW.iter_unpack(view[pos:end])
+    pos, end = end, end + moved * MOVE_ROW.size
+    moved_rows = MOVE_ROW.iter_unpack(view[pos:end])
+    pos, end = end, end + changed * CHANGE_ROW.size
+    changed_rows = CHANGE_ROW.iter_unpack(view[pos:end])
+    closed_tickets = struct.unpack_from(f"<{closed}Q", view, end)
+    return kind, seq, header, opened_rows, moved_rows, changed_rows, closed_tickets
+
+
+def update_symbols(table, header):
+    """ Merges the frame's symbol entries into table. Returns False when entries before them are missing. """
+    start = header.pop("symbols_from", 0)
+    entries = header.pop("symbols", ())
+    if start > len(table):
+        return False
+    table[start:start + len(entries)] = [sys.intern(name) for name in entries]
+    return True
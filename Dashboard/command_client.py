@@ -0,0 +1,497 @@
+# FILE: command_client.py
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+from latency import LatencyHistogram
+
+COMMAND_URL = "http://127.0.0.1:5000/command"
+
+# ===================================================================
+# 1. Minimal keep-alive HTTP/1.1 connection on asyncio streams
+# ===================================================================
+class HttpConnection:
+    """
+    A single persistent HTTP/1.1 connection to the relay.
+    The socket is opened lazily and reused for every request until the server
+    closes it or a request fails, in which case the next request reconnects.
+    stage tells how far the last request got: "connecting", "sending" or "receiving".
+    """
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.stage = None
+
+    async def request(self, method, path, body=None):
+        """ Sends one request and returns (status_code, body_bytes). """
+        # A keep-alive socket the relay has closed meanwhile would swallow the request
+        if self.writer is None or self.writer.is_closing() or self.reader.at_eof():
+            await self.close()
+            self.stage = "connecting"
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        body = body or b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Connection: keep-alive\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        )
+        self.stage = "sending"
+        self.writer.write(head.encode("latin-1") + body)
+        await self.writer.drain()
+
+        self.stage = "receiving"
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split(b" ", 2)[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            payload = b""
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b"\r\n")
+                    break
+                payload += await self.reader.readexactly(size + 2)
+                payload = payload[:-2]
+        else:
+            payload = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, payload
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (OSError, ConnectionError):
+                pass
+        self.reader = self.writer = None
+
+# ===================================================================
+# 2. Non-blocking command client
+# ===================================================================
+class CommandClient:
+    """
+    Sends commands to relays from a dedicated worker event loop so the caller never blocks.
+    submit() returns a concurrent.futures.Future that resolves to True when the relay accepted
+    the command. Each relay URL gets one keep-alive connection and its own ordered queue, so
+    commands to one relay keep their order while several relays are served concurrently from
+    the same loop. Every command has its own timeout and retry budget, but a command is only
+    sent again when it cannot have reached the relay: close_all, a partial close or a batch
+    must not run twice because a response was slow. At most max_pending commands may be
+    outstanding; further submissions are rejected immediately instead of piling up behind a
+    dead relay.
+    """
+    RETRY_DELAY = 0.25
+
+    def __init__(self, url=COMMAND_URL, timeout=2.0, retries=1, max_pending=64):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._channels = {}  # url -> (HttpConnection, asyncio.Queue, worker task)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="CommandClient", daemon=True)
+        self._thread.start()
+
+    def submit(self, payload, url=None, timeout=None, retries=None):
+        """ Queues a command for delivery to url (default: the client's url) and returns a Future[bool]. Never blocks. """
+        future = Future()
+        with self._lock:
+            if self.pending >= self.max_pending or self._loop.is_closed():
+                print(f"[API Client] ❌ Command queue full, dropping: {payload}")
+                future.set_result(False)
+                return future
+            self.pending += 1
+        job = (payload, self.timeout if timeout is None else timeout, self.retries if retries is None else retries, future)
+        self._loop.call_soon_threadsafe(self._enqueue, url or self.url, job)
+        return future
+
+    def _enqueue(self, url, job):
+        channel = self._channels.get(url)
+        if channel is None:
+            parts = urlsplit(url)
+            queue = asyncio.Queue()
+            connection = HttpConnection(parts.hostname, parts.port or 80)
+            worker = self._loop.create_task(self._consume(connection, parts.path or "/", queue))
+            channel = self._channels[url] = (connection, queue, worker)
+        channel[1].put_nowait(job)
+
+    async def _consume(self, connection, path, queue):
+        while True:
+            payload, timeout, retries, future = await queue.get()
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = await self._deliver(connection, path, payload, timeout, retries)
+                    except asyncio.CancelledError:
+                        future.set_result(False)
+                        raise
+                    future.set_result(result)
+            finally:
+                with self._lock:
+                    self.pending -= 1
+
+    async def _deliver(self, connection, path, payload, timeout, retries):
+        body = json.dumps(payload).encode("utf-8")
+        for attempt in range(retries + 1):
+            try:
+                print(f"[API Client] 📤 Sending command: {payload}")
+                status, response = await asyncio.wait_for(connection.request("POST", path, body), timeout)
+                if status == 200:
+                    return True
+                print(f"[API Client] ❌ Error sending command: {response.decode('utf-8', 'replace')}")
+                return False
+            except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+                # A half-read response leaves the stream unusable; start the next attempt on a fresh socket
+                stage = connection.stage
+                await connection.close()
+                print(f"[API Client] ❌ Server connection error while sending command: {e!r}")
+                if not self.undelivered(stage, e):
+                    print(f"[API Client] ⚠️ Not resending, the relay may already have it: {payload}")
+                    return False
+                if attempt < retries:
+                    await asyncio.sleep(self.RETRY_DELAY * (attempt + 1))
+        return False
+
+    @staticmethod
+    def undelivered(stage, error):
+        """ True when the failed request cannot have reached the relay, so sending it again is safe. """
+        if stage == "connecting":
+            return True
+        # A reset while writing: the relay dropped the connection before the whole request reached it
+        return stage == "sending" and isinstance(error, (ConnectionResetError, BrokenPipeError))
+
+    def close(self):
+        """ Stops the worker loop; commands still queued resolve to False. """
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=1)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1)
+        self._loop.close()
+
+    async def _shutdown(self):
+        for connection, queue, worker in self._channels.values():
+            worker.cancel()
+            while not queue.empty():
+                _, _, _, future = queue.get_nowait()
+                if future.set_running_or_notify_cancel():
+                    future.set_result(False)
+            await connection.close()
+
+# ===================================================================
+# 3. Client-side batching of ticket commands
+# ===================================================================
+BATCHABLE_ACTIONS = ("close", "breakeven", "toggle_atm_trade")
+
+
+class PendingTicket:
+    """ What is still to be sent for one ticket. atm is (target_state, state_before_the_first_toggle). """
+    __slots__ = ("close", "breakeven", "atm", "callbacks")
+
+    def __init__(self):
+        self.close = False
+        self.breakeven = False
+        self.atm = None
+        self.callbacks = []
+
+
+class CommandBatcher:
+    """
+    Collects per-ticket commands for a short window and merges them into one payload per relay.
+    The EA pops a single command per poll, so twenty separate clicks would take forty seconds to
+    execute; a batch takes one poll. Redundant work is dropped while merging: repeated clicks count
+    once, an ATM toggle that is flipped back before the flush is not sent at all, and a close makes
+    pending break-even and ATM changes for the same ticket moot.
+
+    Callbacks receive the batch's success flag; callbacks of dropped actions are called with True.
+    """
+    def __init__(self):
+        self._pending = {}  # source -> {ticket: PendingTicket}
+
+    def __bool__(self):
+        return bool(self._pending)
+
+    def add(self, source, payload, callback=None):
+        action = payload.get("action")
+        if action not in BATCHABLE_ACTIONS:
+            raise ValueError(f"Not a ticket command: {action}")
+        ticket = payload["ticket"]
+        tickets = self._pending.setdefault(source, {})
+        entry = tickets.get(ticket)
+        if entry is None:
+            entry = tickets[ticket] = PendingTicket()
+        if callback:
+            entry.callbacks.append(callback)
+
+        if action == "close":
+            entry.close = True
+            entry.breakeven = False
+            entry.atm = None
+        elif entry.close:
+            pass  # Already being closed
+        elif action == "breakeven":
+            entry.breakeven = True
+        else:
+            state = bool(payload.get("atm_trade_state"))
+            if entry.atm is None:
+                entry.atm = (state, not state)
+            elif state == entry.atm[1]:
+                entry.atm = None  # Flipped back before it was sent
+            else:
+                entry.atm = (state, entry.atm[1])
+
+        if not (entry.close or entry.breakeven or entry.atm):
+            del tickets[ticket]
+            if not tickets:
+                del self._pending[source]
+            for cancelled in entry.callbacks:
+                cancelled(True)
+
+    def take(self):
+        """ Empties the batcher and returns [(source, payload, callbacks)], one entry per relay. """
+        batches = []
+        for source, tickets in self._pending.items():
+            close, breakeven, atm_on, atm_off, callbacks = [], [], [], [], []
+            for ticket, entry in tickets.items():
+                if entry.close:
+                    close.append(ticket)
+                if entry.breakeven:
+                    breakeven.append(ticket)
+                if entry.atm:
+                    (atm_on if entry.atm[0] else atm_off).append(ticket)
+                callbacks.extend(entry.callbacks)
+            batches.append((source, self.build_payload(close, breakeven, atm_on, atm_off), callbacks))
+        self._pending = {}
+        return batches
+
+    @staticmethod
+    def build_payload(close, breakeven, atm_on, atm_off):
+        # A lone command keeps its original form, which every EA version understands
+        if len(close) + len(breakeven) + len(atm_on) + len(atm_off) == 1:
+            if close:
+                return {"action": "close", "ticket": close[0]}
+            if breakeven:
+                return {"action": "breakeven", "ticket": breakeven[0]}
+            ticket = (atm_on or atm_off)[0]
+            return {"action": "toggle_atm_trade", "ticket": ticket, "atm_trade_state": bool(atm_on)}
+        payload = {"action": "batch"}
+        for name, tickets in (("close", close), ("breakeven", breakeven), ("atm_on", atm_on), ("atm_off", atm_off)):
+            if tickets:
+                payload[name] = tickets
+        return payload
+
+# ===================================================================
+# 4. Acknowledgement tracking
+# ===================================================================
+class PendingAction:
+    """ One ticket command waiting for a snapshot that shows its effect. """
+    __slots__ = ("action", "target", "volume", "command_id", "queued_at", "sent_at")
+
+    def __init__(self, action, target, volume, queued_at):
+        self.action = action
+        self.target = target      # atm_enabled state for toggles, the entry price for break-even
+        self.volume = volume
+        self.command_id = None
+        self.queued_at = queued_at
+        self.sent_at = None
+
+
+class PendingCommands:
+    """
+    Tracks ticket commands from the click until a later trade_data snapshot shows their effect.
+    The relay only acknowledges that a command was queued; whether and when the EA executed it
+    is inferred from the positions: a close is done once the ticket is gone (or its volume
+    dropped), an ATM toggle once atm_enabled matches, a break-even once the SL sits on the entry.
+    Each sent payload is tagged with an id, and the time from sending to the confirming snapshot
+    is recorded per action. Commands without a confirmation after `timeout` seconds are dropped.
+
+    While an action is pending the same action is not sent again for that ticket, and a pending
+    close blocks everything else. An ATM toggle that has not been sent yet may still be flipped
+    back; the batcher then drops it.
+    """
+    OUTCOMES = ("confirmed", "gone", "failed", "timed_out")
+
+    def __init__(self, timeout=30.0, clock=time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        self.next_id = 1
+        self.reset()
+
+    def reset(self):
+        self._pending = {}  # source -> {ticket: {action: PendingAction}}
+        self.histograms = {action: LatencyHistogram() for action in BATCHABLE_ACTIONS}
+        self.outcomes = {action: Counter() for action in BATCHABLE_ACTIONS}
+
+    def __bool__(self):
+        return bool(self._pending)
+
+    def actions(self, key):
+        """ {action: PendingAction} for a (source, ticket) key. """
+        source, ticket = key
+        return self._pending.get(source, {}).get(ticket) or {}
+
+    def blocked(self, key):
+        """ The actions that must not be sent for this ticket right now. """
+        actions = self.actions(key)
+        if not actions:
+            return ()
+        if "close" in actions:
+            return BATCHABLE_ACTIONS
+        atm = actions.get("toggle_atm_trade")
+        return tuple(action for action in actions if action != "toggle_atm_trade" or atm.sent_at is not None)
+
+    def begin(self, key, action, trade, target=None):
+        """
+        Registers a command about to be queued. Returns False when it would duplicate a pending one.
+        A break-even can only be confirmed when the EA reports entry prices; without them it is not tracked.
+        """
+        source, ticket = key
+        if action in self.blocked(key):
+            return False
+        if action == "breakeven":
+            if not trade.open_price:
+                return True
+            target = trade.open_price
+        tickets = self._pending.setdefault(source, {})
+        actions = tickets.setdefault(ticket, {})
+        current = actions.get(action)
+        if current is not None and action == "toggle_atm_trade" and current.target != target:
+            # Flipped back before the batch went out; nothing will be sent
+            del actions[action]
+            self._discard(source, ticket)
+            return True
+        if current is None:
+            actions[action] = PendingAction(action, target, trade.volume, self.clock())
+        return True
+
+    def _tickets_of(self, payload):
+        if payload.get("action") == "batch":
+            return {"close": payload.get("close", ()), "breakeven": payload.get("breakeven", ()),
+                    "toggle_atm_trade": list(payload.get("atm_on", ())) + list(payload.get("atm_off", ()))}
+        return {payload.get("action"): (payload.get("ticket"),)}
+
+    def sent(self, source, payload):
+        """ Tags a payload with a command id and starts the round-trip clock of its tickets. """
+        command_id = payload["id"] = self.next_id
+        self.next_id += 1
+        now = self.clock()
+        tickets = self._pending.get(source, {})
+        for action, numbers in self._tickets_of(payload).items():
+            for ticket in numbers:
+                entry = tickets.get(ticket, {}).get(action)
+                if entry is not None:
+                    entry.command_id = command_id
+                    entry.sent_at = now
+        return command_id
+
+    def failed(self, source, payload):
+        """ The relay refused the payload: its tickets are no longer pending. Returns their keys. """
+        tickets = self._pending.get(source, {})
+        keys = []
+        for action, numbers in self._tickets_of(payload).items():
+            for ticket in numbers:
+                entry = tickets.get(ticket, {}).get(action)
+                if entry is not None and entry.command_id == payload.get("id"):
+                    del tickets[ticket][action]
+                    self.outcomes[action]["failed"] += 1
+                    self._discard(source, ticket)
+                    keys.append((source, ticket))
+        return keys
+
+    def observe(self, source, get_trade):
+        """
+        Checks one source's pending tickets against its latest snapshot; get_trade(ticket) returns
+        the current TradeRecord or None. Returns the keys whose pending state changed.
+        """
+        tickets = self._pending.get(source)
+        if not tickets:
+            return []
+        now = self.clock()
+        keys = []
+        for ticket in list(tickets):
+            trade = get_trade(ticket)
+            actions = tickets[ticket]
+            for action, entry in list(actions.items()):
+                if trade is None:
+                    # Gone before the command even left (e.g. stopped out) is not a confirmation
+                    outcome = "confirmed" if action == "close" and entry.sent_at is not None else "gone"
+                elif entry.sent_at is None:
+                    continue  # A snapshot taken before the command left can't confirm it
+                elif action == "close":
+                    outcome = "confirmed" if trade.volume < entry.volume else None
+                elif action == "toggle_atm_trade":
+                    outcome = "confirmed" if trade.atm_enabled == entry.target else None
+                else:
+                    outcome = "confirmed" if trade.sl == entry.target else None
+                if outcome is None:
+                    continue
+                del actions[action]
+                self.outcomes[action][outcome] += 1
+                if outcome == "confirmed":
+                    self.histograms[action].record((now - entry.sent_at) * 1e6)
+                keys.append((source, ticket))
+            if not actions:
+                del tickets[ticket]
+        if not tickets:
+            del self._pending[source]
+        return keys
+
+    def expire(self):
+        """ Drops commands that were never confirmed. Returns [(key, PendingAction)] of the dropped ones. """
+        horizon = self.clock() - self.timeout
+        expired = []
+        for source, tickets in list(self._pending.items()):
+            for ticket, actions in list(tickets.items()):
+                for action, entry in list(actions.items()):
+                    if (entry.sent_at or entry.queued_at) < horizon:
+                        del actions[action]
+                        self.outcomes[action]["timed_out"] += 1
+                        expired.append(((source, ticket), entry))
+                self._discard(source, ticket)
+        return expired
+
+    def _discard(self, source, ticket):
+        tickets = self._pending.get(source)
+        if tickets is not None and not tickets.get(ticket, True):
+            del tickets[ticket]
+            if not tickets:
+                del self._pending[source]
+
+    def pending_atm(self, source):
+        """ (key, target_state) of every ATM toggle still waiting on a source, to keep the optimistic state on screen. """
+        return [((source, ticket), actions["toggle_atm_trade"].target)
+                for ticket, actions in self._pending.get(source, {}).items() if "toggle_atm_trade" in actions]
+
+    def summary(self):
+        return {action: dict(self.histograms[action].summary(), **{outcome: self.outcomes[action][outcome] for outcome in self.OUTCOMES},
+                             pending=sum(action in actions for tickets in self._pending.values() for actions in tickets.values()))
+                for action in BATCHABLE_ACTIONS}
+
+    def format_table(self):
+        lines = [f"{'command':<9}{'n':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  ms  pending/lost"]
+        names = {"close": "close", "breakeven": "be", "toggle_atm_trade": "atm"}
+        for action, s in self.summary().items():
+            lines.append(f"{names[action]:<9}{s['count']:>7}{s['p50_ms']:>9.0f}{s['p90_ms']:>9.0f}{s['p99_ms']:>9.0f}{s['max_ms']:>9.0f}"
+                         f"  {s['pending']}/{s['failed'] + s['timed_out']}")
+        return "\n".join(lines)
@@ -0,0 +1,466 @@
+# FILE: ea_simulator.py
+"""
+Stand-in for the MQL5 EA, to load-test the relay and dashboard path on any OS.
+
+Each simulated terminal runs the EA's OnTimer loop: every timer period it posts a
+GenerateAndQueueState payload to /data, every 2nd period it polls /get-command and executes
+what it gets on its synthetic book, and every 5th period it polls /get-settings. As in MQL5,
+WebRequest blocks the timer (500 ms timeout) and timer events that fire meanwhile are lost.
+
+The simulator also plays the dashboard: it posts ticket commands to /command at a given rate and
+watches every relay over WebSocket (the dashboard's own RelayListener), so it can report
+end-to-end throughput, post -> dashboard latency, command round-trip latency and drop rates.
+
+    python ea_simulator.py --spawn-relays --terminals 20 --positions 500 --timer-ms 250 --duration 60
+    python ea_simulator.py --relay 127.0.0.1:5000 --positions 2000 --churn 0.01 --command-rate 2
+
+Use one relay per terminal, as with real terminals: relays keep a single command queue and
+a single "latest state", so terminals sharing one relay steal each other's commands.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+from command_client import HttpConnection
+from ingest import RelayListener, parse_endpoints
+from latency import LatencyHistogram
+from synthetic import SyntheticBook
+
+COMMAND_ACTIONS = ("close", "toggle_atm_trade", "breakeven")
+
+# ===================================================================
+# 1. Measurements
+# ===================================================================
+class Metrics:
+    """ Counters and latency histograms shared by every simulated terminal (one asyncio loop, no locking). """
+    def __init__(self):
+        self.counters = Counter()
+        self.histograms = defaultdict(LatencyHistogram)
+        self.started = time.perf_counter()
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def record(self, name, seconds):
+        self.histograms[name].record(seconds * 1e6)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class SentCommand:
+    """ A ticket command posted by the simulated dashboard, followed until the EA fetched it and its effect shows. """
+    __slots__ = ("source", "ticket", "action", "expected", "sent", "fetched", "visible")
+
+    def __init__(self, source, ticket, action, expected):
+        self.source = source
+        self.ticket = ticket
+        self.action = action
+        self.expected = expected   # atm state a toggle should produce
+        self.sent = time.perf_counter()
+        self.fetched = None
+        self.visible = None
+
+
+class CommandTracker:
+    """ Matches commands (by the sim_id field the relays pass through untouched) to their fetch and effect. """
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.commands = {}
+        self.awaiting_effect = defaultdict(dict)  # source -> {sim_id: SentCommand}
+        self.next_id = 1
+
+    def sent(self, source, ticket, action, expected=None):
+        command_id = self.next_id
+        self.next_id += 1
+        self.commands[command_id] = SentCommand(source, ticket, action, expected)
+        return command_id
+
+    def fetched(self, command_id):
+        command = self.commands.get(command_id)
+        if command is None or command.fetched is not None:
+            return
+        command.fetched = time.perf_counter()
+        self.metrics.record("command_fetch", command.fetched - command.sent)
+        # Breakeven is ignored by the EA for losing trades, so it has no reliably visible effect
+        if command.action != "breakeven":
+            self.awaiting_effect[command.source][command_id] = command
+
+    def observe(self, source, records):
+        """ Called with the dashboard's current records of a relay after every frame. """
+        waiting = self.awaiting_effect.get(source)
+        if not waiting:
+            return
+        now = time.perf_counter()
+        for command_id, command in list(waiting.items()):
+            record = records.get(command.ticket)
+            if command.action == "close" and record is not None:
+                continue
+            if command.action == "toggle_atm_trade" and record is not None and record.atm_enabled != command.expected:
+                continue
+            command.visible = now
+            self.metrics.record("command_round_trip", now - command.sent)
+            del waiting[command_id]
+
+    def outcome(self):
+        fetched = sum(1 for command in self.commands.values() if command.fetched is not None)
+        visible = sum(1 for command in self.commands.values() if command.visible is not None)
+        trackable = sum(1 for command in self.commands.values() if command.fetched is not None and command.action != "breakeven")
+        return {"sent": len(self.commands), "fetched": fetched, "visible": visible,
+                "not_fetched": len(self.commands) - fetched, "effect_not_seen": trackable - visible}
+
+# ===================================================================
+# 2. Simulated terminal (the EA)
+# ===================================================================
+class SimulatedTerminal:
+    """ One MT5 terminal running core.mql5 on a synthetic book, talking to one relay. """
+    REQUEST_TIMEOUT = 0.5  # WebRequest timeout used by the EA
+
+    def __init__(self, index, endpoint, args, metrics, tracker):
+        self.name = f"T{index}"
+        self.endpoint = endpoint
+        self.metrics = metrics
+        self.tracker = tracker
+        self.timer = args.timer_ms / 1000.0
+        self.command_every = args.command_every
+        self.settings_every = args.settings_every
+        self.book = SyntheticBook(args.positions, args.churn, args.change_ratio, seed=index,
+                                  first_ticket=(index + 1) * 10_000_000)
+        host, _, port = endpoint.address.rpartition(":")
+        self.http = HttpConnection(host, int(port))
+
+    async def request(self, method, path, body=None):
+        """ One WebRequest: (status, body), or (None, None) after an error or the 500 ms timeout. """
+        try:
+            return await asyncio.wait_for(self.http.request(method, path, body), self.REQUEST_TIMEOUT)
+        except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            await self.http.close()  # A request cut off midway leaves the connection unusable
+            return None, None
+
+    async def run(self, stop):
+        loop = asyncio.get_running_loop()
+        metrics = self.metrics
+        counter = 0
+        next_tick = loop.time() + random.uniform(0, self.timer)  # Terminals don't tick in lockstep
+        while not stop.is_set():
+            delay = next_tick - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(stop.wait(), delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+            counter += 1
+
+            # OnTimer: GenerateAndQueueState + SendFromQueue
+            self.book.step()
+            payload = json.dumps(self.book.payload(), separators=(",", ":")).encode("utf-8")
+            started = time.perf_counter()
+            status, _ = await self.request("POST", "/data", payload)
+            if status == 200:
+                metrics.count("data_ok")
+                metrics.count("data_bytes", len(payload))
+                metrics.record("data_post", time.perf_counter() - started)
+            else:
+                metrics.count("data_failed")
+            if counter % self.command_every == 0:
+                await self.poll_command()
+            if counter % self.settings_every == 0:
+                status, _ = await self.request("GET", "/get-settings")
+                metrics.count("settings_ok" if status == 200 else "settings_failed")
+
+            # MT5 keeps at most one pending timer event; the ones that fired while we were busy are gone
+            next_tick += self.timer
+            now = loop.time()
+            if next_tick < now:
+                missed = int((now - next_tick) // self.timer) + 1
+                metrics.count("timer_missed", missed)
+                next_tick += missed * self.timer
+
+    async def poll_command(self):
+        started = time.perf_counter()
+        status, body = await self.request("GET", "/get-command")
+        if status != 200:
+            self.metrics.count("command_poll_failed")
+            return
+        self.metrics.record("command_poll", time.perf_counter() - started)
+        if b"no command" in body or len(body) <= 2:
+            return
+        try:
+            command = json.loads(body)
+        except ValueError:
+            self.metrics.count("command_invalid")
+            return
+        self.metrics.count("commands_executed")
+        self.execute(command)
+        if "sim_id" in command:
+            self.tracker.fetched(command["sim_id"])
+
+    def execute(self, command):
+        """ FetchAndProcessCommands on the synthetic book. Closed positions are replaced to keep the book's size. """
+        book, trades = self.book, self.book.trades
+        action = command.get("action")
+        closing, breakeven, atm = [], [], {}
+        if action == "close":
+            closing = [command.get("ticket")]
+        elif action == "breakeven":
+            breakeven = [command.get("ticket")]
+        elif action == "toggle_atm_trade":
+            atm[command.get("ticket")] = bool(command.get("atm_trade_state"))
+        elif action == "close_all":
+            closing = list(trades)
+        elif action == "close_profits":
+            closing = [ticket for ticket, trade in trades.items() if trade["profit"] > 0]
+        elif action == "close_losses":
+            closing = [ticket for ticket, trade in trades.items() if trade["profit"] < 0]
+        elif action == "breakeven_profits":
+            breakeven = list(trades)
+        elif action == "batch":
+            closing = command.get("close") or []
+            breakeven = command.get("breakeven") or []
+            atm.update((ticket, True) for ticket in command.get("atm_on") or ())
+            atm.update((ticket, False) for ticket in command.get("atm_off") or ())
+        for ticket in closing:
+            if book.close_position(ticket) is not None:
+                book.open_position()
+        for ticket in breakeven:
+            trade = trades.get(ticket)
+            if trade is not None and trade["profit"] > 0:
+                trade["sl"] = trade["open_price"]
+        for ticket, state in atm.items():
+            if ticket in trades:
+                trades[ticket]["atm_enabled"] = state
+
+# ===================================================================
+# 3. Simulated dashboard
+# ===================================================================
+async def send_commands(terminal, rate, tracker, metrics, stop):
+    """ Posts random ticket commands for one terminal's positions to its relay, Poisson-distributed at `rate` per second. """
+    host, _, port = terminal.endpoint.address.rpartition(":")
+    http = HttpConnection(host, int(port))
+    rng = random.Random(hash(terminal.name))
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), rng.expovariate(rate))
+                break
+            except asyncio.TimeoutError:
+                pass
+            if not terminal.book.trades:
+                continue
+            ticket = rng.choice(list(terminal.book.trades))
+            action = rng.choice(COMMAND_ACTIONS)
+            command = {"action": action, "ticket": ticket}
+            expected = None
+            if action == "toggle_atm_trade":
+                expected = command["atm_trade_state"] = not terminal.book.trades[ticket]["atm_enabled"]
+            command["sim_id"] = tracker.sent(terminal.endpoint.name, ticket, action, expected)
+            started = time.perf_counter()
+            try:
+                status, _ = await asyncio.wait_for(http.request("POST", "/command", json.dumps(command).encode("utf-8")), 2.0)
+            except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                await http.close()
+                status = None
+            if status == 200:
+                metrics.record("command_post", time.perf_counter() - started)
+            else:
+                metrics.count("command_post_failed")
+    finally:
+        await http.close()
+
+
+class DashboardWatcher:
+    """ Receives every relay's broadcasts through RelayListener, like the dashboard, and measures them. """
+    def __init__(self, endpoints, metrics, tracker):
+        self.metrics = metrics
+        self.tracker = tracker
+        self.listener = RelayListener(endpoints, self.on_message)
+        self.seq_range = {}  # source -> [first, last] relay sequence number seen
+
+    def on_message(self, message):
+        if message.get("type") != "trade_data":
+            return
+        metrics = self.metrics
+        metrics.count("frames")
+        seq = message.get("seq")
+        if seq is not None:
+            seen = self.seq_range.setdefault(message["source"], [seq, seq])
+            seen[1] = seq
+        produced = (message.get("data") or {}).get("ts")
+        if produced:
+            metrics.record("post_to_dashboard", time.time() - produced / 1000.0)
+        source = message["source"]
+        self.tracker.observe(source, self.listener.decoders[source].records)
+
+    def expected_frames(self):
+        """ Broadcasts the relays made since the first one seen, or None when they don't number them (ws-server.js). """
+        if not self.seq_range:
+            return None
+        return sum(last - first + 1 for first, last in self.seq_range.values())
+
+    def resyncs(self):
+        return sum(decoder.resyncs for decoder in self.listener.decoders.values())
+
+# ===================================================================
+# 4. Driver
+# ===================================================================
+def spawn_relays(count, base_port, host="127.0.0.1"):
+    """ Starts one relay_stub.py per terminal, like one Node.js relay per MT5 terminal. """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "relay_stub.py")
+    processes = [subprocess.Popen([sys.executable, script, "--host", host, "--port", str(base_port + i)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for i in range(count)]
+    return processes, [f"{host}:{base_port + i}" for i in range(count)]
+
+
+async def wait_for_relays(endpoints, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    for endpoint in endpoints:
+        host, _, port = endpoint.address.rpartition(":")
+        while True:
+            try:
+                _, writer = await asyncio.open_connection(host, int(port))
+                writer.close()
+                break
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+def format_histogram(histogram):
+    s = histogram.summary()
+    return f"n={s['count']:<7} p50 {s['p50_ms']:8.2f}  p90 {s['p90_ms']:8.2f}  p99 {s['p99_ms']:8.2f}  max {s['max_ms']:8.2f} ms"
+
+
+def report(args, metrics, tracker, watcher, elapsed):
+    c = metrics.counters
+    posts = c["data_ok"] + c["data_failed"]
+    frames_expected = c["data_ok"]
+    commands = tracker.outcome()
+    result = {
+        "terminals": args.terminals, "positions": args.positions, "timer_ms": args.timer_ms, "seconds": elapsed,
+        "data": {"posted": posts, "ok": c["data_ok"], "failed": c["data_failed"],
+                 "failed_rate": c["data_failed"] / posts if posts else 0.0,
+                 "per_second": c["data_ok"] / elapsed, "mb_per_second": c["data_bytes"] / elapsed / 1e6,
+                 "timer_missed": c["timer_missed"]},
+        "polls": {"command_failed": c["command_poll_failed"], "settings_ok": c["settings_ok"],
+                  "settings_failed": c["settings_failed"], "commands_executed": c["commands_executed"]},
+        "commands": dict(commands, post_failed=c["command_post_failed"],
+                         drop_rate=commands["not_fetched"] / commands["sent"] if commands["sent"] else 0.0),
+        "latency_ms": {name: histogram.summary() for name, histogram in sorted(metrics.histograms.items())},
+    }
+    if watcher is not None:
+        # Posts that timed out on our side may still have reached the relay, so count its broadcasts where possible
+        expected = watcher.expected_frames() or frames_expected
+        result["dashboard"] = {"frames": c["frames"], "frames_per_second": c["frames"] / elapsed,
+                               "missing_rate": max(0.0, 1 - c["frames"] / expected) if expected else 0.0,
+                               "resyncs": watcher.resyncs()}
+
+    data = result["data"]
+    print(f"\n{args.terminals} terminals x {args.positions} positions, timer {args.timer_ms} ms, {elapsed:.1f} s")
+    print(f"data posts      {data['ok']:,} ok / {posts:,} ({data['failed_rate']:.2%} failed) · {data['per_second']:.1f}/s"
+          f" · {data['mb_per_second']:.2f} MB/s · {data['timer_missed']:,} timer ticks missed")
+    if watcher is not None:
+        dash = result["dashboard"]
+        print(f"dashboard       {dash['frames']:,} frames · {dash['frames_per_second']:.1f}/s"
+              f" · {dash['missing_rate']:.2%} missing · {dash['resyncs']} resyncs")
+    print(f"commands        {commands['sent']:,} sent · {commands['fetched']:,} fetched by the EA"
+          f" · {commands['visible']:,} seen applied · {commands['not_fetched']:,} lost ({result['commands']['drop_rate']:.2%})"
+          f" · {c['command_post_failed']:,} post errors")
+    for name in ("data_post", "command_poll", "post_to_dashboard", "command_post", "command_fetch", "command_round_trip"):
+        if name in metrics.histograms:
+            print(f"  {name:<20}{format_histogram(metrics.histograms[name])}")
+    return result
+
+
+async def simulate(args, relays):
+    endpoints = parse_endpoints(relays)
+    await wait_for_relays(endpoints)
+    metrics = Metrics()
+    tracker = CommandTracker(metrics)
+    terminals = [SimulatedTerminal(i, endpoints[i % len(endpoints)], args, metrics, tracker) for i in range(args.terminals)]
+    stop = asyncio.Event()
+    watcher = None if args.no_watch else DashboardWatcher(endpoints, metrics, tracker)
+    tasks = [asyncio.create_task(terminal.run(stop)) for terminal in terminals]
+    if watcher is not None:
+        watch_task = asyncio.create_task(watcher.listener.run())
+    commanders = []
+    if args.command_rate > 0:
+        commanders = [asyncio.create_task(send_commands(terminal, args.command_rate, tracker, metrics, stop))
+                      for terminal in terminals]
+
+    async def progress():
+        last = Counter()
+        while not stop.is_set():
+            await asyncio.sleep(args.report_every)
+            c = metrics.counters
+            print(f"[{metrics.elapsed():6.1f}s] posts {(c['data_ok'] - last['data_ok']) / args.report_every:7.1f}/s"
+                  f" · frames {(c['frames'] - last['frames']) / args.report_every:7.1f}/s"
+                  f" · failed {c['data_failed']} · commands {tracker.next_id - 1} sent / {c['commands_executed']} executed")
+            last = Counter(c)
+    progress_task = asyncio.create_task(progress())
+
+    await asyncio.sleep(args.duration)
+    for commander in commanders:
+        commander.cancel()
+    # Let the EAs poll what is still queued and the dashboards see its effect
+    await asyncio.sleep(args.drain)
+    stop.set()
+    progress_task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = metrics.elapsed()
+    if watcher is not None:
+        watcher.listener.stop()
+        await asyncio.gather(watch_task, return_exceptions=True)
+    return report(args, metrics, tracker, watcher, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated MT5 terminals running core.mql5, for load tests of the relay and dashboard path")
+    parser.add_argument("--relay", action="append", metavar="[NAME=]HOST:PORT", help="relay to post to; repeat for several (terminals are spread round-robin)")
+    parser.add_argument("--spawn-relays", action="store_true", help="start one relay_stub.py per terminal instead")
+    parser.add_argument("--base-port", type=int, default=5100, help="first port for --spawn-relays")
+    parser.add_argument("--terminals", type=int, default=1)
+    parser.add_argument("--positions", type=int, default=100, help="open positions per terminal")
+    parser.add_argument("--timer-ms", type=int, default=1000, help="EA timer period, i.e. state posts per terminal (default 1000)")
+    parser.add_argument("--churn", type=float, default=0.0, help="fraction of positions closed and reopened per timer tick")
+    parser.add_argument("--change-ratio", type=float, default=1.0, help="fraction of positions whose price moves per tick")
+    parser.add_argument("--command-every", type=int, default=2, help="poll /get-command every N timer ticks (EA: 2)")
+    parser.add_argument("--settings-every", type=int, default=5, help="poll /get-settings every N timer ticks (EA: 5)")
+    parser.add_argument("--command-rate", type=float, default=0.2, help="dashboard commands per second per terminal (0 = none)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--drain", type=float, default=None, help="seconds to keep polling after the last command (default: 2 poll periods + 1)")
+    parser.add_argument("--no-watch", action="store_true", help="don't connect as a dashboard (no end-to-end or round-trip figures)")
+    parser.add_argument("--report-every", type=float, default=5.0, help="progress line interval in seconds")
+    parser.add_argument("--output", help="write the final report as JSON")
+    args = parser.parse_args()
+    if args.drain is None:
+        args.drain = 2 * args.command_every * args.timer_ms / 1000.0 + 1.0
+
+    processes = []
+    relays = args.relay or []
+    if args.spawn_relays:
+        processes, relays = spawn_relays(args.terminals, args.base_port)
+    elif len(parse_endpoints(relays)) < args.terminals:
+        print("⚠️ More terminals than relays: terminals sharing a relay take each other's commands and overwrite its state.")
+    try:
+        result = asyncio.run(simulate(args, relays))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
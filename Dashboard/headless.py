@@ -0,0 +1,650 @@
+# FILE: headless.py
+"""
+Terminal dashboard for machines without a display, e.g. a VPS reached over SSH.
+
+It watches the same relays and sends the same commands as the window, without importing Qt:
+positions and totals are redrawn in the terminal and commands are typed at the prompt. The
+WebSocket library is only imported by the listener thread once the first screen is up.
+
+    python main.py --headless --relay Live=127.0.0.1:5000 --relay Demo=127.0.0.1:5001
+
+When stdout is not a terminal (a service, a log file) a status line is printed every
+--log-interval seconds instead, and commands are still read from stdin, one per line.
+"""
+import argparse
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+
+from command_client import CommandBatcher, PendingCommands
+from ingest import MessageCoalescer, parse_endpoints
+
+HELP = """Commands (tickets may be written SOURCE:TICKET when several relays report the same one):
+  close T...            close positions            be T...        move the stop to break-even
+  atm on|off T...       per-trade auto management  closeall | closeprofits | closelosses
+  sort profit|ticket|symbol|volume|age [desc]      filter SYMBOL | filter
+  stats                 command round trips        help | quit
+  Up/Down/PgUp/PgDn scroll the table."""
+
+# ===================================================================
+# 1. Terminal input and output
+# ===================================================================
+class KeyReader:
+    """
+    Keystrokes without waiting for Enter: read(timeout) returns the characters typed since the last
+    call, with "enter", "backspace", "esc", "up", "down", "pgup" and "pgdn" for the special keys.
+    When stdin is not a terminal, whole lines are read on a thread and replayed as keys.
+    """
+    ESCAPES = {"\x1b[A": "up", "\x1b[B": "down", "\x1b[5~": "pgup", "\x1b[6~": "pgdn",
+               "\x1bOA": "up", "\x1bOB": "down"}
+    WINDOWS_KEYS = {"H": "up", "P": "down", "I": "pgup", "Q": "pgdn"}
+    ESCAPE_RE = re.compile(r"\x1b(\[[0-9;]*[A-Za-z~]|O[A-Za-z])?")
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin
+        self.saved = None
+        self.lines = None
+        self.tty = self.stream.isatty()
+
+    def __enter__(self):
+        if not self.tty:
+            self.lines = queue.SimpleQueue()
+            threading.Thread(target=self._read_lines, name="StdinReader", daemon=True).start()
+        elif os.name != "nt":
+            import termios
+            import tty
+            fd = self.stream.fileno()
+            self.saved = termios.tcgetattr(fd)
+            tty.setcbreak(fd)
+        return self
+
+    def __exit__(self, *exc):
+        if self.saved is not None:
+            import termios
+            termios.tcsetattr(self.stream.fileno(), termios.TCSADRAIN, self.saved)
+            self.saved = None
+
+    def _read_lines(self):
+        for line in self.stream:
+            self.lines.put(line.rstrip("\r\n"))
+
+    def read(self, timeout):
+        if self.lines is not None:
+            keys = []
+            try:
+                line = self.lines.get(timeout=timeout)
+                while True:
+                    keys.extend(line)
+                    keys.append("enter")
+                    line = self.lines.get_nowait()
+            except queue.Empty:
+                return keys
+        if os.name == "nt":
+            return self._read_windows(timeout)
+        import select
+        fd = self.stream.fileno()
+        if not select.select([fd], [], [], timeout)[0]:
+            return []
+        return self.parse(os.read(fd, 4096).decode("utf-8", "replace"))
+
+    def _read_windows(self, timeout):
+        import msvcrt
+        deadline = time.monotonic() + timeout
+        while not msvcrt.kbhit():
+            if time.monotonic() >= deadline:
+                return []
+            time.sleep(0.01)
+        keys = []
+        while msvcrt.kbhit():
+            char = msvcrt.getwch()
+            if char in ("\x00", "\xe0"):
+                key = self.WINDOWS_KEYS.get(msvcrt.getwch())
+                if key:
+                    keys.append(key)
+            elif char == "\x03":
+                raise KeyboardInterrupt
+            else:
+                keys.extend(self.parse(char))
+        return keys
+
+    @classmethod
+    def parse(cls, data):
+        keys = []
+        pos = 0
+        while pos < len(data):
+            char = data[pos]
+            if char == "\x1b":
+                match = cls.ESCAPE_RE.match(data, pos)
+                sequence = match.group(0)
+                keys.append(cls.ESCAPES.get(sequence, "esc" if sequence == "\x1b" else None))
+                pos = match.end()
+                continue
+            if char in "\r\n":
+                keys.append("enter")
+            elif char in "\x7f\b":
+                keys.append("backspace")
+            elif char.isprintable():
+                keys.append(char)
+            pos += 1
+        return [key for key in keys if key]
+
+
+class LogCapture:
+    """
+    Stands in for sys.stdout while the screen is drawn, so the log lines printed by the relay
+    listener and the command client end up in the log pane instead of across the table.
+    """
+    def __init__(self, on_line=None, history=200):
+        self.lines = deque(maxlen=history)
+        self.on_line = on_line
+        self._partial = ""
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            *complete, self._partial = (self._partial + text).split("\n")
+            for line in complete:
+                if line.strip():
+                    self.lines.append(f"{time.strftime('%H:%M:%S')} {line}")
+        if complete and self.on_line is not None:
+            self.on_line()
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+# ===================================================================
+# 2. Positions
+# ===================================================================
+class PositionBook:
+    """
+    The open positions of every relay, replaced snapshot by snapshot; the terminal's counterpart
+    of TradeTableModel, without a sorted index (the screen sorts the few rows it shows).
+    Profit changes are reported to an AlertEngine when one is given.
+    """
+    def __init__(self, alerts=None):
+        self.trades = {}         # key -> TradeRecord
+        self.by_source = {}      # source -> set of keys
+        self.source_data = {}    # source -> payload header (symbol, total_pl, balance...)
+        self.arrival = {}        # key -> arrival sequence, for sorting by age
+        self.next_arrival = 0
+        self.symbol_profit = {}  # symbol -> [position count, net profit]
+        self.alerts = alerts
+
+    def apply(self, source, data):
+        self.source_data[source] = {key: value for key, value in data.items() if key != "trades"}
+        trades = self.trades
+        keys = self.by_source.setdefault(source, set())
+        seen = set()
+        for trade in data.get("trades") or ():
+            key = trade.key
+            seen.add(key)
+            old = trades.get(key)
+            if old is trade:
+                continue
+            trades[key] = trade
+            if old is None:
+                keys.add(key)
+                self.arrival[key] = self.next_arrival
+                self.next_arrival += 1
+                self._account(trade.symbol, 1, trade.profit)
+                self._report(key, trade.symbol, None, trade.profit)
+            elif old.profit != trade.profit:
+                self._account(trade.symbol, 0, trade.profit - old.profit)
+                self._report(key, trade.symbol, old.profit, trade.profit)
+        for key in keys - seen:
+            trade = trades.pop(key)
+            del self.arrival[key]
+            self._account(trade.symbol, -1, -trade.profit)
+            self._report(key, trade.symbol, trade.profit, None)
+        keys &= seen
+
+    def _account(self, symbol, count, profit):
+        entry = self.symbol_profit.setdefault(symbol, [0, 0.0])
+        entry[0] += count
+        entry[1] += profit
+        if not entry[0]:
+            del self.symbol_profit[symbol]
+
+    def _report(self, key, symbol, old, new):
+        if self.alerts is not None:
+            self.alerts.ticket(key, symbol, old, new)
+
+    def get_trade(self, key):
+        return self.trades.get(key)
+
+    def profit_of(self, symbol):
+        entry = self.symbol_profit.get(symbol)
+        return entry[1] if entry else None
+
+    @property
+    def total_pl(self):
+        return sum(data.get("total_pl", 0.0) for data in self.source_data.values())
+
+    @property
+    def balance(self):
+        balances = [data.get("balance") for data in self.source_data.values()]
+        return sum(balances) if balances and None not in balances else None
+
+# ===================================================================
+# 3. Terminal dashboard
+# ===================================================================
+class TerminalDashboard:
+    """
+    The main loop runs on the calling thread: it reads keys, drains the relay messages, flushes
+    command batches, resolves pending commands and redraws at most refresh_hz times per second.
+    The relay listener runs on its own thread and command results come back through a queue, so
+    all state is only touched from the main loop.
+    """
+    SORT_KEYS = {
+        "profit": lambda trade: trade.profit,
+        "ticket": lambda trade: trade.ticket,
+        "symbol": lambda trade: trade.symbol,
+        "volume": lambda trade: trade.volume,
+    }
+    STATUS_MARKS = {"connected": "●", "connecting": "◌", "disconnected": "○"}
+    PENDING_MARKS = {"close": "closing", "breakeven": "be", "toggle_atm_trade": "atm"}
+    LOG_ROWS = 6
+
+    def __init__(self, endpoints, refresh_hz=4, batch_window=0.3, command_timeout=30.0, alerts=None,
+                 log_interval=10.0, out=None):
+        self.endpoints = {endpoint.name: endpoint for endpoint in endpoints}
+        self.refresh_interval = 1.0 / min(max(refresh_hz, 1), 30)
+        self.batch_window = batch_window
+        self.log_interval = log_interval
+        self.out = out or sys.stdout
+        self.tty = self.out.isatty()
+        self.alerts = alerts
+        self.book = PositionBook(alerts if alerts else None)
+        self.coalescer = MessageCoalescer()
+        self.status = {name: "connecting" for name in self.endpoints}
+        self.batcher = CommandBatcher()
+        self.pending = PendingCommands(command_timeout)
+        self.results = queue.SimpleQueue()  # (callback, success) from the command client's thread
+        self.client = None
+        self.listener = None
+        self.running = True
+        self.dirty = True
+        self.batch_due = None
+        self.next_draw = 0.0                # tty: earliest next redraw; otherwise the next status line
+        self.drawn_at = 0.0
+        self.debounced_alerts = alerts is not None and any(rule.debounce for rule in alerts.rules)
+        self.input = ""
+        self.confirm = None                 # (question, action) waiting for "y"
+        self.notice = "Type help for the commands."
+        self.sort_field = "profit"
+        self.descending = False
+        self.symbol_filter = None
+        self.offset = 0
+        self.page = 10
+        self.log = LogCapture(self.mark_dirty)
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def say(self, text):
+        """ The one-line notice above the prompt; without a terminal it is printed right away. """
+        self.notice = text
+        self.dirty = True
+        if not self.tty and text:
+            print(text, file=self.out, flush=True)
+
+    # --- threads ------------------------------------------------------
+    def on_message(self, message):
+        """ Listener thread. """
+        self.coalescer.push(message)
+
+    def on_status(self, source, status):
+        """ Listener thread; a dict store is atomic. """
+        self.status[source] = status
+        self.dirty = True
+
+    def listen(self):
+        import asyncio
+        from ingest import RelayListener
+        self.listener = RelayListener(list(self.endpoints.values()), self.on_message, self.on_status)
+        if self.running:
+            asyncio.run(self.listener.run())
+
+    def command_client(self):
+        """ The HTTP command client, created on the first command: it starts a thread and an event loop. """
+        if self.client is None:
+            from command_client import CommandClient
+            self.client = CommandClient()
+        return self.client
+
+    # --- main loop ----------------------------------------------------
+    def run(self):
+        listener = threading.Thread(target=self.listen, name="RelayListener", daemon=True)
+        if self.tty:
+            sys.stdout = self.log
+            self.out.write("\x1b[?1049h")  # Alternate screen, restored on exit
+        try:
+            with KeyReader() as keys:
+                if self.tty:
+                    self.render(time.monotonic())
+                listener.start()
+                while self.running:
+                    for key in keys.read(0.05):
+                        self.on_key(key)
+                    now = time.monotonic()
+                    self.process(now)
+                    if self.tty:
+                        # The clock (and a resized terminal) are picked up once a second
+                        if (self.dirty or now - self.drawn_at >= 1.0) and now >= self.next_draw:
+                            self.render(now)
+                    elif now >= self.next_draw:
+                        self.log_status(now)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            if self.listener is not None:
+                self.listener.stop()
+            if listener.is_alive():
+                listener.join(timeout=1)
+            if self.client is not None:
+                self.client.close()
+            if self.alerts is not None:
+                self.alerts.close()
+            if self.tty:
+                self.out.write("\x1b[?1049l")
+                self.out.flush()
+                sys.stdout = self.out
+                for line in list(self.log.lines)[-10:]:
+                    print(line)
+        return 0
+
+    def process(self, now):
+        for message in self.coalescer.drain():
+            msg_type = message.get("type")
+            source = message.get("source", "")
+            if msg_type == "trade_data":
+                self.book.apply(source, message.get("data") or {})
+                self.snapshot_applied(source)
+        while True:
+            try:
+                callback, success = self.results.get_nowait()
+            except queue.Empty:
+                break
+            callback(success)
+        if self.batch_due is not None and now >= self.batch_due:
+            self.flush_commands()
+        if self.pending:
+            for key, entry in self.pending.expire():
+                self.say(f"{self.PENDING_MARKS[entry.action]} on {key[1]} was never confirmed")
+                self.dirty = True
+        if self.debounced_alerts:
+            self.alerts.tick(lambda metric, key: getattr(self.book.get_trade(key), "profit", None))
+            self.show_alerts()
+
+    def snapshot_applied(self, source):
+        if self.pending:
+            self.pending.observe(source, lambda ticket: self.book.get_trade((source, ticket)))
+        if self.alerts is not None:
+            self.alerts.symbols(self.book.profit_of)
+            self.alerts.totals(self.book.total_pl, self.book.balance)
+            self.show_alerts()
+        self.dirty = True
+
+    def show_alerts(self):
+        for event in self.alerts.drain():
+            if event.kind == "fired":
+                value = f"{event.value:+.2f}" if event.value is not None else "?"
+                print(f"[Alerts] 🔔 {event.subject_text}: {event.rule.describe()} (now {value}) [{event.rule.id}]")
+                if self.tty:  # Otherwise the line above already went to stdout
+                    self.say(f"🔔 {event.subject_text}: {event.rule.describe()} (now {value})")
+                    self.out.write("\a")
+
+    # --- keyboard -----------------------------------------------------
+    def on_key(self, key):
+        self.dirty = True
+        if key == "enter":
+            line, self.input = self.input.strip(), ""
+            if self.confirm is not None:
+                (question, action), self.confirm = self.confirm, None
+                if line.lower() in ("y", "yes"):
+                    action()
+                else:
+                    self.say("Cancelled.")
+            elif line:
+                self.execute(line)
+        elif key == "backspace":
+            self.input = self.input[:-1]
+        elif key == "esc":
+            self.input = ""
+            self.confirm = None
+        elif key in ("up", "down", "pgup", "pgdn"):
+            step = {"up": -1, "down": 1, "pgup": -self.page, "pgdn": self.page}[key]
+            self.offset = max(0, self.offset + step)
+        elif len(key) == 1:
+            self.input += key
+
+    def execute(self, line):
+        command, *args = line.split()
+        command = command.lower()
+        if command in ("q", "quit", "exit"):
+            self.running = False
+        elif command in ("h", "help", "?"):
+            for help_line in HELP.splitlines():
+                print(help_line)
+            self.say("Help is in the log pane." if self.tty else "")
+        elif command in ("c", "close"):
+            keys = [key for key in self.resolve(args) if "close" not in self.pending.blocked(key)]
+            if keys:
+                names = ", ".join(str(ticket) for _, ticket in keys)
+                question = f"Close position {names}?" if len(keys) == 1 else f"Close the {len(keys)} positions {names}?"
+                self.ask(f"{question} [y/N]", lambda: self.close_positions(keys))
+        elif command == "be":
+            trades = [trade for trade in map(self.book.get_trade, self.resolve(args)) if trade.profit > 0]
+            if not trades and args:
+                self.say("Break-even needs a position in profit.")
+            for trade in trades:
+                self.queue_ticket_command({"action": "breakeven", "ticket": trade.ticket}, trade.source)
+        elif command == "atm" and args and args[0].lower() in ("on", "off"):
+            state = args[0].lower() == "on"
+            for key in self.resolve(args[1:]):
+                if self.atm_state(key) == state:
+                    continue
+                if "toggle_atm_trade" in self.pending.blocked(key):
+                    self.say(f"The ATM toggle of {key[1]} is still waiting for the EA.")
+                    continue
+                # A toggle that has not been sent yet is withdrawn by the opposite one, here and in the batcher
+                self.queue_ticket_command({"action": "toggle_atm_trade", "ticket": key[1], "atm_trade_state": state}, key[0])
+        elif command in ("closeall", "closeprofits", "closelosses"):
+            action = {"closeall": "close_all", "closeprofits": "close_profits", "closelosses": "close_losses"}[command]
+            question = {"close_all": "Close ALL positions", "close_profits": "Close all positions in profit",
+                        "close_losses": "Close all positions in loss"}[action]
+            self.ask(f"{question} on {len(self.endpoints)} relay(s)? [y/N]", lambda: self.send_command({"action": action}))
+        elif command == "sort" and args and args[0].lower() in (*self.SORT_KEYS, "age"):
+            self.sort_field = args[0].lower()
+            self.descending = len(args) > 1 and args[1].lower() == "desc"
+            self.offset = 0
+        elif command == "filter":
+            self.symbol_filter = args[0].upper() if args else None
+            self.offset = 0
+        elif command == "stats":
+            for stats_line in self.pending.format_table().splitlines():
+                print(stats_line)
+            self.say("Command round trips are in the log pane." if self.tty else "")
+        else:
+            self.say(f"Unknown command: {line} (type help)")
+
+    def resolve(self, args):
+        """ (source, ticket) keys of the tickets named in args; unknown and ambiguous ones are reported. """
+        keys = []
+        for arg in args:
+            source, _, number = arg.rpartition(":")
+            try:
+                ticket = int(number.lstrip("#"))
+            except ValueError:
+                self.say(f"Not a ticket: {arg}")
+                continue
+            matches = [(name, ticket) for name in self.endpoints if (not source or name == source)
+                       and (name, ticket) in self.book.trades]
+            if len(matches) == 1:
+                keys.append(matches[0])
+            else:
+                self.say(f"No position {arg}" if not matches else f"{ticket} is on several relays; write SOURCE:{ticket}")
+        return keys
+
+    # --- commands -----------------------------------------------------
+    def ask(self, question, action):
+        """ Runs action once the next line is "y", like the window's confirmation dialogs. """
+        self.confirm = (question, action)
+        if not self.tty:
+            print(question, file=self.out, flush=True)
+
+    def close_positions(self, keys):
+        # Positions may have closed, or a close been queued, while the question was open
+        for key in keys:
+            if key in self.book.trades and "close" not in self.pending.blocked(key):
+                self.queue_ticket_command({"action": "close", "ticket": key[1]}, key[0])
+
+    def atm_state(self, key):
+        """ The ATM state a position shows: the target of a pending toggle, else what the relay reported. """
+        entry = self.pending.actions(key).get("toggle_atm_trade")
+        return entry.target if entry is not None else self.book.get_trade(key).atm_enabled
+
+    def queue_ticket_command(self, payload, source):
+        """ Same batching and acknowledgement tracking as the window: one payload per relay per batch_window. """
+        key = (source, payload["ticket"])
+        if not self.pending.begin(key, payload["action"], self.book.get_trade(key), payload.get("atm_trade_state")):
+            return
+        self.batcher.add(source, payload)
+        if self.batcher and self.batch_due is None:
+            self.batch_due = time.monotonic() + self.batch_window
+
+    def flush_commands(self):
+        self.batch_due = None
+        for source, payload, _ in self.batcher.take():
+            self.pending.sent(source, payload)
+            def on_result(success, source=source, payload=payload):
+                if not success:
+                    self.pending.failed(source, payload)
+                    self.say(f"❌ {source} did not accept {payload.get('action')}")
+            self.send_command(payload, on_result, source)
+
+    def send_command(self, payload, on_result=None, source=None):
+        """ Ticket commands go to the relay that reported the ticket; account-wide ones to every relay. """
+        if on_result is None:
+            on_result = lambda success: self.say("Sent." if success else f"❌ {payload.get('action')} failed")
+        targets = [self.endpoints[source]] if source is not None else list(self.endpoints.values())
+        results = []
+        def collect(success):
+            results.append(success)
+            if len(results) == len(targets):
+                on_result(all(results))
+        client = self.command_client()
+        for endpoint in targets:
+            future = client.submit(payload, endpoint.command_url)
+            future.add_done_callback(lambda future: self.results.put((collect, bool(future.result()))))
+
+    # --- output -------------------------------------------------------
+    def visible_trades(self):
+        trades = self.book.trades.values()
+        if self.symbol_filter:
+            trades = [trade for trade in trades if trade.symbol == self.symbol_filter]
+        if self.sort_field == "age":
+            arrival = self.book.arrival
+            return sorted(trades, key=lambda trade: arrival[trade.key], reverse=self.descending)
+        return sorted(trades, key=self.SORT_KEYS[self.sort_field], reverse=self.descending)
+
+    def header_lines(self):
+        book = self.book
+        relays = "  ".join(f"{self.STATUS_MARKS.get(status, '?')} {name}" for name, status in self.status.items())
+        totals = f"Total P/L {book.total_pl:+.2f} $"
+        if len(self.endpoints) > 1:
+            totals += "  (" + ", ".join(f"{name} {book.source_data.get(name, {}).get('total_pl', 0.0):+.2f}"
+                                        for name in self.endpoints) + ")"
+        balance = book.balance
+        if balance:
+            totals += f"  {book.total_pl / balance * 100:+.2f}% of {balance:,.2f}"
+        return [f"ATM dashboard  {time.strftime('%H:%M:%S')}  {relays}", f"{totals}  ·  {len(book.trades)} positions"]
+
+    def render(self, now):
+        """ Redraws the whole screen in one write; each line is cleared to its end, so nothing flickers. """
+        self.dirty = False
+        self.drawn_at = now
+        self.next_draw = now + self.refresh_interval
+        width, height = shutil.get_terminal_size((100, 30))
+        lines = self.header_lines()
+        multi = len(self.endpoints) > 1
+        source_width = max(map(len, self.endpoints)) + 2 if multi else 0
+        heading = (f"{'source':<{source_width}}" if multi else "") + f"{'ticket':>12}  {'symbol':<10}{'type':<6}{'volume':>8}{'profit':>14}  {'ATM':<5}pending"
+        lines.append("")
+        lines.append(f"\x1b[1m{heading}\x1b[0m")
+        log_lines = list(self.log.lines)[-self.LOG_ROWS:]
+        self.page = rows = max(height - len(lines) - len(log_lines) - 3, 1)
+        trades = self.visible_trades()
+        self.offset = min(self.offset, max(len(trades) - rows, 0))
+        for trade in trades[self.offset:self.offset + rows]:
+            actions = self.pending.actions(trade.key)
+            pending = " ".join(self.PENDING_MARKS[action] for action in actions)
+            atm = "on" if trade.atm_enabled else "off"
+            if "toggle_atm_trade" in actions:
+                atm = ("on" if actions["toggle_atm_trade"].target else "off") + "…"
+            color = "\x1b[32m" if trade.profit >= 0 else "\x1b[31m"
+            lines.append((f"{trade.source:<{source_width}}" if multi else "")
+                         + f"{trade.ticket_text:>12}  {trade.symbol:<10}{trade.type:<6}{trade.volume_text:>8}"
+                         + f"{color}{trade.profit_text:>14}\x1b[0m  {atm:<5}{pending}")
+        shown = f"{self.offset + 1}-{min(self.offset + rows, len(trades))} of {len(trades)}" if trades else "no positions"
+        sort = self.sort_field + (" desc" if self.descending else "")
+        lines.append(f"\x1b[2m{shown} · sort {sort}" + (f" · {self.symbol_filter}" if self.symbol_filter else "") + "\x1b[0m")
+        lines.extend(f"\x1b[2m{line}\x1b[0m" for line in log_lines)
+        lines.append(self.notice)
+        prompt = f"{self.confirm[0]} " if self.confirm is not None else "> "
+        lines.append(prompt + self.input)
+        self.out.write("\x1b[H" + "\x1b[K\n".join(self.clip(line, width) for line in lines) + "\x1b[J")
+        self.out.flush()
+
+    @staticmethod
+    def clip(line, width):
+        """ Cuts a line to the terminal width, ignoring the width of its colour codes. """
+        visible = len(re.sub(r"\x1b\[[0-9;]*m", "", line))
+        return line if visible <= width else line[:width + len(line) - visible]
+
+    def log_status(self, now):
+        """ Without a terminal: one status line per log_interval, plus whatever the notice says. """
+        self.next_draw = now + self.log_interval
+        header, totals = self.header_lines()
+        print(f"{header}  |  {totals}", file=self.out, flush=True)
+
+# ===================================================================
+# 4. Entry point
+# ===================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hybrid trading dashboard, terminal edition")
+    parser.add_argument("--relay", action="append", metavar="[NAME=]HOST:PORT",
+                        help="relay to watch; repeat for several terminals (default: 127.0.0.1:5000)")
+    parser.add_argument("--refresh-hz", type=int, default=4, help="screen refreshes per second at most (default: 4)")
+    parser.add_argument("--batch-window-ms", type=int, default=300,
+                        help="ticket commands are collected this long and sent as one batch per relay (default: 300)")
+    parser.add_argument("--command-timeout", type=float, default=30.0,
+                        help="seconds until an unconfirmed command is released (default: 30)")
+    parser.add_argument("--alerts", metavar="FILE", help="alert rules (JSON); fired and cleared alerts are logged to alerts.log next to it")
+    parser.add_argument("--log-interval", type=float, default=10.0,
+                        help="seconds between status lines when stdout is not a terminal (default: 10)")
+    args = parser.parse_args(argv)
+
+    alerts = None
+    if args.alerts:
+        from alerts import AlertEngine, load_rules
+        alerts = AlertEngine(load_rules(args.alerts), os.path.join(os.path.dirname(os.path.abspath(args.alerts)), "alerts.log"))
+        print(f"[Alerts] ✅ {len(alerts.rules)} rules loaded from {args.alerts}")
+
+    dashboard = TerminalDashboard(parse_endpoints(args.relay or []), args.refresh_hz, args.batch_window_ms / 1000,
+                                  args.command_timeout, alerts, args.log_interval)
+    return dashboard.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+# FILE: history.py
+"""
+On-disk history of trade_data snapshots.
+
+Each snapshot is stored as fixed-width binary rows (one account row plus one row per position)
+in a memory-mapped ring file of a fixed size; when the file is full the oldest snapshots are
+overwritten. A second, smaller ring indexes the first row of every snapshot by time, so a time
+range is found with two binary searches and read back as NumPy views straight onto the mapping.
+
+    python history.py ~/.local/share/GeminiTrader/HybridPanel/history.bin
+"""
+import json
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b"ATMHIST1"
+VERSION = 1
+HEADER_SIZE = 64 * 1024  # Fixed fields followed by the symbol/source dictionaries as JSON
+HEADER = struct.Struct("<8sIIQQQQ")  # magic, version, record size, capacity, record count, index capacity, index count
+DICTIONARY_OFFSET = 256
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# flags
+FLAG_SELL = 0x01
+FLAG_ATM = 0x02
+FLAG_ACCOUNT = 0x80  # Per-source summary row: profit = total_pl, volume = open positions, ticket = 0
+
+RECORD_DTYPE = np.dtype([
+    ("time_ms", "<i8"), ("ticket", "<u8"), ("profit", "<f8"), ("volume", "<f4"),
+    ("symbol", "<u2"), ("source", "u1"), ("flags", "u1"),
+])
+INDEX_DTYPE = np.dtype([("time_ms", "<i8"), ("first", "<u8")])
+UNKNOWN_SYMBOL = 0xFFFF
+UNKNOWN_SOURCE = 0xFF
+
+# ===================================================================
+# 1. Ring file
+# ===================================================================
+class HistoryFile:
+    """
+    The mapped ring file. Appends come from one thread (the recorder); reads may come from any thread
+    and return views that stay valid until the ring wraps over them, so copy what must be kept.
+    Opening a file written with a different size cap starts a new history.
+    """
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        if readonly:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, record_size, capacity, _, index_capacity, _ = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+                raise ValueError(f"{path} is not a history file of version {VERSION}")
+        else:
+            # One index slot per four rows: enough unless most snapshots hold fewer than three positions
+            capacity = max((max_bytes - HEADER_SIZE) * 4 // (4 * RECORD_DTYPE.itemsize + INDEX_DTYPE.itemsize), 1024)
+            index_capacity = max(capacity // 4, 64)
+            size = HEADER_SIZE + index_capacity * INDEX_DTYPE.itemsize + capacity * RECORD_DTYPE.itemsize
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            fresh = not os.path.exists(path) or os.path.getsize(path) != size
+            with open(path, "r+b" if not fresh else "w+b") as f:
+                if fresh:
+                    f.truncate(size)
+                self._mm = mmap.mmap(f.fileno(), size)
+            header = HEADER.unpack_from(self._mm, 0)
+            if fresh or header[:4] != (MAGIC, VERSION, RECORD_DTYPE.itemsize, capacity):
+                print(f"[History] 🆕 Starting a new history file at {path}")
+                HEADER.pack_into(self._mm, 0, MAGIC, VERSION, RECORD_DTYPE.itemsize, capacity, 0, index_capacity, 0)
+                self._write_dictionary({"symbols": [], "sources": []})
+
+        self.capacity = capacity
+        self.index_capacity = index_capacity
+        self.index = np.frombuffer(self._mm, INDEX_DTYPE, index_capacity, HEADER_SIZE)
+        self.records = np.frombuffer(self._mm, RECORD_DTYPE, capacity, HEADER_SIZE + index_capacity * INDEX_DTYPE.itemsize)
+        dictionary = self._read_dictionary()
+        self.symbols = dictionary["symbols"]
+        self.sources = dictionary["sources"]
+        self._symbol_ids = {name: i for i, name in enumerate(self.symbols)}
+        self._source_ids = {name: i for i, name in enumerate(self.sources)}
+
+    @property
+    def counts(self):
+        """ (records ever written, snapshots ever written) """
+        _, _, _, _, record_count, _, index_count = HEADER.unpack_from(self._mm, 0)
+        return record_count, index_count
+
+    # --- dictionaries -------------------------------------------------
+    def _read_dictionary(self):
+        (length,) = struct.unpack_from("<I", self._mm, DICTIONARY_OFFSET)
+        raw = bytes(self._mm[DICTIONARY_OFFSET + 4:DICTIONARY_OFFSET + 4 + length])
+        return json.loads(raw) if raw else {"symbols": [], "sources": []}
+
+    def _write_dictionary(self, dictionary):
+        raw = json.dumps(dictionary, separators=(",", ":")).encode("utf-8")
+        if DICTIONARY_OFFSET + 4 + len(raw) > HEADER_SIZE:
+            return False
+        self._mm[DICTIONARY_OFFSET + 4:DICTIONARY_OFFSET + 4 + len(raw)] = raw
+        struct.pack_into("<I", self._mm, DICTIONARY_OFFSET, len(raw))
+        return True
+
+    def _lookup(self, ids, names, name, limit):
+        value = ids.get(name)
+        if value is None:
+            if len(names) >= limit:
+                return limit
+            names.append(name)
+            if not self._write_dictionary({"symbols": self.symbols, "sources": self.sources}):
+                names.pop()
+                return limit
+            value = ids[name] = len(names) - 1
+        return value
+
+    def symbol_id(self, name):
+        return self._lookup(self._symbol_ids, self.symbols, name, UNKNOWN_SYMBOL)
+
+    def source_id(self, name):
+        return self._lookup(self._source_ids, self.sources, name, UNKNOWN_SOURCE)
+
+    # --- writing ------------------------------------------------------
+    def append(self, time_ms, rows):
+        """ Appends one snapshot (an array of RECORD_DTYPE rows written at time_ms). """
+        rows = rows[-self.capacity:]
+        record_count, index_count = self.counts
+        start = record_count % self.capacity
+        head = min(len(rows), self.capacity - start)
+        self.records[start:start + head] = rows[:head]
+        self.records[:len(rows) - head] = rows[head:]
+        self.index[index_count % self.index_capacity] = (time_ms, record_count)
+        with self._lock:
+            HEADER.pack_into(self._mm, 0, MAGIC, VERSION, RECORD_DTYPE.itemsize, self.capacity,
+                             record_count + len(rows), self.index_capacity, index_count + 1)
+
+    def flush(self):
+        if not self.readonly:
+            self._mm.flush()
+
+    def close(self):
+        self.flush()
+        self.index = self.records = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # A reader still holds a view; the mapping goes away with it
+
+    # --- reading ------------------------------------------------------
+    def _index_segments(self, index_count):
+        """ The valid part of the index ring, oldest first, as (start, stop) slot ranges. """
+        if index_count <= self.index_capacity:
+            return [(0, index_count)]
+        split = index_count % self.index_capacity
+        return [(split, self.index_capacity), (0, split)]
+
+    def _seek(self, field, value, side, record_count, index_count):
+        """
+        First record of the first snapshot whose field ("time_ms" or "first") is at (side="left")
+        or after (side="right") value; both columns grow monotonically through the ring.
+        """
+        column, firsts = self.index[field], self.index["first"]
+        for start, stop in self._index_segments(index_count):
+            position = int(np.searchsorted(column[start:stop], value, side))
+            if position < stop - start:
+                return int(firsts[start + position])
+        return record_count
+
+    def read(self, start_ms=None, end_ms=None):
+        """
+        Rows of the snapshots taken between start_ms and end_ms (inclusive, milliseconds since the epoch),
+        oldest first, as a list of at most two views onto the file (two when the range wraps around the ring).
+        """
+        with self._lock:
+            record_count, index_count = self.counts
+        # The oldest snapshot may be partly overwritten already; start at the first complete one
+        oldest = self._seek("first", max(0, record_count - self.capacity), "left", record_count, index_count)
+        first = oldest if start_ms is None else max(oldest, self._seek("time_ms", start_ms, "left", record_count, index_count))
+        last = record_count if end_ms is None else max(first, self._seek("time_ms", end_ms, "right", record_count, index_count))
+        if last <= first:
+            return []
+        start = first % self.capacity
+        length = last - first
+        if start + length <= self.capacity:
+            return [self.records[start:start + length]]
+        return [self.records[start:], self.records[:start + length - self.capacity]]
+
+    def account_series(self, start_ms=None, end_ms=None, source=None):
+        """ (time_ms, total_pl) arrays of the account rows in a time range, for one source or all of them. """
+        times, values = [], []
+        source_id = None if source is None else self._source_ids.get(source, UNKNOWN_SOURCE)
+        for view in self.read(start_ms, end_ms):
+            mask = (view["flags"] & FLAG_ACCOUNT) != 0
+            if source_id is not None:
+                mask &= view["source"] == source_id
+            times.append(view["time_ms"][mask])
+            values.append(view["profit"][mask])
+        if not times:
+            return np.empty(0, np.int64), np.empty(0, np.float64)
+        return np.concatenate(times), np.concatenate(values)
+
+# ===================================================================
+# 2. Background recorder
+# ===================================================================
+class HistoryRecorder:
+    """
+    Records trade_data snapshots from the GUI thread without doing any of the work there:
+    record() only queues a reference to the snapshot. A writer thread drains the queue in batches,
+    packs the rows and copies them into the mapping. Snapshots of one source closer together
+    than min_interval_ms are skipped, which bounds the write rate no matter how fast relays publish.
+    At most MAX_QUEUED snapshots wait for the writer; more are dropped. A write that fails disables
+    recording for the rest of the session.
+    """
+    FLUSH_INTERVAL = 30.0
+    MAX_QUEUED = 64
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, min_interval_ms=1000):
+        self.file = HistoryFile(path, max_bytes)
+        self.min_interval = min_interval_ms / 1000
+        self.last_recorded = {}
+        self.written = 0
+        self.dropped = 0
+        self.enabled = True
+        self._queue = queue.Queue(maxsize=self.MAX_QUEUED)
+        self._thread = threading.Thread(target=self._run, name="HistoryRecorder", daemon=True)
+        self._thread.start()
+
+    def due(self, source):
+        """ Whether record() would keep a snapshot of this source now, to skip building one that would be dropped. """
+        return self.enabled and time.monotonic() - self.last_recorded.get(source, -self.min_interval) >= self.min_interval
+
+    def record(self, source, data):
+        if not self.due(source):
+            return
+        try:
+            self._queue.put_nowait((int(time.time() * 1000), source, data.get("total_pl", 0.0), data.get("trades") or ()))
+        except queue.Full:
+            self.dropped += 1  # The writer is behind; never block the GUI thread or let the backlog grow
+            return
+        self.last_recorded[source] = time.monotonic()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is None:
+                    self.file.close()
+                    return
+                if self.enabled:
+                    try:
+                        self._write(*item)
+                    except Exception as e:
+                        # Keep draining so record() and close() never wait on a dead writer
+                        print(f"[History] ❌ Recording disabled: {e!r}")
+                        self.enabled = False
+            if self.enabled and time.monotonic() - last_flush > self.FLUSH_INTERVAL:
+                try:
+                    self.file.flush()
+                except OSError as e:
+                    print(f"[History] ❌ Recording disabled: {e!r}")
+                    self.enabled = False
+                last_flush = time.monotonic()
+
+    def _write(self, time_ms, source, total_pl, trades):
+        history = self.file
+        rows = np.empty(len(trades) + 1, RECORD_DTYPE)
+        rows["time_ms"] = time_ms
+        rows["source"] = history.source_id(source)
+        rows[0] = (time_ms, 0, total_pl, len(trades), UNKNOWN_SYMBOL, rows["source"][0], FLAG_ACCOUNT)
+        if trades:
+            symbol_id = history.symbol_id
+            positions = rows[1:]
+            positions["ticket"] = [trade.ticket for trade in trades]
+            positions["profit"] = [trade.profit for trade in trades]
+            positions["volume"] = [trade.volume for trade in trades]
+            positions["symbol"] = [symbol_id(trade.symbol) for trade in trades]
+            positions["flags"] = [(FLAG_SELL if trade.type == "Sell" else 0) | (FLAG_ATM if trade.atm_enabled else 0)
+                                  for trade in trades]
+        history.append(time_ms, rows)
+        self.written += 1
+
+    def close(self):
+        """ Writes what is still queued and closes the file. """
+        try:
+            self._queue.put(None, timeout=2)
+        except queue.Full:
+            print("[History] ⚠️ Writer is not draining; history file left open")
+            return
+        self._thread.join(timeout=2)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("usage: python history.py HISTORY_FILE")
+        return
+    history = HistoryFile(sys.argv[1], readonly=True)
+    record_count, index_count = history.counts
+    views = history.read()
+    rows = sum(len(view) for view in views)
+    print(f"{history.path}: {rows:,} of {record_count:,} rows kept ({history.capacity:,} max), {index_count:,} snapshots")
+    if rows:
+        first, last = views[0]["time_ms"][0], views[-1]["time_ms"][-1]
+        print(f"  from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(first / 1000))}"
+              f" to {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last / 1000))}")
+    print(f"  sources: {', '.join(history.sources) or '-'}")
+    print(f"  symbols: {', '.join(history.symbols) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
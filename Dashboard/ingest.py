@@ -0,0 +1,241 @@
+# FILE: ingest.py
+import asyncio
+import random
+import threading
+import time
+
+from trade_store import TradeDecoder, HELLO_MESSAGE, RESYNC_MESSAGE
+
+DEFAULT_RELAY = "127.0.0.1:5000"
+
+# ===================================================================
+# 0. Relay endpoints
+# ===================================================================
+class RelayEndpoint:
+    """ One relay (ws-server.js or relay_stub.py) the dashboard watches, i.e. one MT5 terminal or account. """
+    __slots__ = ("name", "address", "ws_url", "command_url")
+
+    def __init__(self, address, name=None):
+        self.address = address.split("://")[-1].strip().rstrip("/")
+        self.name = name or self.address
+        self.ws_url = f"ws://{self.address}"
+        self.command_url = f"http://{self.address}/command"
+
+    def __repr__(self):
+        return f"RelayEndpoint({self.address!r}, name={self.name!r})"
+
+
+def parse_endpoints(specs):
+    """
+    Parses relay specs of the form "host:port" or "name=host:port".
+    Entries may also be comma separated within one string. Duplicate names are rejected.
+    """
+    endpoints = {}
+    for spec in specs:
+        for item in str(spec).split(","):
+            item = item.strip()
+            if not item:
+                continue
+            name, sep, address = item.partition("=")
+            endpoint = RelayEndpoint(address, name.strip()) if sep else RelayEndpoint(item)
+            if endpoint.name in endpoints:
+                raise ValueError(f"Duplicate relay name: {endpoint.name}")
+            endpoints[endpoint.name] = endpoint
+    return list(endpoints.values()) or [RelayEndpoint(DEFAULT_RELAY)]
+
+
+# ===================================================================
+# 1. Latest-wins coalescing between the network thread and the UI
+# ===================================================================
+class MessageCoalescer:
+    """
+    Buffer between the WebSocket thread and the render tick.
+    Only the newest trade_data snapshot per source is kept, since each one carries the full state;
+    settings and any other control messages are always kept, in arrival order.
+    The UI drains the buffer once per frame, so render work is capped by the frame rate
+    rather than by how fast the relay broadcasts.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._control = []
+        self._since_drain = 0
+        self.received = 0   # frames pushed by the network thread
+        self.rendered = 0   # frames handed to the UI
+        self.dropped = 0    # trade_data snapshots superseded before they were rendered
+        self.merged = 0     # drains that folded several pending frames into one render pass
+
+    def push(self, message):
+        """
+        Stores a decoded message. Returns True if the buffer was empty,
+        i.e. the UI has to be told that a frame is waiting.
+        """
+        with self._lock:
+            was_empty = not self._snapshots and not self._control
+            self.received += 1
+            self._since_drain += 1
+            if message.get("type") == "trade_data":
+                source = message.get("source")
+                if source in self._snapshots:
+                    self.dropped += 1
+                self._snapshots[source] = message
+            else:
+                self._control.append(message)
+            return was_empty
+
+    def drain(self):
+        """ Returns the pending messages (control messages first) and empties the buffer. """
+        with self._lock:
+            messages = self._control
+            messages.extend(self._snapshots.values())
+            self._snapshots = {}
+            self._control = []
+            if self._since_drain > 1:
+                self.merged += 1
+            self._since_drain = 0
+            self.rendered += len(messages)
+            return messages
+
+    def stats(self):
+        with self._lock:
+            return {"received": self.received, "rendered": self.rendered, "dropped": self.dropped, "merged": self.merged}
+
+
+# ===================================================================
+# 2. Relay connections
+# ===================================================================
+class ReconnectBackoff:
+    """
+    Reconnect delays: the first retry is immediate (a restarted relay is usually back at once),
+    then base * 2^n seconds up to cap, each shortened by a random fraction of up to `jitter`
+    so dashboards that lost the same relay don't all reconnect in lockstep.
+    """
+    def __init__(self, base=0.5, cap=30.0, jitter=0.5):
+        self.base = base
+        self.cap = cap
+        self.jitter = jitter
+        self.attempt = 0
+
+    def next_delay(self):
+        attempt = self.attempt
+        self.attempt += 1
+        if attempt == 0:
+            return 0.0
+        return min(self.cap, self.base * 2 ** (attempt - 1)) * (1 - self.jitter * random.random())
+
+    def reset(self):
+        self.attempt = 0
+
+
+class ConnectionStats:
+    """ Connect/disconnect timings of one relay, in seconds unless noted. """
+    __slots__ = ("connects", "disconnects", "handshake_ms", "connected_at", "disconnected_at",
+                 "last_uptime", "last_downtime", "last_error")
+
+    def __init__(self):
+        self.connects = 0
+        self.disconnects = 0
+        self.handshake_ms = 0.0
+        self.connected_at = None
+        self.disconnected_at = None
+        self.last_uptime = 0.0
+        self.last_downtime = 0.0
+        self.last_error = ""
+
+
+class RelayListener:
+    """
+    Listens to every relay concurrently from one asyncio loop. Frames are decoded as they arrive
+    and handed to on_message(message), with message["source"] set to the relay's name;
+    on_status(source, status) reports "connecting", "connected" and "disconnected".
+
+    Dead links are detected with WebSocket pings (no pong within ping_timeout closes the connection).
+    stop() may be called from any thread: it cancels the listener task, which closes every socket
+    without waiting more than close_timeout for the relay's close frame.
+    """
+    STABLE_SECONDS = 5.0
+    def __init__(self, endpoints, on_message, on_status=None, latency=None,
+                 ping_interval=5.0, ping_timeout=5.0, open_timeout=5.0, close_timeout=0.05):
+        self.endpoints = endpoints
+        self.on_message = on_message
+        self.on_status = on_status or (lambda source, status: None)
+        self.latency = latency
+        self.connect_options = {"ping_interval": ping_interval, "ping_timeout": ping_timeout,
+                                "open_timeout": open_timeout, "close_timeout": close_timeout}
+        self.decoders = {endpoint.name: TradeDecoder(endpoint.name) for endpoint in endpoints}
+        self.stats = {endpoint.name: ConnectionStats() for endpoint in endpoints}
+        self.running = True
+        self._loop = None
+        self._task = None
+
+    async def listen(self, endpoint):
+        import websockets  # Deferred so that importing this module stays cheap (headless mode, the ingest process)
+        name = endpoint.name
+        decoder = self.decoders[name]
+        stats = self.stats[name]
+        latency = self.latency
+        backoff = ReconnectBackoff()
+        while self.running:
+            self.on_status(name, "connecting")
+            started = time.perf_counter()
+            try:
+                async with websockets.connect(endpoint.ws_url, **self.connect_options) as websocket:
+                    now = time.perf_counter()
+                    stats.connects += 1
+                    stats.handshake_ms = (now - started) * 1000
+                    stats.last_downtime = now - stats.disconnected_at if stats.disconnected_at is not None else 0.0
+                    stats.connected_at = now
+                    print(f"[WebSocket] ✅ {name}: connected in {stats.handshake_ms:.0f} ms"
+                          + (f" after {stats.last_downtime:.1f} s offline" if stats.disconnected_at is not None else ""))
+                    self.on_status(name, "connected")
+                    decoder.reset()
+                    await websocket.send(HELLO_MESSAGE)
+                    while self.running:
+                        raw = await websocket.recv()
+                        received = time.perf_counter()
+                        message = decoder.decode(raw)
+                        if decoder.resync_pending:
+                            decoder.resync_pending = False
+                            await websocket.send(RESYNC_MESSAGE)
+                        if message is None:
+                            continue
+                        message["source"] = name
+                        if latency is not None and latency.enabled:
+                            latency.stamp(message, received, time.perf_counter(), time.time())
+                        self.on_message(message)
+            except Exception as e:
+                now = time.perf_counter()
+                stats.last_error = repr(e)
+                if stats.connected_at is not None:
+                    stats.disconnects += 1
+                    stats.last_uptime = now - stats.connected_at
+                    stats.connected_at = None
+                    stats.disconnected_at = now
+                    print(f"[WebSocket] ❌ {name}: disconnected after {stats.last_uptime:.1f} s online: {e!r}")
+                    if stats.last_uptime > self.STABLE_SECONDS:
+                        backoff.reset()  # A relay that drops us right after accepting keeps backing off
+                elif stats.disconnected_at is None:
+                    stats.disconnected_at = now
+                self.on_status(name, "disconnected")
+                if self.running:
+                    await asyncio.sleep(backoff.next_delay())
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        if not self.running:
+            return
+        try:
+            await asyncio.gather(*(self.listen(endpoint) for endpoint in self.endpoints))
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        """ Cancels the listeners; safe to call from any thread, before or after run() started. """
+        self.running = False
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # The loop closed in the meantime
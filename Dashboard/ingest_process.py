@@ -0,0 +1,404 @@
+# FILE: ingest_process.py
+import asyncio
+import json
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ingest import RelayListener, ConnectionStats, parse_endpoints
+from latency import LatencyTracker
+from trade_store import TradeRecord
+
+# ===================================================================
+# 1. Shared snapshot layout
+# ===================================================================
+# One shared-memory segment per relay:
+#   segment header | slot 0 | slot 1
+# and each slot:
+#   slot header | blob (JSON: the payload header and the string table) | rows
+# The writer fills the slot the readers are not looking at and then publishes its number in the
+# segment header. A slot's own seq is 0 while it is being written, so a reader that was overtaken
+# (the writer lapped it and started on its slot again) notices and reads again.
+MAGIC = 0x41544D31  # "ATM1"
+HEADER_BYTES = 64
+DEFAULT_CAPACITY = 4096
+DEFAULT_BLOB_CAPACITY = 64 * 1024
+
+SEGMENT_DTYPE = np.dtype([("magic", "<u4"), ("capacity", "<u4"), ("blob_capacity", "<u4"), ("seq", "<u8")], align=True)
+SLOT_DTYPE = np.dtype([("seq", "<u8"), ("structure_seq", "<u8"), ("count", "<u4"), ("blob_size", "<u4"),
+                       ("received", "<f8"), ("decoded", "<f8"), ("received_wall", "<f8"), ("produced", "<f8")], align=True)
+# version: the seq at which the row last changed; structure_seq: the seq at which a ticket last opened or closed
+ROW_DTYPE = np.dtype([("ticket", "<u8"), ("version", "<u8"), ("volume", "<f8"), ("profit", "<f8"),
+                      ("open_price", "<f8"), ("sl", "<f8"), ("tp", "<f8"), ("price", "<f8"),
+                      ("symbol", "<u2"), ("type", "<u2"), ("flags", "u1")], align=True)
+FLAG_ATM = 1
+FLAG_RULE_APPLIED = 2
+
+
+def slot_bytes(capacity, blob_capacity):
+    size = HEADER_BYTES + blob_capacity + capacity * ROW_DTYPE.itemsize
+    return (size + HEADER_BYTES - 1) // HEADER_BYTES * HEADER_BYTES
+
+
+class Slot:
+    """ NumPy views of one slot of a mapped segment. """
+    __slots__ = ("header", "blob", "rows")
+
+    def __init__(self, buf, offset, capacity, blob_capacity):
+        self.header = np.ndarray((), SLOT_DTYPE, buf, offset)
+        self.blob = np.ndarray(blob_capacity, np.uint8, buf, offset + HEADER_BYTES)
+        self.rows = np.ndarray(capacity, ROW_DTYPE, buf, offset + HEADER_BYTES + blob_capacity)
+
+
+class Segment:
+    """ A mapped snapshot segment, created by the writer or attached to by name. """
+    def __init__(self, name=None, capacity=DEFAULT_CAPACITY, blob_capacity=DEFAULT_BLOB_CAPACITY):
+        if name is None:
+            size = HEADER_BYTES + 2 * slot_bytes(capacity, blob_capacity)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.header = np.ndarray((), SEGMENT_DTYPE, self.shm.buf)
+            self.header["capacity"] = capacity
+            self.header["blob_capacity"] = blob_capacity
+            self.header["seq"] = 0
+            self.header["magic"] = MAGIC
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.header = np.ndarray((), SEGMENT_DTYPE, self.shm.buf)
+            if int(self.header["magic"]) != MAGIC:
+                self.header = None
+                self.shm.close()
+                raise ValueError(f"Not a snapshot segment: {name}")
+        self.name = self.shm.name
+        self.capacity = int(self.header["capacity"])
+        self.blob_capacity = int(self.header["blob_capacity"])
+        size = slot_bytes(self.capacity, self.blob_capacity)
+        self.slots = [Slot(self.shm.buf, HEADER_BYTES + i * size, self.capacity, self.blob_capacity) for i in (0, 1)]
+
+    def close(self, unlink=False):
+        # The views must go before the mapping can be closed
+        self.header = self.slots = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass  # The writer already did
+
+def unlink_segment(name):
+    """ Removes a segment whose writer is gone; one that was unlinked already is fine. """
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+# ===================================================================
+# 2. Writer (ingest process)
+# ===================================================================
+class SnapshotWriter:
+    """
+    Publishes one relay's decoded snapshots. The TradeDecoder hands over the same TradeRecord object
+    for a position that did not change, so a row's version only moves when the record does and
+    readers copy just the rows that changed since their last read, however many snapshots they skipped.
+    When a snapshot outgrows the segment a segment twice the size replaces it; publish() then returns
+    the new name, which the readers have to attach to.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, blob_capacity=DEFAULT_BLOB_CAPACITY):
+        self.segment = Segment(capacity=capacity, blob_capacity=blob_capacity)
+        self.seq = 0
+        self.structure_seq = 0
+        self.published = {}  # ticket -> (TradeRecord, version)
+        self.strings = []
+        self.string_ids = {}
+
+    @property
+    def name(self):
+        return self.segment.name
+
+    def string_id(self, text):
+        index = self.string_ids.get(text)
+        if index is None:
+            index = self.string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def publish(self, data, timing=None):
+        trades = data.get("trades") or ()
+        seq = self.seq + 1
+        previous = self.published
+        published = {}
+        versions = []
+        opened = False
+        for trade in trades:
+            entry = previous.get(trade.ticket)
+            if entry is None:
+                opened = True
+                version = seq
+            else:
+                version = entry[1] if entry[0] is trade else seq
+            published[trade.ticket] = (trade, version)
+            versions.append(version)
+        if opened or len(published) != len(previous) or len(published) != len(trades):
+            self.structure_seq = seq
+        symbols = [self.string_id(trade.symbol) for trade in trades]
+        types = [self.string_id(trade.type) for trade in trades]
+        header = {key: value for key, value in data.items() if key != "trades"}
+        blob = json.dumps({"data": header, "strings": self.strings}).encode("utf-8")
+
+        renamed = None
+        segment = self.segment
+        if len(trades) > segment.capacity or len(blob) > segment.blob_capacity:
+            capacity, blob_capacity = segment.capacity, segment.blob_capacity
+            while capacity < len(trades):
+                capacity *= 2
+            while blob_capacity < len(blob):
+                blob_capacity *= 2
+            segment.close(unlink=True)
+            segment = self.segment = Segment(capacity=capacity, blob_capacity=blob_capacity)
+            self.structure_seq = seq  # Readers start over on the new segment
+            renamed = segment.name
+
+        count = len(trades)
+        slot = segment.slots[seq & 1]
+        slot.header["seq"] = 0
+        rows = slot.rows[:count]
+        rows["ticket"] = np.fromiter((t.ticket for t in trades), np.uint64, count)
+        rows["version"] = versions
+        rows["volume"] = np.fromiter((t.volume for t in trades), np.float64, count)
+        rows["profit"] = np.fromiter((t.profit for t in trades), np.float64, count)
+        rows["open_price"] = np.fromiter((t.open_price for t in trades), np.float64, count)
+        rows["sl"] = np.fromiter((t.sl for t in trades), np.float64, count)
+        rows["tp"] = np.fromiter((t.tp for t in trades), np.float64, count)
+        rows["price"] = np.fromiter((t.price for t in trades), np.float64, count)
+        rows["symbol"] = symbols
+        rows["type"] = types
+        rows["flags"] = np.fromiter(((FLAG_ATM if t.atm_enabled else 0) | (FLAG_RULE_APPLIED if t.rule_applied else 0)
+                                     for t in trades), np.uint8, count)
+        slot.blob[:len(blob)] = np.frombuffer(blob, np.uint8)
+        received, decoded, received_wall, produced = (timing or (0.0, 0.0, 0.0, 0.0))[:4]
+        slot.header["structure_seq"] = self.structure_seq
+        slot.header["count"] = count
+        slot.header["blob_size"] = len(blob)
+        slot.header["received"] = received
+        slot.header["decoded"] = decoded
+        slot.header["received_wall"] = received_wall
+        slot.header["produced"] = produced if isinstance(produced, (int, float)) else 0.0
+        slot.header["seq"] = seq
+        segment.header["seq"] = seq
+        self.seq = seq
+        self.published = published
+        return renamed
+
+    def close(self):
+        self.segment.close(unlink=True)
+
+# ===================================================================
+# 3. Reader (GUI process)
+# ===================================================================
+class SnapshotView:
+    """ One relay's segment as seen by the GUI, and the seq it last applied. """
+    RETRIES = 3
+
+    def __init__(self, source, name):
+        self.source = source
+        self.segment = Segment(name)
+        self.applied = 0
+        self.strings = []
+
+    def read(self, lookup, with_timing=False):
+        """
+        Returns a trade_frame message with the rows that changed since the last read, or None when
+        nothing new was published. lookup(key) returns the GUI's current TradeRecord for a key, whose
+        cached texts are reused. Only the changed rows, the blob and (when a ticket opened or closed)
+        the ticket column are copied out of shared memory.
+        """
+        segment = self.segment
+        seq = int(segment.header["seq"])
+        for _ in range(self.RETRIES):
+            if seq == self.applied:
+                return None
+            slot = segment.slots[seq & 1]
+            if int(slot.header["seq"]) == seq:
+                header = slot.header.copy()
+                rows = slot.rows[:int(header["count"])]
+                changed = rows[rows["version"] > self.applied] if self.applied else rows.copy()
+                tickets = rows["ticket"].copy() if not self.applied or int(header["structure_seq"]) > self.applied else None
+                blob = slot.blob[:int(header["blob_size"])].tobytes()
+                if int(slot.header["seq"]) == seq:
+                    break
+            seq = int(segment.header["seq"])
+        else:
+            return None  # Lapped by the writer every time; the next render tick tries again
+
+        self.applied = seq
+        payload = json.loads(blob)
+        strings = self.strings = payload["strings"]
+        source = self.source
+        records = []
+        for ticket, _, volume, profit, open_price, sl, tp, price, symbol, type_, flags in changed.tolist():
+            atm_enabled = bool(flags & FLAG_ATM)
+            rule_applied = bool(flags & FLAG_RULE_APPLIED)
+            old = lookup((source, ticket))
+            if old is None:
+                records.append(TradeRecord(ticket, strings[symbol], strings[type_], volume, profit, atm_enabled,
+                                           source=source, open_price=open_price, sl=sl, tp=tp, price=price,
+                                           rule_applied=rule_applied))
+            else:
+                records.append(TradeRecord(ticket, old.symbol, old.type, volume, profit, atm_enabled, old.ticket_text,
+                                           old.volume_text if old.volume == volume else None,
+                                           old.profit_text if old.profit == profit else None, source,
+                                           open_price, sl, tp, price, rule_applied))
+        message = {"type": "trade_frame", "source": source, "seq": seq, "data": payload["data"], "changed": records,
+                   "tickets": None if tickets is None else tickets.tolist()}
+        if with_timing and header["received"]:
+            message["timing"] = [float(header["received"]), float(header["decoded"]),
+                                 float(header["received_wall"]), float(header["produced"]), 0.0, 0.0]
+        return message
+
+    def close(self, unlink=False):
+        self.segment.close(unlink)
+
+
+class SnapshotReader:
+    """ The GUI side of the handoff: maps every relay's segment and polls them on the render tick. """
+    def __init__(self):
+        self.views = {}
+
+    def attach(self, source, name):
+        old = self.views.pop(source, None)
+        if old is not None:
+            # Normally the writer unlinked the old segment already, but not if the ingest process died
+            old.close(unlink=True)
+        self.views[source] = SnapshotView(source, name)
+
+    def poll(self, lookup, with_timing=False):
+        frames = []
+        for view in self.views.values():
+            frame = view.read(lookup, with_timing)
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def close(self):
+        for view in self.views.values():
+            view.close(unlink=True)
+        self.views = {}
+
+# ===================================================================
+# 4. Ingest process
+# ===================================================================
+def run_ingest(specs, conn, capacity=DEFAULT_CAPACITY):
+    """
+    Entry point of the ingest process: listens to the relays, decodes and diffs every frame and
+    publishes trade_data into shared memory. Everything else goes through conn as events:
+    ("segment", source, name), ("status", source, status, stats) and ("message", message).
+    Exits when the parent sends anything or goes away.
+    """
+    endpoints = parse_endpoints(specs)
+    writers = {endpoint.name: SnapshotWriter(capacity) for endpoint in endpoints}
+    send_lock = threading.Lock()
+
+    def send(event):
+        with send_lock:
+            try:
+                conn.send(event)
+            except (OSError, EOFError):
+                listener.stop()
+
+    def on_message(message):
+        source = message.get("source")
+        if message.get("type") == "trade_data":
+            renamed = writers[source].publish(message.get("data") or {}, message.get("timing"))
+            if renamed:
+                send(("segment", source, renamed))
+        else:
+            send(("message", message))
+
+    def on_status(source, status):
+        stats = listener.stats[source]
+        send(("status", source, status, {field: getattr(stats, field) for field in ConnectionStats.__slots__}))
+
+    def watch_parent():
+        try:
+            conn.recv()
+        except (OSError, EOFError):
+            pass
+        listener.stop()
+
+    # Always stamped: it costs next to nothing here and the GUI decides whether to use it
+    listener = RelayListener(endpoints, on_message, on_status, LatencyTracker(enabled=True))
+    for name, writer in writers.items():
+        send(("segment", name, writer.name))
+    threading.Thread(target=watch_parent, name="IngestParent", daemon=True).start()
+    try:
+        asyncio.run(listener.run())
+    finally:
+        for writer in writers.values():
+            writer.close()
+        conn.close()
+
+
+class IngestProcess:
+    """
+    Parent-side handle of the ingest process. The process is spawned, never forked, so it starts
+    without the GUI's threads and Qt state. events() blocks and yields the process's events until it exits;
+    stop() may be called from another thread and makes events() return.
+    """
+    def __init__(self, endpoints, capacity=DEFAULT_CAPACITY):
+        self.specs = [f"{endpoint.name}={endpoint.address}" for endpoint in endpoints]
+        self.capacity = capacity
+        self.process = None
+        self.conn = None
+        self.segments = set()  # Every segment the process announced, to unlink if it has to be killed
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=run_ingest, args=(self.specs, child_conn, self.capacity),
+                                       name="Ingest", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def events(self):
+        conn = self.conn
+        try:
+            while True:
+                event = conn.recv()
+                if event[0] == "segment":
+                    self.segments.add(event[2])
+                yield event
+        except (OSError, EOFError):
+            pass
+        finally:
+            conn.close()
+
+    def stop(self, timeout=0.2):
+        """
+        Asks the process to exit and terminates it if it has not within timeout. Called from the GUI thread
+        when the window closes, so it waits about 2 x timeout at most; a process that had to be terminated
+        did not unlink its segments, which is done here.
+        """
+        process = self.process
+        if process is None:
+            return
+        try:
+            self.conn.send("stop")
+        except (OSError, EOFError):
+            pass
+        process.join(timeout)
+        if process.is_alive():
+            print("[Ingest] ⚠️ Ingest process did not stop, terminating it")
+            process.terminate()
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+            for name in list(self.segments):
+                unlink_segment(name)
+        self.segments.clear()
+        self.process = None
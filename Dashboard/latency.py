@@ -0,0 +1,183 @@
+# FILE: latency.py
+import json
+import time
+
+# Stages of one trade_data message, in pipeline order:
+#   producer  EA timestamp -> WebSocket receive (EA timer, HTTP post, relay, network; needs "ts" in the payload)
+#   decode    receive -> decoded into TradeRecords (network thread)
+#   dispatch  decoded -> drained on the GUI thread (coalescing, signal delivery, render tick)
+#   model     drained -> applied to the table model and totals
+#   paint     applied -> table viewport painted
+#   total     producer timestamp (or receive, without one) -> painted
+STAGES = ("producer", "decode", "dispatch", "model", "paint", "total")
+
+# ===================================================================
+# 1. HDR-style histogram
+# ===================================================================
+class LatencyHistogram:
+    """
+    Log-linear histogram of microsecond values, in the spirit of HdrHistogram:
+    exact below 32 µs, then 16 buckets per power of two (about 6% relative precision),
+    so recording is O(1) and the memory is fixed no matter how many values are added.
+    """
+    SUB_BUCKETS = 16
+    MAX_SHIFT = 36  # Values above ~2^41 µs (25 days) land in the last bucket
+
+    def __init__(self):
+        self.counts = [0] * (self.SUB_BUCKETS * (self.MAX_SHIFT + 2))
+        self.total = 0
+        self.max = 0
+
+    @classmethod
+    def bucket_of(cls, value):
+        if value < 2 * cls.SUB_BUCKETS:
+            return value
+        shift = min(value.bit_length() - 5, cls.MAX_SHIFT)
+        return min(cls.SUB_BUCKETS * shift + (value >> shift), cls.SUB_BUCKETS * (cls.MAX_SHIFT + 2) - 1)
+
+    @classmethod
+    def bucket_value(cls, index):
+        """ Upper edge of a bucket, so percentiles never under-report. """
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.SUB_BUCKETS - 1
+        return ((index - cls.SUB_BUCKETS * shift + 1) << shift) - 1
+
+    def record(self, micros):
+        micros = max(int(micros), 0)
+        self.counts[self.bucket_of(micros)] += 1
+        self.total += 1
+        if micros > self.max:
+            self.max = micros
+
+    def add(self, other):
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        if not self.total:
+            return 0
+        target = max(1, int(round(fraction * self.total)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                if index == len(self.counts) - 1:
+                    return self.max  # The overflow bucket has no upper edge
+                return min(self.bucket_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.total, "p50_ms": self.percentile(0.50) / 1000, "p90_ms": self.percentile(0.90) / 1000,
+                "p99_ms": self.percentile(0.99) / 1000, "max_ms": self.max / 1000}
+
+
+class RollingHistogram:
+    """ The last window_seconds of values, kept as a ring of fixed-width slices. """
+    def __init__(self, window_seconds=60, slices=6):
+        self.slice_seconds = window_seconds / slices
+        self.slices = [LatencyHistogram() for _ in range(slices)]
+        self.slice_started = [0.0] * slices
+        self.current = 0
+
+    def record(self, micros, now):
+        if now - self.slice_started[self.current] >= self.slice_seconds:
+            self.current = (self.current + 1) % len(self.slices)
+            self.slices[self.current] = LatencyHistogram()
+            self.slice_started[self.current] = now
+        self.slices[self.current].record(micros)
+
+    def snapshot(self, now):
+        merged = LatencyHistogram()
+        horizon = self.slice_seconds * len(self.slices)
+        for started, histogram in zip(self.slice_started, self.slices):
+            if now - started < horizon:
+                merged.add(histogram)
+        return merged
+
+# ===================================================================
+# 2. Per-stage tracker
+# ===================================================================
+class LatencyTracker:
+    """
+    Collects per-stage latencies of trade_data messages. The network thread calls stamp()
+    once per message, which attaches the receive/decode times to the message itself; everything
+    else is recorded on the GUI thread, so no locking is needed. When disabled, stamp() is the only
+    cost on the hot path: a single attribute check.
+    """
+    def __init__(self, enabled=False, window_seconds=60):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.reset()
+
+    def reset(self):
+        self.histograms = {stage: RollingHistogram(self.window_seconds) for stage in STAGES}
+        self.awaiting_paint = []
+
+    def stamp(self, message, received, decoded, received_wall):
+        """ Network thread: remembers when the frame arrived and when it was decoded. """
+        if self.enabled and message.get("type") == "trade_data":
+            data = message.get("data") or {}
+            produced = data.get("ts", message.get("ts"))
+            message["timing"] = [received, decoded, received_wall, produced, 0.0, 0.0]
+
+    def dispatched(self, message):
+        """ GUI thread, right after the message was drained from the coalescer. """
+        timing = message.get("timing")
+        if timing is not None:
+            timing[4] = time.perf_counter()
+
+    def applied(self, message):
+        """ GUI thread, after the model and totals were updated. Paint is recorded on the next paint. """
+        timing = message.get("timing")
+        if timing is not None:
+            timing[5] = time.perf_counter()
+            self.awaiting_paint.append(timing)
+
+    def painted(self):
+        if not self.awaiting_paint:
+            return
+        now = time.perf_counter()
+        wall = time.time()
+        hist = self.histograms
+        for received, decoded, received_wall, produced, dispatched, applied in self.awaiting_paint:
+            hist["decode"].record((decoded - received) * 1e6, now)
+            hist["dispatch"].record((dispatched - decoded) * 1e6, now)
+            hist["model"].record((applied - dispatched) * 1e6, now)
+            hist["paint"].record((now - applied) * 1e6, now)
+            if isinstance(produced, (int, float)) and produced > 0:
+                hist["producer"].record((received_wall * 1000 - produced) * 1000, now)
+                hist["total"].record((wall * 1000 - produced) * 1000, now)
+            else:
+                hist["total"].record((now - received) * 1e6, now)
+        self.awaiting_paint = []
+
+    def summary(self):
+        now = time.perf_counter()
+        return {stage: self.histograms[stage].snapshot(now).summary() for stage in STAGES}
+
+    def format_table(self):
+        lines = [f"{'stage':<9}{'n':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  ms"]
+        for stage, s in self.summary().items():
+            lines.append(f"{stage:<9}{s['count']:>7}{s['p50_ms']:>9.2f}{s['p90_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}")
+        return "\n".join(lines)
+
+    def dump(self, path, commands=None, stalls=None):
+        """ Writes the current percentiles and raw bucket counts as JSON, plus the command round trips and UI stalls if given. """
+        now = time.perf_counter()
+        report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "window_seconds": self.window_seconds, "stages": {}}
+        for stage in STAGES:
+            histogram = self.histograms[stage].snapshot(now)
+            report["stages"][stage] = dict(histogram.summary(), buckets={
+                LatencyHistogram.bucket_value(index): count for index, count in enumerate(histogram.counts) if count})
+        if commands is not None:
+            report["commands"] = commands
+        if stalls is not None:
+            report["stalls"] = stalls
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return path
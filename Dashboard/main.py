@@ -1,13 +1,32 @@
 # FILE: main.py
 import sys
-from PyQt6.QtWidgets import QApplication
-from app_logic import MainWindow
+import argparse
+import multiprocessing
 
 if __name__ == "__main__":
     """
 The main starting point of the program
     """
-    app = QApplication(sys.argv)
-    window = MainWindow()
+    # Qt is imported here rather than at the top: the ingest process re-imports this module
+    # when it is spawned, and the headless mode has no use for it either.
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Hybrid trading dashboard")
+    parser.add_argument("--relay", action="append", metavar="[NAME=]HOST:PORT",
+                        help="relay to watch; repeat for several terminals (default: saved setting or 127.0.0.1:5000)")
+    parser.add_argument("--ingest-process", action=argparse.BooleanOptionalAction, default=None,
+                        help="read, decode and diff the relays in a separate process (default: saved setting, off)")
+    parser.add_argument("--headless", action="store_true",
+                        help="terminal dashboard without Qt, for SSH sessions (see headless.py --help for its options)")
+    args, qt_args = parser.parse_known_args()
+
+    if args.headless:
+        from headless import main as headless_main
+        sys.exit(headless_main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+
+    from PyQt6.QtWidgets import QApplication
+    from app_logic import MainWindow
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = MainWindow(relays=args.relay, ingest_process=args.ingest_process)
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -0,0 +1,374 @@
+# FILE: relay_stub.py
+"""
+A small stand-in for ws-server.js, written with the standard library only,
+so the dashboard protocol can be exercised locally without Node.js or MetaTrader.
+
+It serves the same endpoints on one port (POST /data, POST /command, GET /get-command,
+GET /get-settings and the WebSocket upgrade) and additionally speaks protocol 2:
+dashboards that send a hello with the "delta" feature receive sequence-numbered
+trade_delta messages instead of full snapshots, and a snapshot whenever they ask to resync.
+With the "binary" feature those come as binary frames (binary_frames.py) instead of JSON,
+and every message is compressed when the dashboard offers permessage-deflate (RFC 7692).
+
+    python relay_stub.py --port 5000 --drop-rate 0.05
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import struct
+import zlib
+from collections import deque
+
+from binary_frames import MOVE_FIELDS, FrameEncoder
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+# ===================================================================
+# 1. Minimal WebSocket framing (RFC 6455)
+# ===================================================================
+def encode_frame(opcode, payload):
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack("!H", length)
+    else:
+        header += bytes([127]) + struct.pack("!Q", length)
+    return header + payload
+
+
+def unmask(data, mask):
+    # XOR the whole payload at once instead of byte by byte
+    repeated = (mask * (len(data) // 4 + 1))[:len(data)]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(data), "big")
+
+
+async def read_frame(reader):
+    """ Reads one (possibly fragmented) message and returns (opcode, payload, compressed). """
+    opcode, chunks, compressed = None, [], False
+    while True:
+        b1, b2 = await reader.readexactly(2)
+        length = b2 & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        mask = await reader.readexactly(4) if b2 & 0x80 else None
+        data = await reader.readexactly(length)
+        if mask:
+            data = unmask(data, mask)
+        frame_op = b1 & 0x0F
+        if frame_op >= OP_CLOSE:
+            return frame_op, data, False  # Control frames are never fragmented or compressed
+        if frame_op != OP_CONT:
+            opcode = frame_op
+            compressed = bool(b1 & 0x40)  # RSV1 on the first frame: permessage-deflate
+        chunks.append(data)
+        if b1 & 0x80:
+            return opcode, b"".join(chunks), compressed
+
+# ===================================================================
+# 2. permessage-deflate (RFC 7692)
+# ===================================================================
+def parse_extensions(header):
+    """ "a; x=1, b" -> [("a", {"x": "1"}), ("b", {})] """
+    offers = []
+    for offer in header.split(","):
+        name, *params = [part.strip() for part in offer.split(";")]
+        if name:
+            offers.append((name.lower(), dict((key.strip().lower(), value.strip().strip('"'))
+                                              for key, _, value in (param.partition("=") for param in params if param))))
+    return offers
+
+
+class Deflate:
+    """
+    The server side of a negotiated permessage-deflate: messages over MIN_SIZE are compressed with
+    one compressor kept across messages (unless the client asked for server_no_context_takeover),
+    so repeated field names and unchanged values cost a few bits after the first message.
+    """
+    MIN_SIZE = 128
+
+    def __init__(self, params):
+        bits = params.get("server_max_window_bits")
+        self.window_bits = int(bits) if bits else 15
+        self.no_context_takeover = "server_no_context_takeover" in params
+        self.compressor = None
+        self.decompressor = zlib.decompressobj(-15)
+        response = ["permessage-deflate"]
+        if self.no_context_takeover:
+            response.append("server_no_context_takeover")
+        if bits:
+            response.append(f"server_max_window_bits={self.window_bits}")
+        self.response = "; ".join(response)
+
+    @classmethod
+    def negotiate(cls, header):
+        """ A Deflate for the first acceptable offer in Sec-WebSocket-Extensions, or None. """
+        for name, params in parse_extensions(header or ""):
+            if name == "permessage-deflate" and 9 <= int(params.get("server_max_window_bits") or 15) <= 15:
+                return cls(params)
+        return None
+
+    def compress(self, payload):
+        if self.compressor is None or self.no_context_takeover:
+            self.compressor = zlib.compressobj(wbits=-self.window_bits)
+        data = self.compressor.compress(payload) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data[:-4] if data.endswith(b"\x00\x00\xff\xff") else data
+
+    def decompress(self, data):
+        return self.decompressor.decompress(data + b"\x00\x00\xff\xff")
+
+
+class WsClient:
+    """ One connected dashboard. """
+    def __init__(self, writer, deflate=None):
+        self.writer = writer
+        self.deflate = deflate
+        self.delta = False      # Negotiated protocol 2 via hello
+        self.binary = False     # ... with binary frames
+        self.synced = False     # Has received a snapshot it can apply deltas to
+        self.bytes_sent = 0
+
+    def send(self, opcode, payload):
+        if self.writer.is_closing():
+            return
+        if self.deflate is not None and len(payload) >= Deflate.MIN_SIZE:
+            frame = bytearray(encode_frame(opcode, self.deflate.compress(payload)))
+            frame[0] |= 0x40  # RSV1: compressed
+        else:
+            frame = encode_frame(opcode, payload)
+        self.bytes_sent += len(frame)
+        self.writer.write(frame)
+
+    def send_text(self, text):
+        self.send(OP_TEXT, text.encode("utf-8"))
+
+    def send_binary(self, data):
+        self.send(OP_BINARY, data)
+
+# ===================================================================
+# 3. Relay
+# ===================================================================
+class Relay:
+    """ Mirrors ws-server.js: queues commands for the EA and broadcasts its data to dashboards. """
+    def __init__(self, drop_rate=0.0):
+        self.drop_rate = drop_rate
+        self.command_queue = deque()
+        self.trade_rule = {"triggerPercent": 40.0, "moveToBE": True, "closePercent": 50.0, "auto_trading_enabled": True}
+        self.clients = set()
+        self.seq = 0
+        self.last_data = None
+        self.last_trades = {}
+        self.encoder = FrameEncoder()
+
+    # --- HTTP ---------------------------------------------------------
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readuntil(b"\r\n")
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readuntil(b"\r\n")
+                    if line == b"\r\n":
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get("upgrade", "").lower() == "websocket":
+                    await self.serve_websocket(reader, writer, headers)
+                    return
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, response = self.route(method, path.split("?", 1)[0], body)
+                # Compact like JSON.stringify; the EA's parser matches "key": without spaces
+                payload = json.dumps(response, separators=(",", ":")).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    "Connection: keep-alive\r\n\r\n".encode("latin-1") + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def route(self, method, path, body):
+        if method == "POST" and path == "/data":
+            try:
+                data = json.loads(body)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                return 400, {"status": "error", "message": "Invalid JSON data"}
+            self.publish(data)
+            return 200, {"status": "success"}
+        if method == "POST" and path == "/command":
+            try:
+                command = json.loads(body)
+            except ValueError:
+                command = None
+            if not isinstance(command, dict) or not command.get("action"):
+                return 400, {"status": "error"}
+            print("[Python -> Server] New command received🔵.", command)
+            self.handle_command(command)
+            return 200, {"status": "success"}
+        if method == "GET" and path == "/get-command":
+            return 200, self.command_queue.popleft() if self.command_queue else {"status": "no command"}
+        if method == "GET" and path == "/get-settings":
+            return 200, self.trade_rule
+        return 404, {"status": "error", "message": "Not found"}
+
+    def handle_command(self, command):
+        if command["action"] == "update_settings":
+            self.trade_rule.update(command.get("settings") or {})
+            self.broadcast_settings()
+        elif command["action"] == "toggle_auto":
+            self.trade_rule["auto_trading_enabled"] = command.get("auto_state")
+            self.broadcast_settings()
+        else:
+            self.command_queue.append(command)
+
+    # --- WebSocket ----------------------------------------------------
+    async def serve_websocket(self, reader, writer, headers):
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest()).decode()
+        deflate = Deflate.negotiate(headers.get("sec-websocket-extensions"))
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            + (f"Sec-WebSocket-Extensions: {deflate.response}\r\n" if deflate is not None else "")
+            + f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("latin-1"))
+        client = WsClient(writer, deflate)
+        self.clients.add(client)
+        print("[WebSocket]  Python dashboard connected✅.")
+        client.send_text(json.dumps({"type": "settings", "data": self.trade_rule}))
+        try:
+            while True:
+                opcode, payload, compressed = await read_frame(reader)
+                if compressed and client.deflate is not None:
+                    payload = client.deflate.decompress(payload)
+                if opcode == OP_CLOSE:
+                    writer.write(encode_frame(OP_CLOSE, payload[:2]))
+                    break
+                if opcode == OP_PING:
+                    writer.write(encode_frame(OP_PONG, payload))
+                elif opcode == OP_TEXT:
+                    self.handle_client_message(client, json.loads(payload))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, zlib.error):
+            pass
+        finally:
+            self.clients.discard(client)
+            print("[WebSocket]  The dashboard was disconnected❌.")
+
+    def handle_client_message(self, client, message):
+        msg_type = message.get("type")
+        if msg_type == "hello":
+            features = message.get("features") or ()
+            client.delta = "delta" in features
+            client.binary = client.delta and "binary" in features
+            print(f"[WebSocket]  Dashboard speaks {'binary' if client.binary else 'JSON'}"
+                  f"{' deltas' if client.delta else ' snapshots'}{', deflate' if client.deflate else ''}.")
+            self.send_snapshot(client)
+        elif msg_type == "resync":
+            print("[WebSocket]  Dashboard requested a snapshot🔄.")
+            self.send_snapshot(client)
+
+    def send_snapshot(self, client):
+        if self.last_data is not None:
+            if client.binary:
+                client.send_binary(self.encoder.snapshot(self.seq, self.last_data))
+            else:
+                client.send_text(json.dumps({"type": "trade_data", "seq": self.seq, "data": self.last_data}))
+            client.synced = True
+
+    def broadcast_settings(self):
+        text = json.dumps({"type": "settings", "data": self.trade_rule})
+        for client in self.clients:
+            client.send_text(text)
+
+    def publish(self, data):
+        """
+        Broadcasts one EA post: a delta to protocol 2 dashboards, a snapshot to everyone else.
+        Each encoding is built at most once per post, and only if some dashboard needs it.
+        """
+        trades = {trade.get("ticket"): trade for trade in data.get("trades") or ()}
+        previous = self.last_trades
+        opened = [trade for ticket, trade in trades.items() if ticket not in previous]
+        closed = [ticket for ticket in previous if ticket not in trades]
+        changed = [trade for ticket, trade in trades.items() if ticket in previous and previous[ticket] != trade]
+        header = {key: value for key, value in data.items() if key != "trades"}
+
+        self.seq += 1
+        self.last_data = data
+        self.last_trades = trades
+        encoded = {}
+        def encode(kind):
+            if kind not in encoded:
+                if kind == "json_delta":
+                    fields = [dict({key: value for key, value in trade.items() if previous[trade["ticket"]].get(key) != value},
+                                   ticket=trade["ticket"]) for trade in changed]
+                    encoded[kind] = json.dumps({"type": "trade_delta", "seq": self.seq,
+                                                "data": {**header, "opened": opened, "closed": closed, "changed": fields}})
+                elif kind == "binary_delta":
+                    moved, rest = [], []
+                    for trade in changed:
+                        old = previous[trade["ticket"]]
+                        only_moved = old.keys() == trade.keys() and all(
+                            old[key] == value for key, value in trade.items() if key not in MOVE_FIELDS)
+                        (moved if only_moved else rest).append(trade)
+                    encoded[kind] = self.encoder.delta(self.seq, header, opened, moved, rest, closed)
+                elif kind == "binary_snapshot":
+                    encoded[kind] = self.encoder.snapshot(self.seq, data)
+                else:
+                    encoded[kind] = json.dumps({"type": "trade_data", "seq": self.seq, "data": data})
+            return encoded[kind]
+
+        for client in self.clients:
+            if client.delta and client.synced:
+                if self.drop_rate and random.random() < self.drop_rate:
+                    continue  # Simulate a lost delta so the dashboard has to resync
+                if client.binary:
+                    client.send_binary(encode("binary_delta"))
+                else:
+                    client.send_text(encode("json_delta"))
+            else:
+                if client.binary:
+                    client.send_binary(encode("binary_snapshot"))
+                else:
+                    client.send_text(encode("json_snapshot"))
+                client.synced = True
+
+
+async def serve(host, port, drop_rate):
+    relay = Relay(drop_rate)
+    server = await asyncio.start_server(relay.handle_connection, host, port)
+    print("=============================================")
+    print("🚀stand-in relay is running...")
+    print(f"http://{host}:{port}")
+    print("=============================================")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in for ws-server.js with delta protocol support.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of deltas to drop, to exercise resync")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.drop_rate))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# FILE: sparkline.py
+from collections import deque
+
+from PyQt6.QtWidgets import QWidget, QSizePolicy
+from PyQt6.QtGui import QPainter, QPixmap, QColor, QPen
+from PyQt6.QtCore import Qt, QSize
+
+# ===================================================================
+# 1. Multi-resolution min/max series
+# ===================================================================
+class MultiResolutionSeries:
+    """
+    A time series kept as min/max/last buckets at power-of-two time resolutions
+    (base_seconds, 2x, 4x, ...). Each level holds at most `capacity` buckets, so fine levels
+    only remember the recent past while coarser ones cover the whole session. A level is added
+    only when the session outgrows the coarsest one, so memory grows with the logarithm of the
+    session length, and any zoom maps to a level whose buckets are one pixel column each.
+    """
+    def __init__(self, base_seconds=1.0, capacity=1024):
+        self.base_seconds = base_seconds
+        self.capacity = capacity
+        self.levels = []   # per level: deque of finished [index, low, high, last]
+        self.current = []  # per level: the bucket still being filled
+        self.first_time = None
+        self.last_time = None
+
+    def width(self, level):
+        return self.base_seconds * (1 << level)
+
+    def append(self, t, value):
+        if self.first_time is None:
+            self.first_time = t
+        elif t < self.last_time:
+            t = self.last_time  # The wall clock stepped back; keep the buckets ordered
+        self.last_time = t
+        # Add the next level while the coarsest one still remembers the start of the session
+        while not self.levels or (t - self.first_time > (self.capacity - 2) * self.width(len(self.levels) - 1)):
+            self._add_level()
+        for level, finished in enumerate(self.levels):
+            index = int(t // self.width(level))
+            bucket = self.current[level]
+            if bucket is not None and bucket[0] == index:
+                if value < bucket[1]:
+                    bucket[1] = value
+                if value > bucket[2]:
+                    bucket[2] = value
+                bucket[3] = value
+            else:
+                if bucket is not None:
+                    finished.append(bucket)
+                self.current[level] = [index, value, value, value]
+
+    def _add_level(self):
+        level = len(self.levels)
+        finished = deque(maxlen=self.capacity)
+        current = None
+        if level:
+            # Build the new level from the one below so it covers everything seen so far
+            for index, low, high, last in list(self.levels[level - 1]) + [self.current[level - 1]]:
+                index //= 2
+                if current is not None and current[0] == index:
+                    current[1] = min(current[1], low)
+                    current[2] = max(current[2], high)
+                    current[3] = last
+                else:
+                    if current is not None:
+                        finished.append(current)
+                    current = [index, low, high, last]
+        self.levels.append(finished)
+        self.current.append(current)
+
+    def buckets(self, level, first_index):
+        """ Buckets of a level from first_index on (oldest first), including the one being filled. """
+        result = []
+        if self.current[level] is not None and self.current[level][0] >= first_index:
+            result.append(self.current[level])
+        for bucket in reversed(self.levels[level]):
+            if bucket[0] < first_index:
+                break
+            result.append(bucket)
+        result.reverse()
+        return result
+
+    def latest(self, level):
+        return self.current[level] if level < len(self.current) else None
+
+    def __len__(self):
+        return sum(len(finished) for finished in self.levels)
+
+# ===================================================================
+# 2. Sparkline widget
+# ===================================================================
+class PnlSparkline(QWidget):
+    """
+    Compact P/L curve, one pixel column per bucket of the chosen series level.
+    The picture is cached in a pixmap: a new value only repaints the last column, a new bucket
+    scrolls the pixmap and draws the new columns, and only a zoom change, a resize or a value
+    outside the current vertical range redraws all columns, so the cost per update does not
+    depend on how long the session is. The mouse wheel zooms; a double-click goes back to
+    fitting the whole session.
+    """
+    PROFIT_COLOR = QColor("#27ae60")
+    LOSS_COLOR = QColor("#c0392b")
+
+    def __init__(self, parent=None, base_seconds=1.0):
+        super().__init__(parent)
+        self.series = MultiResolutionSeries(base_seconds)
+        self.level = 0
+        self.auto_fit = True
+        self.low = self.high = 0.0
+        self.pixmap = None
+        self.drawn_index = None   # Bucket index of the rightmost drawn column
+        self.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent, False)
+
+    def sizeHint(self):
+        return QSize(180, 26)
+
+    # --- data ---------------------------------------------------------
+    def append(self, t, value):
+        self.series.append(t, value)
+        level = self.fit_level() if self.auto_fit else self.level
+        bucket = self.series.latest(level)
+        if level != self.level or self.pixmap is None or self.pixmap.size() != self.size() or self.drawn_index is None:
+            self.level = level
+            self.redraw()
+        elif bucket[1] < self.low or bucket[2] > self.high:
+            self.redraw()
+        elif bucket[0] == self.drawn_index:
+            self.draw_columns(bucket[0], bucket[0])
+        elif bucket[0] - self.drawn_index >= self.width():
+            self.redraw()
+        else:
+            shift = bucket[0] - self.drawn_index
+            self.pixmap.scroll(-shift, 0, self.pixmap.rect())
+            self.draw_columns(self.drawn_index, bucket[0])
+        self.update()
+
+    def fit_level(self):
+        """ The finest level whose columns span the whole session. """
+        series = self.series
+        span = (series.last_time - series.first_time) if series.first_time is not None else 0.0
+        level = 0
+        while level < len(series.levels) - 1 and span > series.width(level) * (self.width() - 1):
+            level += 1
+        return level
+
+    # --- drawing ------------------------------------------------------
+    def column_x(self, index):
+        return self.width() - 1 - (self.drawn_index - index)
+
+    def value_y(self, value):
+        height = self.height() - 2
+        return 1 + height - (value - self.low) / (self.high - self.low) * height
+
+    def redraw(self):
+        """ Draws every visible column from scratch, fixing the vertical range with some headroom. """
+        self.pixmap = QPixmap(self.size())
+        self.pixmap.fill(Qt.GlobalColor.transparent)
+        latest = self.series.latest(self.level)
+        if latest is None:
+            self.drawn_index = None
+            return
+        self.drawn_index = latest[0]
+        buckets = self.series.buckets(self.level, latest[0] - self.width() + 1)
+        low = min(min(b[1] for b in buckets), 0.0)
+        high = max(max(b[2] for b in buckets), 0.0)
+        padding = max((high - low) * 0.25, 1.0)
+        self.low, self.high = low - padding, high + padding
+        self.paint_buckets(buckets, clear=False)
+
+    def draw_columns(self, first_index, last_index):
+        """ Repaints the columns of buckets first_index..last_index (the right edge of the chart). """
+        self.drawn_index = last_index
+        self.paint_buckets(self.series.buckets(self.level, first_index - 1), clear=True, first_index=first_index)
+
+    def paint_buckets(self, buckets, clear, first_index=None):
+        painter = QPainter(self.pixmap)
+        if clear:
+            x = self.column_x(first_index)
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+            painter.fillRect(x, 0, self.width() - x, self.height(), Qt.GlobalColor.transparent)
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+        zero_pen = QPen(self.palette().mid().color())
+        zero_pen.setStyle(Qt.PenStyle.DotLine)
+        painter.setPen(zero_pen)
+        zero_y = int(self.value_y(0.0))
+        painter.drawLine(self.column_x(first_index) if clear else 0, zero_y, self.width() - 1, zero_y)
+
+        previous = None
+        for index, low, high, last in buckets:
+            if first_index is not None and index < first_index:
+                previous = last  # Only used to connect the first repainted column
+                continue
+            x = self.column_x(index)
+            # Join to the previous column so the curve stays continuous across buckets
+            if previous is not None:
+                low, high = min(low, previous), max(high, previous)
+            painter.setPen(self.PROFIT_COLOR if last >= 0 else self.LOSS_COLOR)
+            painter.drawLine(x, int(self.value_y(high)), x, int(self.value_y(low)))
+            previous = last
+        painter.end()
+
+    def paintEvent(self, event):
+        if self.pixmap is not None:
+            QPainter(self).drawPixmap(0, 0, self.pixmap)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.series.levels:
+            self.redraw()
+
+    # --- zoom ---------------------------------------------------------
+    def wheelEvent(self, event):
+        step = -1 if event.angleDelta().y() > 0 else 1
+        self.auto_fit = False
+        self.level = min(max(self.level + step, 0), max(len(self.series.levels) - 1, 0))
+        self.redraw()
+        self.update()
+
+    def mouseDoubleClickEvent(self, event):
+        self.auto_fit = True
+        if self.series.levels:
+            self.level = self.fit_level()
+            self.redraw()
+            self.update()
@@ -0,0 +1,164 @@
+# FILE: stall_watchdog.py
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+# ===================================================================
+# 1. Stall records
+# ===================================================================
+class Offender:
+    """ Every stall attributed to one stack: how often, how long in total and at worst. """
+    __slots__ = ("stack", "count", "total", "max", "last_seen")
+
+    def __init__(self, stack):
+        self.stack = stack
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen = 0.0
+
+    def add(self, duration, wall):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.last_seen = wall
+
+    @property
+    def site(self):
+        """ The innermost frame, "file.py:123 function". """
+        filename, lineno, name = self.stack[-1] if self.stack else ("?", 0, "?")
+        return f"{os.path.basename(filename)}:{lineno} {name}"
+
+
+def extract_stack(frame, limit):
+    """ ((filename, lineno, function), ...) outermost first, without reading any source files. """
+    frames = []
+    while frame is not None and len(frames) < limit:
+        code = frame.f_code
+        frames.append((code.co_filename, frame.f_lineno, code.co_name))
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+# ===================================================================
+# 2. Watchdog
+# ===================================================================
+class StallWatchdog:
+    """
+    Detects stalls of an event loop and records where its thread was while it was blocked.
+    The loop calls beat() every `interval` seconds (a timer on the GUI thread); a daemon thread
+    checks the last beat and, once it is older than `threshold`, samples the loop thread's Python
+    stack from sys._current_frames() until the beats resume. Each stall is attributed to the stack
+    sampled most often while it lasted, so a long stall is blamed on where the time went rather
+    than on wherever it happened to be when it was first noticed. A stall's duration is how late the
+    next beat came, which undercounts the blocked time by at most one interval.
+
+    Between stalls the cost is one float store per beat and one wake-up of the watchdog thread per
+    poll; stacks are only walked while the loop is already blocked. A stall inside C code that holds
+    the GIL (e.g. one huge json.loads) can only be sampled once that call returns.
+    on_stall(duration, offender) is called on the watchdog thread after each stall; check() is one poll.
+    """
+    MAX_SAMPLES = 50
+    STACK_LIMIT = 40
+
+    def __init__(self, threshold=0.5, interval=0.05, on_stall=None, history=200, clock=time.perf_counter):
+        self.clock = clock
+        self.threshold = threshold
+        self.interval = interval
+        self.poll = min(threshold / 4, interval)
+        self.on_stall = on_stall
+        self.offenders = {}                 # stack -> Offender
+        self.recent = deque(maxlen=history)  # (wall time, duration, site)
+        self.stalls = 0
+        self.stalled_time = 0.0
+        self.last_beat = clock()
+        self.target = None
+        self.stalled_since = None  # The last beat before the current stall
+        self.samples = Counter()   # Stacks sampled during the current stall
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def beat(self):
+        self.last_beat = self.clock()
+
+    def start(self):
+        """ Watches the calling thread. """
+        self.target = threading.get_ident()
+        self.beat()
+        self._thread = threading.Thread(target=self._run, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.poll):
+            self.check()
+
+    def check(self):
+        beat = self.last_beat
+        if self.stalled_since is not None and beat != self.stalled_since:
+            # The loop is back: how much later than due the beat came
+            self._record(beat - self.stalled_since - self.interval, self.samples)
+            self.stalled_since = None
+            self.samples = Counter()
+        if self.clock() - beat < self.threshold + self.interval:
+            return
+        self.stalled_since = beat
+        if sum(self.samples.values()) < self.MAX_SAMPLES:
+            frame = sys._current_frames().get(self.target)
+            if frame is not None:
+                self.samples[extract_stack(frame, self.STACK_LIMIT)] += 1
+            del frame
+
+    def _record(self, duration, samples):
+        stack = samples.most_common(1)[0][0] if samples else ()
+        wall = time.time()
+        with self._lock:
+            offender = self.offenders.get(stack)
+            if offender is None:
+                offender = self.offenders[stack] = Offender(stack)
+            offender.add(duration, wall)
+            self.stalls += 1
+            self.stalled_time += duration
+            self.recent.append((wall, duration, offender.site))
+        if self.on_stall is not None:
+            self.on_stall(duration, offender)
+
+    # --- reports ------------------------------------------------------
+    def top(self, count=10):
+        """ The offenders with the most stalled time, worst first. """
+        with self._lock:
+            return sorted(self.offenders.values(), key=lambda o: o.total, reverse=True)[:count]
+
+    def summary(self, count=10, depth=8):
+        return {
+            "threshold_ms": self.threshold * 1000, "stalls": self.stalls, "stalled_s": round(self.stalled_time, 3),
+            "offenders": [{"site": o.site, "count": o.count, "total_s": round(o.total, 3), "max_s": round(o.max, 3),
+                           "last_seen": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(o.last_seen)),
+                           "stack": [f"{filename}:{lineno} {name}" for filename, lineno, name in o.stack[-depth:]]}
+                          for o in self.top(count)],
+            "recent": [{"time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(wall)), "duration_s": round(duration, 3), "site": site}
+                       for wall, duration, site in list(self.recent)[-count:]],
+        }
+
+    def format_table(self, count=3):
+        lines = [f"{'n':>5}{'total':>9}{'max':>8}  s  site"]
+        for o in self.top(count):
+            lines.append(f"{o.count:>5}{o.total:>9.2f}{o.max:>8.2f}     {o.site}")
+        return "\n".join(lines)
+
+    def format_report(self, count=10, depth=6):
+        """ Top offenders with the innermost frames of their stacks (source lines included), for logs. """
+        lines = [f"{self.stalls} stalls over {self.threshold * 1000:.0f} ms, {self.stalled_time:.2f} s in total"]
+        for rank, o in enumerate(self.top(count), 1):
+            lines.append(f"#{rank} {o.count}x, {o.total:.2f} s total, {o.max:.2f} s max: {o.site}")
+            summary = traceback.StackSummary.from_list([(filename, lineno, name, None) for filename, lineno, name in o.stack[-depth:]])
+            lines.extend("    " + line.rstrip().replace("\n", "\n    ") for line in summary.format())
+        return "\n".join(lines)
@@ -0,0 +1,84 @@
+# FILE: synthetic.py
+import json
+import random
+import time
+
+SYMBOLS = ("EURUSD", "GBPUSD", "USDJPY", "XAUUSD", "AUDUSD", "USDCAD", "NZDUSD", "USDCHF")
+
+# ===================================================================
+# Synthetic trade book
+# ===================================================================
+class SyntheticBook:
+    """
+    Generates trade_data payloads shaped like the EA's GenerateAndQueueState output,
+    for benchmarks and load tests. Each step() closes and opens a fraction of the
+    positions (churn) and moves the profit of another fraction (change_ratio).
+    """
+    def __init__(self, positions, churn=0.0, change_ratio=1.0, seed=0, symbol="EURUSD", first_ticket=1000000,
+                 balance=10000.0):
+        self.rng = random.Random(seed)
+        self.churn = churn
+        self.change_ratio = change_ratio
+        self.symbol = symbol
+        self.balance = balance
+        self.next_ticket = first_ticket
+        self.trades = {}
+        for _ in range(positions):
+            self.open_position()
+
+    def open_position(self):
+        rng = self.rng
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        side = rng.choice((1, -1))
+        entry = round(rng.uniform(1.05, 1.15), 5)
+        target = rng.uniform(0.0010, 0.0100)
+        trade = self.trades[ticket] = {
+            "ticket": ticket,
+            "symbol": self.symbol if rng.random() < 0.5 else rng.choice(SYMBOLS),
+            "type": "Buy" if side > 0 else "Sell",
+            "volume": rng.choice((0.01, 0.05, 0.1, 0.5, 1.0)),
+            "profit": 0.0,
+            "atm_enabled": rng.random() < 0.8,
+            "open_price": entry,
+            "sl": round(entry - side * target, 5),
+            "tp": round(entry + side * target, 5) if rng.random() < 0.9 else 0.0,
+            "price": entry,
+            "rule_applied": False,
+        }
+        self.move(trade, rng.gauss(0, 0.0030))
+        return ticket
+
+    @staticmethod
+    def move(trade, delta):
+        """ Moves the position's current price and derives the profit of a standard lot of 100,000 units. """
+        side = 1 if trade["type"] == "Buy" else -1
+        trade["price"] = round(trade["price"] + delta, 5)
+        trade["profit"] = round((trade["price"] - trade["open_price"]) * side * trade["volume"] * 100000, 2)
+
+    def close_position(self, ticket):
+        return self.trades.pop(ticket, None)
+
+    def step(self):
+        """ Advances the book by one EA tick. Returns (opened, closed, changed) counts. """
+        rng = self.rng
+        count = len(self.trades)
+        churned = int(round(count * self.churn))
+        for ticket in rng.sample(list(self.trades), min(churned, count)):
+            self.close_position(ticket)
+        for _ in range(churned):
+            self.open_position()
+        moved = rng.sample(list(self.trades), int(round(len(self.trades) * self.change_ratio)))
+        for ticket in moved:
+            self.move(self.trades[ticket], rng.gauss(0, 0.0002))
+        return churned, churned, len(moved)
+
+    def payload(self):
+        trades = list(self.trades.values())
+        return {"symbol": self.symbol, "total_pl": round(sum(t["profit"] for t in trades), 2), "balance": self.balance,
+                "ts": int(time.time() * 1000), "volume_step": 0.01, "volume_min": 0.01, "volume_digits": 2,
+                "point": 0.00001, "trades": trades}
+
+    def message(self):
+        """ The relay's WebSocket frame for the current state. """
+        return json.dumps({"type": "trade_data", "data": self.payload()})
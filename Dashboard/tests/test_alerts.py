@@ -0,0 +1,168 @@
+# FILE: tests/test_alerts.py
+import json
+import random
+
+import pytest
+
+from alerts import TOTAL, AlertEngine, AlertRule, ThresholdIndex, load_rules
+
+KEY = ("relay", 1)
+
+
+def engine_with(clock, *rules, **kwargs):
+    return AlertEngine(rules, clock=clock, **kwargs)
+
+
+def drained(engine):
+    return [(event.kind, event.rule.id, event.subject, event.value) for event in engine.drain()]
+
+# ===================================================================
+# Rules and the threshold index
+# ===================================================================
+def test_rule_from_dict_round_trip():
+    item = {"id": "eu", "metric": "symbol_profit", "symbol": "EURUSD", "above": 500.0, "hysteresis": 20.0, "debounce_s": 5.0}
+    rule = AlertRule.from_dict(item)
+    assert rule.above and rule.threshold == 500 and rule.rearm_point == 480
+    assert rule.to_dict() == item
+
+
+@pytest.mark.parametrize("item", [
+    {"metric": "ticket_profit"},
+    {"metric": "ticket_profit", "above": 1, "below": 2},
+    {"metric": "nope", "below": 1},
+    {"metric": "total_pl", "symbol": "EURUSD", "below": 1},
+])
+def test_invalid_rules_are_rejected(item):
+    with pytest.raises(ValueError):
+        AlertRule.from_dict(item)
+
+
+def test_missing_rules_file_means_no_rules(tmp_path):
+    assert load_rules(str(tmp_path / "alerts.json")) == []
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"metric": "total_pl", "below": -100}]))
+    [rule] = load_rules(str(path))
+    assert rule.id == "0" and not rule.above
+
+
+def test_crossed_matches_brute_force():
+    rng = random.Random(4)
+    rules = [AlertRule(str(i), "ticket_profit", rng.uniform(-50, 50), rng.random() < 0.5, hysteresis=rng.choice((0, 5)))
+             for i in range(200)]
+    index = ThresholdIndex(rules)
+    for _ in range(500):
+        old, new = rng.uniform(-60, 60), rng.uniform(-60, 60)
+        if rng.random() < 0.2:
+            new = old + rng.choice((-1, 1)) * 1e-9
+        if rng.random() < 0.1:
+            new = rng.choice(rules).threshold  # Exactly on a threshold
+        found = set(index.crossed(old, new))
+        for rule in rules:
+            if rule.holds(old) != rule.holds(new) or rule.rearmed(old) != rule.rearmed(new):
+                assert rule in found
+
+
+def test_crossed_from_no_value_yields_the_rules_that_hold():
+    below, above = AlertRule("b", "total_pl", -10), AlertRule("a", "total_pl", 10, above=True)
+    index = ThresholdIndex([below, above])
+    assert set(index.crossed(None, -20)) == {below}
+    assert set(index.crossed(None, 20)) == {above}
+    assert set(index.crossed(None, 0)) == set()
+
+# ===================================================================
+# Engine
+# ===================================================================
+def test_fires_once_and_rearms_after_hysteresis(clock):
+    engine = engine_with(clock, AlertRule("loss", "ticket_profit", -100, hysteresis=10))
+    engine.ticket(KEY, "EURUSD", None, -50)
+    engine.ticket(KEY, "EURUSD", -50, -120)
+    assert drained(engine) == [("fired", "loss", KEY, -120)]
+    engine.ticket(KEY, "EURUSD", -120, -95)   # Back above the threshold but within the hysteresis
+    engine.ticket(KEY, "EURUSD", -95, -130)
+    assert drained(engine) == []
+    engine.ticket(KEY, "EURUSD", -130, -85)
+    assert drained(engine) == [("cleared", "loss", KEY, -85)]
+    engine.ticket(KEY, "EURUSD", -85, -101)
+    assert drained(engine) == [("fired", "loss", KEY, -101)]
+    assert engine.fired_count == 2
+
+
+def test_above_rule_and_first_value(clock):
+    engine = engine_with(clock, AlertRule("win", "ticket_profit", 100, above=True))
+    engine.ticket(KEY, "EURUSD", None, 150)  # Opened beyond the threshold
+    assert drained(engine) == [("fired", "win", KEY, 150)]
+    engine.ticket(("relay", 2), "EURUSD", None, 50)
+    assert drained(engine) == []
+
+
+def test_debounced_rule_fires_after_holding(clock):
+    engine = engine_with(clock, AlertRule("slow", "ticket_profit", -100, debounce=5))
+    engine.ticket(KEY, "EURUSD", None, -150)
+    assert drained(engine) == []
+    clock.advance(4)
+    engine.tick(lambda metric, subject: -150)
+    assert drained(engine) == []
+    clock.advance(1)
+    engine.tick(lambda metric, subject: -160)
+    assert drained(engine) == [("fired", "slow", KEY, -160)]
+    engine.tick(lambda metric, subject: -160)
+    assert drained(engine) == []
+
+
+def test_debounce_is_cancelled_when_the_value_recovers(clock):
+    engine = engine_with(clock, AlertRule("slow", "ticket_profit", -100, debounce=5))
+    engine.ticket(KEY, "EURUSD", None, -150)
+    clock.advance(3)
+    engine.ticket(KEY, "EURUSD", -150, -90)
+    clock.advance(10)
+    engine.tick(lambda metric, subject: -90)
+    assert drained(engine) == [] and engine.states == {}
+
+
+def test_closing_a_fired_ticket_clears_it(clock):
+    engine = engine_with(clock, AlertRule("loss", "ticket_profit", -100), AlertRule("slow", "ticket_profit", -100, debounce=5))
+    engine.ticket(KEY, "EURUSD", None, -150)
+    drained(engine)
+    engine.ticket(KEY, "EURUSD", -150, None)
+    assert drained(engine) == [("cleared", "loss", KEY, -150)]  # The pending debounce goes without an event
+    assert engine.active() == [] and engine.states == {}
+
+
+def test_ticket_rule_for_one_symbol(clock):
+    engine = engine_with(clock, AlertRule("gold", "ticket_profit", -100, symbol="XAUUSD"))
+    engine.ticket(KEY, "EURUSD", None, -200)
+    engine.ticket(("relay", 2), "XAUUSD", None, -200)
+    assert drained(engine) == [("fired", "gold", ("relay", 2), -200)]
+
+
+def test_symbol_profit_is_evaluated_for_dirty_symbols(clock):
+    engine = engine_with(clock, AlertRule("eu", "symbol_profit", 500, above=True, symbol="EURUSD"))
+    profits = {"EURUSD": 600.0, "XAUUSD": 900.0}
+    engine.ticket(KEY, "EURUSD", None, 600)
+    engine.ticket(("relay", 2), "XAUUSD", None, 900)
+    engine.symbols(profits.get)
+    assert drained(engine) == [("fired", "eu", "EURUSD", 600.0)]
+    engine.ticket(KEY, "EURUSD", 600, None)
+    engine.symbols({}.get)  # No EURUSD positions left
+    assert drained(engine) == [("cleared", "eu", "EURUSD", 600.0)]
+
+
+def test_account_metrics(clock):
+    engine = engine_with(clock, AlertRule("dd", "total_pl_pct", -2, hysteresis=0.5), AlertRule("pl", "total_pl", -150))
+    engine.totals(-100, 10000)
+    assert drained(engine) == []
+    engine.totals(-250, 10000)
+    assert drained(engine) == [("fired", "pl", TOTAL, -250), ("fired", "dd", TOTAL, -2.5)]
+    engine.totals(-250, None)  # Without a balance the percentage is unknown
+    assert drained(engine) == [("cleared", "dd", TOTAL, -2.5)]
+
+
+def test_audit_log_is_json_lines(clock, tmp_path):
+    path = tmp_path / "logs" / "alerts.log"
+    engine = engine_with(clock, AlertRule("loss", "ticket_profit", -100), audit_path=str(path))
+    engine.ticket(KEY, "EURUSD", None, -150)
+    engine.ticket(KEY, "EURUSD", -150, None)
+    engine.close()
+    events = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(event["event"], event["subject"], event["value"]) for event in events] == [
+        ("fired", "relay#1", -150), ("cleared", "relay#1", -150)]
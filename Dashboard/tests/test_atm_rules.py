@@ -0,0 +1,149 @@
+# FILE: tests/test_atm_rules.py
+import math
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from atm_rules import RuleInputs, evaluate
+from trade_store import TradeRecord
+
+EURUSD = {"symbol": "EURUSD", "volume_step": 0.01, "volume_min": 0.01, "volume_digits": 2, "point": 0.00001}
+
+
+def position(ticket, type="Buy", volume=0.1, entry=1.1, sl=1.09, tp=1.12, price=1.11, symbol="EURUSD",
+             atm_enabled=True, rule_applied=False, source="relay"):
+    return TradeRecord(ticket, symbol, type, volume, 0.0, atm_enabled, source=source, open_price=entry, sl=sl, tp=tp,
+                       price=price, rule_applied=rule_applied)
+
+
+def normalize_double(value, digits):
+    scale = 10.0 ** digits
+    return math.copysign(math.floor(abs(value) * scale + 0.5) / scale, value)
+
+
+def process_auto_management(trade, info, trigger_percent, close_percent, move_to_be, auto_enabled=True):
+    """
+    ProcessAutoManagement of Expert/core.mql5 for one position, line by line. Returns None for a position
+    the EA skips, else (triggered, volume it closes, whether it moves the stop to the entry).
+    """
+    if not auto_enabled or trigger_percent <= 0:
+        return None
+    if trade.symbol != info["symbol"] or trade.rule_applied or not trade.atm_enabled:
+        return None
+    tp, entry, sl = trade.tp, trade.open_price, trade.sl
+    if tp == 0.0:
+        return None
+    profit_target_dist = abs(tp - entry)
+    if profit_target_dist <= info["point"] * 5:
+        return None
+    trigger_dist = profit_target_dist * (trigger_percent / 100.0)
+    # PRICE_CURRENT: the bid for buys, the ask for sells
+    if trade.type == "Buy":
+        triggered = trade.price >= entry + trigger_dist
+    else:
+        triggered = trade.price <= entry - trigger_dist
+    if not triggered:
+        return False, 0.0, False
+    closed = 0.0
+    if 0 < close_percent < 100:
+        step = info["volume_step"]
+        vol_to_close = normalize_double(math.floor(trade.volume * (close_percent / 100.0) / step) * step, info["volume_digits"])
+        if vol_to_close >= info["volume_min"]:
+            closed = vol_to_close
+    return True, closed, bool(move_to_be) and sl != entry
+
+
+def check_against_the_ea(trades, source_data, *rule):
+    preview = evaluate(RuleInputs(trades, source_data), *rule)
+    for row, trade in enumerate(trades):
+        expected = process_auto_management(trade, source_data[trade.source], *rule)
+        assert bool(preview.eligible[row]) == (expected is not None), (trade.ticket, rule)
+        if expected is None:
+            continue
+        triggered, closed, moves = expected
+        assert bool(preview.triggered[row]) == triggered, (trade.ticket, rule)
+        if triggered:
+            assert preview.close_volume[row] == closed, (trade.ticket, rule)
+            assert bool(preview.moves_to_be[row]) == moves, (trade.ticket, rule)
+    return preview
+
+
+def test_buy_and_sell_trigger_at_the_percentage_of_the_target():
+    trades = [position(1, price=1.1049), position(2, price=1.105), position(3, price=1.1051),
+              position(4, type="Sell", entry=1.1, sl=1.11, tp=1.08, price=1.0951),
+              position(5, type="Sell", entry=1.1, sl=1.11, tp=1.08, price=1.095)]
+    preview = check_against_the_ea(trades, {"relay": EURUSD}, 25, 50, True)
+    assert list(preview.triggered) == [False, True, True, False, True]
+    assert preview.trigger_price[4] == pytest.approx(1.095)
+    assert preview.triggered_count == 3 and preview.closing_volume == pytest.approx(0.15)
+    # Triggered first, then the closest to triggering
+    assert preview.order[0] == 2 and set(preview.order[:3]) == {1, 2, 4} and set(preview.order[3:]) == {0, 3}
+
+
+def test_partial_close_volume_is_floored_to_the_step():
+    trades = [position(1, volume=0.37), position(2, volume=1.0), position(3, volume=0.07)]
+    preview = check_against_the_ea(trades, {"relay": EURUSD}, 10, 50, False)
+    assert list(preview.close_volume) == [0.18, 0.5, 0.03]
+
+
+def test_partial_close_below_the_minimum_volume_is_skipped():
+    info = dict(EURUSD, volume_step=0.1, volume_min=0.1, volume_digits=1)
+    trades = [position(1, volume=0.1), position(2, volume=0.3)]
+    preview = check_against_the_ea(trades, {"relay": info}, 10, 50, True)
+    assert list(preview.closes) == [False, True]
+    assert list(preview.close_volume) == [0.0, 0.1]
+    assert preview.be_count == 2  # The stop still moves when nothing is closed
+
+
+def test_break_even_is_not_moved_when_the_stop_is_already_there():
+    trades = [position(1, sl=1.1), position(2, sl=0.0), position(3, type="Sell", entry=1.1, sl=1.1, tp=1.08, price=1.07)]
+    preview = check_against_the_ea(trades, {"relay": EURUSD}, 10, 0, True)
+    assert list(preview.moves_to_be) == [False, True, False]
+    assert preview.closing_volume == 0.0
+
+
+@pytest.mark.parametrize("trade", [
+    position(1, tp=0.0),
+    position(2, tp=1.10005),  # Target within 5 points
+    position(3, symbol="GBPUSD"),
+    position(4, atm_enabled=False),
+    position(5, rule_applied=True),
+])
+def test_positions_the_ea_skips(trade):
+    preview = check_against_the_ea([trade], {"relay": EURUSD}, 10, 50, True)
+    assert not preview.eligible[0] and preview.managed_count == 0
+
+
+def test_disabled_auto_management_manages_nothing():
+    trades = [position(1)]
+    assert check_against_the_ea(trades, {"relay": EURUSD}, 10, 50, True, False).managed_count == 0
+    assert check_against_the_ea(trades, {"relay": EURUSD}, 0, 50, True).managed_count == 0
+
+
+def test_random_positions_match_the_ea():
+    rng = random.Random(9)
+    gold = {"symbol": "XAUUSD", "volume_step": 0.1, "volume_min": 0.1, "volume_digits": 1, "point": 0.01}
+    source_data = {"a": EURUSD, "b": gold}
+    trades = []
+    for ticket in range(400):
+        source = rng.choice("ab")
+        info = source_data[source]
+        buy = rng.random() < 0.5
+        sign = 1 if buy else -1
+        point = info["point"]
+        entry = round(rng.uniform(1000, 2000) * point * 100, 5)
+        target = rng.choice((0, 3, 5, 6, 200, 1500)) * point
+        tp = 0.0 if target == 0 else round(entry + sign * target, 5)
+        sl = rng.choice((0.0, entry, round(entry - sign * 300 * point, 5)))
+        price = round(entry + sign * rng.uniform(-0.5, 1.2) * max(target, 10 * point), 5)
+        trades.append(position(ticket, "Buy" if buy else "Sell", rng.choice((0.01, 0.1, 0.15, 0.37, 1.0, 2.55)),
+                               entry, sl, tp, price, info["symbol"] if rng.random() < 0.9 else "USDJPY",
+                               rng.random() < 0.9, rng.random() < 0.1, source))
+    triggered = 0
+    for trigger in (5, 25, 50, 80, 100):
+        for close in (0, 10, 33, 50, 99, 100):
+            for be in (False, True):
+                triggered += check_against_the_ea(trades, source_data, trigger, close, be).triggered_count
+    assert triggered > 1000
@@ -0,0 +1,132 @@
+# FILE: tests/test_backtest.py
+import math
+import random
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from atm_rules import normalize
+import backtest
+from backtest import TICK_DTYPE, SymbolSpec, make_grid, run_sweep, simulate_trade
+
+SPEC = SymbolSpec(point=0.00001)
+
+
+def make_ticks(rng, count=3000, start_price=1.1):
+    ticks = np.empty(count, TICK_DTYPE)
+    times, price, now = [], start_price, 1_700_000_000_000
+    bids, asks = [], []
+    for _ in range(count):
+        now += rng.choice((5, 40, 250, 700, 1500))
+        price = round(price + rng.gauss(0, 0.00015), 5)
+        times.append(now)
+        bids.append(price)
+        asks.append(round(price + 0.00012, 5))
+    ticks["time_ms"], ticks["bid"], ticks["ask"] = times, bids, asks
+    return ticks
+
+
+def replay(ticks, trade, spec, trigger, close_percent, be, timer_ms):
+    """ The EA's behaviour tick by tick: SL/TP on every tick, the rule on the last tick of each timer period. """
+    times = ticks["time_ms"]
+    buy = trade["type"] == "Buy"
+    prices = ticks["bid"] if buy else ticks["ask"]
+    sign = 1.0 if buy else -1.0
+    entry, sl, tp, volume = trade["open_price"], trade["sl"], trade["tp"], trade["volume"]
+    distance = abs(tp - entry)
+    eligible = trade["atm_enabled"] and tp != 0.0 and distance > spec.point * 5 and trigger > 0
+    level = entry + distance * (trigger / 100.0) if buy else entry - distance * (trigger / 100.0)
+    start = int(np.searchsorted(times, trade["open_time"], "left"))
+    stop, left, pnl, triggered = sl, volume, 0.0, False
+    for i in range(start, len(times)):
+        price = float(prices[i])
+        stopped = stop != 0.0 and (price <= stop if buy else price >= stop)
+        taken = tp != 0.0 and (price >= tp if buy else price <= tp)
+        if stopped or taken:
+            return pnl + sign * (price - entry) * left * spec.contract_size, triggered, False
+        last_of_period = timer_ms == 0 or i + 1 == len(times) or times[i + 1] // timer_ms != times[i] // timer_ms
+        if eligible and not triggered and last_of_period and (price >= level if buy else price <= level):
+            triggered = True
+            closing = float(normalize(np.floor(volume * (close_percent / 100.0) / spec.volume_step) * spec.volume_step,
+                                      spec.volume_digits))
+            if 0 < close_percent < 100 and closing >= spec.volume_min:
+                pnl += sign * (price - entry) * closing * spec.contract_size
+                left = volume - closing
+            if be and sl != entry:
+                stop = entry
+    return pnl + sign * (float(prices[-1]) - entry) * left * spec.contract_size, triggered, True
+
+
+def random_trade(rng, ticks):
+    buy = rng.random() < 0.5
+    index = rng.randrange(len(ticks) - 50)
+    entry = float(ticks["ask"][index] if buy else ticks["bid"][index])
+    sl_distance, tp_distance = rng.uniform(0.0005, 0.004), rng.uniform(0.0005, 0.004)
+    sign = 1 if buy else -1
+    return {"symbol": "EURUSD", "type": "Buy" if buy else "Sell", "volume": rng.choice((0.01, 0.05, 0.1, 0.37, 1.0)),
+            "open_time": int(ticks["time_ms"][index]), "open_price": entry,
+            "sl": 0.0 if rng.random() < 0.15 else round(entry - sign * sl_distance, 5),
+            "tp": 0.0 if rng.random() < 0.1 else round(entry + sign * tp_distance, 5),
+            "atm_enabled": rng.random() < 0.9}
+
+
+@pytest.mark.parametrize("timer_ms", [0, 1000])
+def test_simulate_trade_matches_a_tick_by_tick_replay(timer_ms):
+    rng = random.Random(timer_ms + 7)
+    ticks = make_ticks(rng)
+    grid = make_grid([0, 10, 25, 50, 80], [0, 30, 50, 100], [False, True])
+    for _ in range(60):
+        trade = random_trade(rng, ticks)
+        pnl, triggered, still_open, baseline = simulate_trade(ticks, trade, SPEC, grid, timer_ms)
+        for setting in range(len(grid["trigger"])):
+            expected = replay(ticks, trade, SPEC, grid["trigger"][setting], grid["close"][setting], grid["be"][setting], timer_ms)
+            assert math.isclose(pnl[setting], expected[0], rel_tol=1e-9, abs_tol=1e-6), (trade, setting)
+            assert triggered[setting] == expected[1], (trade, setting)
+            assert still_open[setting] == expected[2], (trade, setting)
+        assert math.isclose(baseline, replay(ticks, trade, SPEC, 0, 0, False, timer_ms)[0], rel_tol=1e-9, abs_tol=1e-6)
+
+
+def test_trade_after_the_last_tick_is_skipped():
+    ticks = make_ticks(random.Random(1), count=10)
+    trade = {"type": "Buy", "volume": 0.1, "open_time": int(ticks["time_ms"][-1]) + 1, "open_price": 1.1,
+             "sl": 1.09, "tp": 1.11, "atm_enabled": True}
+    assert simulate_trade(ticks, trade, SPEC, make_grid([50], [50], [True])) is None
+
+
+@pytest.fixture
+def tick_file(tmp_path):
+    ticks = make_ticks(random.Random(11))
+    path = tmp_path / "EURUSD.csv"
+    path.write_text("time,bid,ask\n" + "".join(f"{t},{b!r},{a!r}\n" for t, b, a in ticks.tolist()))
+    return ticks, str(path)
+
+
+def test_sweep_reassembles_slices_of_trades_and_grid(tick_file, tmp_path, monkeypatch):
+    ticks, path = tick_file
+    monkeypatch.setattr(backtest, "TRADES_PER_JOB", 3)
+    monkeypatch.setattr(backtest, "SETTINGS_PER_JOB", 7)  # 40 settings: six slices, the last one short
+    rng = random.Random(5)
+    trades = [random_trade(rng, ticks) for _ in range(10)] + [dict(random_trade(rng, ticks), symbol="XAUUSD")]
+    grid = make_grid([0, 10, 25, 50, 80], [0, 30, 50, 100], [False, True])
+    seen = []
+    result = run_sweep(trades, {"EURUSD": [path]}, grid, specs={"EURUSD": SPEC}, workers=2,
+                       cache_dir=str(tmp_path / "cache"), progress=lambda done, total: seen.append((done, total)))
+    assert result.skipped == 1 and len(result.trades) == 10
+    assert seen[-1] == (30, 30)  # Five chunks of two trades x six slices
+    for row, trade in enumerate(trades[:10]):
+        pnl, triggered, _, baseline = simulate_trade(ticks, trade, SPEC, grid)
+        np.testing.assert_allclose(result.pnl[row], pnl)
+        assert (result.triggered[row] == triggered).all() and result.baseline[row] == pytest.approx(baseline)
+
+
+def test_cancelled_sweep_returns_without_waiting_for_the_jobs(tick_file, tmp_path):
+    ticks, path = tick_file
+    rng = random.Random(6)
+    trades = [random_trade(rng, ticks) for _ in range(200)]
+    grid = make_grid(range(1, 100), range(0, 100, 5), [False, True])
+    started = time.perf_counter()
+    assert run_sweep(trades, {"EURUSD": [path]}, grid, specs={"EURUSD": SPEC}, workers=1,
+                     cache_dir=str(tmp_path / "cache"), should_stop=lambda: True) is None
+    assert time.perf_counter() - started < 10
@@ -0,0 +1,189 @@
+# FILE: tests/test_binary_frames.py
+import json
+import random
+import zlib
+
+import pytest
+
+from binary_frames import FrameEncoder, is_frame, read_frame
+from relay_stub import Deflate, Relay, parse_extensions
+from synthetic import SyntheticBook
+from trade_store import TradeDecoder
+
+FIELDS = ("ticket", "symbol", "type", "volume", "profit", "atm_enabled", "open_price", "sl", "tp", "price",
+          "rule_applied", "volume_text", "profit_text", "ticket_text", "source")
+
+
+def position(ticket, symbol="EURUSD", type="Buy", profit=5.0, **fields):
+    return dict({"ticket": ticket, "symbol": symbol, "type": type, "volume": 0.1, "profit": profit, "atm_enabled": True,
+                 "open_price": 1.1, "sl": 0.0, "tp": 0.0, "price": 1.1005, "rule_applied": False}, **fields)
+
+
+def payload(*trades):
+    return {"symbol": "EURUSD", "total_pl": 12.5, "balance": 10000.0, "ts": 1, "trades": list(trades)}
+
+
+def rows(message):
+    return sorted(tuple(getattr(trade, field) for field in FIELDS) for trade in message["data"]["trades"])
+
+
+def header(message):
+    return {key: value for key, value in message["data"].items() if key != "trades"}
+
+
+def json_decoded(data, seq):
+    return TradeDecoder("relay").decode(json.dumps({"type": "trade_data", "seq": seq, "data": data}))
+
+
+@pytest.fixture
+def encoder():
+    return FrameEncoder()
+
+
+def test_snapshot_round_trip_matches_json(encoder):
+    data = payload(position(1), position(2, symbol="XAUUSD", type="Sell", atm_enabled=False, rule_applied=True, sl=2300.5))
+    raw = encoder.snapshot(7, data)
+    assert is_frame(raw) and not is_frame(json.dumps(data))
+    message = TradeDecoder("relay").decode(raw)
+    expected = json_decoded(data, 7)
+    assert message["type"] == "trade_data" and message["seq"] == 7
+    assert rows(message) == rows(expected)
+    assert header(message) == header(expected)
+
+
+def test_delta_applies_moved_changed_opened_and_closed(encoder):
+    decoder = TradeDecoder("relay")
+    decoder.decode(encoder.snapshot(1, payload(position(1), position(2), position(3))))
+    moved = position(1, profit=6.25, price=1.1011)
+    changed = position(2, profit=4.0, atm_enabled=False, sl=1.1)
+    opened = position(4, symbol="GBPUSD")
+    message = decoder.decode(encoder.delta(2, {"total_pl": 3.0}, [opened], [moved], [changed], [3]))
+    assert message["seq"] == 2 and message["data"]["total_pl"] == 3.0
+    assert rows(message) == rows(json_decoded(payload(moved, changed, opened), 2))
+    assert decoder.records[1].profit_text == "+6.25 $"
+
+
+def test_new_symbols_travel_with_the_next_delta_only(encoder):
+    decoder = TradeDecoder("relay")
+    decoder.decode(encoder.snapshot(1, payload(position(1))))
+    first = encoder.delta(2, {}, [position(2, symbol="USDJPY")], [], [], [])
+    second = encoder.delta(3, {}, [position(3, symbol="USDJPY")], [], [], [])
+    # A snapshot carries the whole table without moving the deltas' cursor, so the first delta repeats it
+    assert (read_frame(first)[2]["symbols_from"], read_frame(first)[2]["symbols"]) == (0, ["EURUSD", "USDJPY"])
+    assert (read_frame(second)[2]["symbols_from"], read_frame(second)[2]["symbols"]) == (2, [])
+    decoder.decode(first)
+    decoder.decode(second)
+    assert decoder.records[3].symbol == "USDJPY"
+    assert decoder.symbols == ["EURUSD", "USDJPY"]
+
+
+def test_lost_delta_with_symbol_entries_forces_a_resync(encoder):
+    decoder = TradeDecoder("relay")
+    decoder.decode(encoder.snapshot(1, payload(position(1))))
+    encoder.delta(2, {}, [position(2, symbol="USDJPY")], [], [], [])  # Never arrives
+    later = encoder.delta(3, {}, [position(3, symbol="NZDUSD")], [], [], [])
+    assert decoder.decode(later) is None
+    assert decoder.resync_pending
+    data = payload(position(1), position(2, symbol="USDJPY"), position(3, symbol="NZDUSD"))
+    message = decoder.decode(encoder.snapshot(3, data))
+    assert rows(message) == rows(json_decoded(data, 3))
+    assert decoder.decode(encoder.delta(4, {}, [], [position(3, symbol="NZDUSD", profit=1.0)], [], []))["seq"] == 4
+
+
+def test_missing_symbol_entries_force_a_resync_even_in_sequence(encoder):
+    decoder = TradeDecoder("relay")
+    decoder.decode(encoder.snapshot(1, payload(position(1))))
+    encoder.snapshot(1, payload(position(1), position(2, symbol="USDJPY")))  # Grows the table for another client
+    encoder.sent_symbols = len(encoder.symbols)
+    frame = encoder.delta(2, {}, [position(3, symbol="NZDUSD")], [], [], [])
+    assert decoder.decode(frame) is None
+    assert decoder.resync_pending
+
+
+def test_delta_for_an_unknown_ticket_forces_a_resync(encoder):
+    decoder = TradeDecoder("relay")
+    decoder.decode(encoder.snapshot(1, payload(position(1))))
+    assert decoder.decode(encoder.delta(2, {}, [], [position(9, profit=1.0)], [], [1])) is None
+    assert decoder.resync_pending
+    assert list(decoder.records) == [1]
+
+
+def test_read_frame_rejects_other_data():
+    with pytest.raises(ValueError):
+        read_frame(b"XXXX" + bytes(40))
+
+
+def test_relay_binary_and_json_clients_see_the_same_book():
+    class Client:
+        def __init__(self, binary):
+            self.delta, self.binary, self.synced = True, binary, False
+            self.decoder = TradeDecoder("relay")
+            self.last = None
+
+        def receive(self, raw):
+            message = self.decoder.decode(raw)
+            if message is None:
+                self.decoder.resync_pending = False
+                self.synced = False  # The relay answers a resync with a snapshot on the next post
+            else:
+                self.last = message
+        send_text = send_binary = receive
+
+    relay = Relay(drop_rate=0.1)
+    clients = [Client(False), Client(True)]
+    relay.clients.update(clients)
+    random.seed(3)
+    book = SyntheticBook(200, churn=0.05, change_ratio=0.4, seed=3)
+    compared = 0
+    for step in range(150):
+        book.step()
+        for trade in random.sample(list(book.trades.values()), 3):
+            trade["atm_enabled"] = not trade.get("atm_enabled", True)
+        if step % 30 == 0:
+            next(iter(book.trades.values()))["symbol"] = f"SYM{step}"
+        relay.publish(json.loads(json.dumps(book.payload())))
+        text, binary = (client.last for client in clients)
+        if text is not None and binary is not None and text["seq"] == binary["seq"] == relay.seq:
+            assert rows(binary) == rows(text)
+            compared += 1
+    assert compared > 50
+
+# ===================================================================
+# permessage-deflate negotiation
+# ===================================================================
+def test_parse_extensions():
+    assert parse_extensions('permessage-deflate; client_max_window_bits, x-webkit; a="1"') == [
+        ("permessage-deflate", {"client_max_window_bits": ""}), ("x-webkit", {"a": "1"})]
+
+
+def test_deflate_is_accepted_with_the_client_parameters():
+    assert Deflate.negotiate("permessage-deflate; client_max_window_bits").response == "permessage-deflate"
+    deflate = Deflate.negotiate("permessage-deflate; server_no_context_takeover; server_max_window_bits=10")
+    assert deflate.response == "permessage-deflate; server_no_context_takeover; server_max_window_bits=10"
+    assert deflate.window_bits == 10 and deflate.no_context_takeover
+
+
+def test_deflate_is_declined_when_not_offered_or_unsupported():
+    assert Deflate.negotiate(None) is None
+    assert Deflate.negotiate("x-webkit-deflate-frame") is None
+    assert Deflate.negotiate("permessage-deflate; server_max_window_bits=8") is None
+
+
+def test_compressed_messages_share_one_stream():
+    deflate = Deflate.negotiate("permessage-deflate")
+    client = zlib.decompressobj(-15)
+    message = json.dumps(payload(*(position(ticket) for ticket in range(50)))).encode()
+    first = deflate.compress(message)
+    second = deflate.compress(message)
+    assert len(second) < len(first)  # The second refers back to the first
+    for data in (first, second):
+        assert client.decompress(data + b"\x00\x00\xff\xff") == message
+    assert deflate.decompress(zlib.compress(b"hello")[2:-4]) == b"hello"
+
+
+def test_no_context_takeover_compresses_each_message_alone():
+    deflate = Deflate.negotiate("permessage-deflate; server_no_context_takeover")
+    message = json.dumps(payload(*(position(ticket) for ticket in range(50)))).encode()
+    first, second = deflate.compress(message), deflate.compress(message)
+    assert first == second
+    assert zlib.decompressobj(-15).decompress(second + b"\x00\x00\xff\xff") == message
@@ -0,0 +1,295 @@
+# FILE: tests/test_command_client.py
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from command_client import CommandBatcher, CommandClient, PendingCommands
+from trade_store import TradeRecord
+
+SOURCE = "relay"
+
+
+def trade(ticket, volume=0.1, atm_enabled=True, open_price=1.1, sl=0.0):
+    return TradeRecord(ticket, "EURUSD", "Buy", volume, 5.0, atm_enabled, source=SOURCE, open_price=open_price, sl=sl)
+
+
+@pytest.fixture
+def pending(clock):
+    return PendingCommands(timeout=30.0, clock=clock)
+
+# ===================================================================
+# PendingCommands
+# ===================================================================
+def test_close_is_confirmed_when_the_ticket_is_gone(pending, clock):
+    assert pending.begin((SOURCE, 1), "close", trade(1))
+    pending.sent(SOURCE, {"action": "close", "ticket": 1})
+    clock.advance(0.25)
+    assert pending.observe(SOURCE, lambda ticket: None) == [(SOURCE, 1)]
+    assert not pending
+    assert pending.outcomes["close"]["confirmed"] == 1
+    assert pending.histograms["close"].summary()["count"] == 1
+
+
+def test_partial_close_is_confirmed_by_a_lower_volume(pending):
+    pending.begin((SOURCE, 1), "close", trade(1, volume=0.3))
+    pending.sent(SOURCE, {"action": "close", "ticket": 1})
+    assert pending.observe(SOURCE, lambda ticket: trade(1, volume=0.3)) == []
+    assert pending.observe(SOURCE, lambda ticket: trade(1, volume=0.1)) == [(SOURCE, 1)]
+
+
+def test_snapshot_before_sending_confirms_nothing(pending):
+    pending.begin((SOURCE, 1), "toggle_atm_trade", trade(1), False)
+    assert pending.observe(SOURCE, lambda ticket: trade(1, atm_enabled=False)) == []
+    assert pending.actions((SOURCE, 1))
+
+
+def test_ticket_gone_before_sending_is_not_a_confirmation(pending):
+    pending.begin((SOURCE, 1), "close", trade(1))
+    pending.observe(SOURCE, lambda ticket: None)
+    assert pending.outcomes["close"]["gone"] == 1
+    assert pending.outcomes["close"]["confirmed"] == 0
+
+
+def test_breakeven_is_confirmed_when_sl_reaches_the_entry(pending):
+    pending.begin((SOURCE, 1), "breakeven", trade(1, open_price=1.1))
+    pending.sent(SOURCE, {"action": "breakeven", "ticket": 1})
+    assert pending.observe(SOURCE, lambda ticket: trade(1, sl=1.05)) == []
+    assert pending.observe(SOURCE, lambda ticket: trade(1, sl=1.1)) == [(SOURCE, 1)]
+    assert pending.outcomes["breakeven"]["confirmed"] == 1
+
+
+def test_breakeven_without_entry_price_is_not_tracked(pending):
+    assert pending.begin((SOURCE, 1), "breakeven", trade(1, open_price=0.0))
+    assert not pending
+
+
+def test_failed_payload_releases_its_tickets(pending):
+    pending.begin((SOURCE, 1), "close", trade(1))
+    pending.begin((SOURCE, 2), "breakeven", trade(2))
+    payload = {"action": "batch", "close": [1], "breakeven": [2]}
+    pending.sent(SOURCE, payload)
+    assert sorted(pending.failed(SOURCE, payload)) == [(SOURCE, 1), (SOURCE, 2)]
+    assert not pending
+    assert pending.outcomes["close"]["failed"] == pending.outcomes["breakeven"]["failed"] == 1
+
+
+def test_failure_of_an_older_payload_keeps_the_newer_command(pending):
+    pending.begin((SOURCE, 1), "toggle_atm_trade", trade(1), False)
+    first = {"action": "toggle_atm_trade", "ticket": 1, "atm_trade_state": False}
+    pending.sent(SOURCE, first)
+    stale = dict(first, id=first["id"] - 1)
+    assert pending.failed(SOURCE, stale) == []
+    assert pending.actions((SOURCE, 1))
+
+
+def test_unconfirmed_commands_expire(pending, clock):
+    pending.begin((SOURCE, 1), "close", trade(1))
+    pending.sent(SOURCE, {"action": "close", "ticket": 1})
+    clock.advance(29)
+    assert pending.expire() == []
+    clock.advance(2)
+    [(key, entry)] = pending.expire()
+    assert key == (SOURCE, 1) and entry.action == "close"
+    assert not pending
+    assert pending.outcomes["close"]["timed_out"] == 1
+
+
+def test_unsent_commands_expire_from_when_they_were_queued(pending, clock):
+    pending.begin((SOURCE, 1), "breakeven", trade(1))
+    clock.advance(31)
+    assert [key for key, _ in pending.expire()] == [(SOURCE, 1)]
+
+
+def test_duplicates_are_refused_and_close_blocks_everything(pending):
+    key = (SOURCE, 1)
+    assert pending.begin(key, "breakeven", trade(1))
+    assert not pending.begin(key, "breakeven", trade(1))
+    assert pending.begin(key, "close", trade(1))
+    assert set(pending.blocked(key)) == {"close", "breakeven", "toggle_atm_trade"}
+    assert not pending.begin(key, "toggle_atm_trade", trade(1), False)
+
+
+def test_unsent_toggle_flipped_back_is_withdrawn(pending):
+    key = (SOURCE, 1)
+    assert pending.begin(key, "toggle_atm_trade", trade(1), False)
+    assert pending.pending_atm(SOURCE) == [(key, False)]
+    assert "toggle_atm_trade" not in pending.blocked(key)
+    assert pending.begin(key, "toggle_atm_trade", trade(1, atm_enabled=False), True)
+    assert not pending
+    assert pending.pending_atm(SOURCE) == []
+
+
+def test_sent_toggle_blocks_the_opposite_one(pending):
+    key = (SOURCE, 1)
+    pending.begin(key, "toggle_atm_trade", trade(1), False)
+    pending.sent(SOURCE, {"action": "toggle_atm_trade", "ticket": 1, "atm_trade_state": False})
+    assert "toggle_atm_trade" in pending.blocked(key)
+    assert not pending.begin(key, "toggle_atm_trade", trade(1, atm_enabled=False), True)
+    assert pending.observe(SOURCE, lambda ticket: trade(1, atm_enabled=False)) == [key]
+    assert pending.outcomes["toggle_atm_trade"]["confirmed"] == 1
+
+
+def test_sent_tags_payloads_with_increasing_ids(pending):
+    first, second = {"action": "close_all"}, {"action": "close_all"}
+    assert pending.sent(SOURCE, first) == first["id"]
+    assert pending.sent(SOURCE, second) == first["id"] + 1
+
+# ===================================================================
+# CommandBatcher
+# ===================================================================
+def test_lone_commands_keep_their_original_form():
+    assert CommandBatcher.build_payload([5], [], [], []) == {"action": "close", "ticket": 5}
+    assert CommandBatcher.build_payload([], [5], [], []) == {"action": "breakeven", "ticket": 5}
+    assert CommandBatcher.build_payload([], [], [5], []) == {"action": "toggle_atm_trade", "ticket": 5, "atm_trade_state": True}
+    assert CommandBatcher.build_payload([], [], [], [5]) == {"action": "toggle_atm_trade", "ticket": 5, "atm_trade_state": False}
+
+
+def test_several_commands_become_one_batch_per_relay():
+    batcher = CommandBatcher()
+    batcher.add("a", {"action": "close", "ticket": 1})
+    batcher.add("a", {"action": "breakeven", "ticket": 2})
+    batcher.add("a", {"action": "toggle_atm_trade", "ticket": 3, "atm_trade_state": True})
+    batcher.add("a", {"action": "toggle_atm_trade", "ticket": 4, "atm_trade_state": False})
+    batcher.add("b", {"action": "close", "ticket": 9})
+    batches = {source: payload for source, payload, _ in batcher.take()}
+    assert batches == {
+        "a": {"action": "batch", "close": [1], "breakeven": [2], "atm_on": [3], "atm_off": [4]},
+        "b": {"action": "close", "ticket": 9},
+    }
+    assert not batcher
+    assert batcher.take() == []
+
+
+def test_close_makes_other_commands_for_the_ticket_moot():
+    batcher = CommandBatcher()
+    batcher.add("a", {"action": "breakeven", "ticket": 1})
+    batcher.add("a", {"action": "toggle_atm_trade", "ticket": 1, "atm_trade_state": False})
+    batcher.add("a", {"action": "close", "ticket": 1})
+    batcher.add("a", {"action": "breakeven", "ticket": 1})
+    [(_, payload, _)] = batcher.take()
+    assert payload == {"action": "close", "ticket": 1}
+
+
+def test_repeated_clicks_count_once():
+    batcher = CommandBatcher()
+    batcher.add("a", {"action": "breakeven", "ticket": 1})
+    batcher.add("a", {"action": "breakeven", "ticket": 1})
+    batcher.add("a", {"action": "breakeven", "ticket": 2})
+    [(_, payload, _)] = batcher.take()
+    assert payload == {"action": "batch", "breakeven": [1, 2]}
+
+
+def test_toggle_flipped_back_is_dropped_and_its_callbacks_succeed():
+    batcher = CommandBatcher()
+    results = []
+    batcher.add("a", {"action": "toggle_atm_trade", "ticket": 1, "atm_trade_state": False}, results.append)
+    batcher.add("a", {"action": "toggle_atm_trade", "ticket": 1, "atm_trade_state": True}, results.append)
+    assert not batcher
+    assert results == [True, True]
+
+
+def test_callbacks_travel_with_their_batch():
+    batcher = CommandBatcher()
+    callback = lambda success: None
+    batcher.add("a", {"action": "close", "ticket": 1}, callback)
+    [(_, _, callbacks)] = batcher.take()
+    assert callbacks == [callback]
+
+
+def test_account_wide_commands_are_not_batched():
+    with pytest.raises(ValueError):
+        CommandBatcher().add("a", {"action": "close_all"})
+
+# ===================================================================
+# CommandClient
+# ===================================================================
+class Relay:
+    """ A one-thread HTTP endpoint that records the request bodies and answers as told. """
+    def __init__(self, answer=True, close_after=False):
+        self.answer, self.close_after = answer, close_after
+        self.bodies = []
+        self.closed = threading.Event()
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.server.getsockname()[1]}/command"
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            with connection, connection.makefile("rb") as stream:
+                while True:
+                    head = [stream.readline()]
+                    while head[-1] not in (b"\r\n", b""):
+                        head.append(stream.readline())
+                    if head[-1] == b"":
+                        break
+                    length = next(int(line.split(b":")[1]) for line in head if line.lower().startswith(b"content-length"))
+                    self.bodies.append(stream.read(length))
+                    if not self.answer:
+                        continue
+                    connection.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                    if self.close_after:
+                        break
+            self.closed.set()
+
+    def stop(self):
+        self.server.close()
+
+
+@pytest.fixture
+def client():
+    client = CommandClient(timeout=0.5, retries=2)
+    client.RETRY_DELAY = 0.01
+    yield client
+    client.close()
+
+
+def test_timed_out_command_is_not_sent_again(client):
+    relay = Relay(answer=False)
+    assert client.submit({"action": "close_all"}, url=relay.url).result(timeout=5) is False
+    assert relay.bodies == [b'{"action": "close_all"}']
+    relay.stop()
+
+
+def test_refused_connection_is_retried(client, monkeypatch):
+    relay = Relay()
+    connect = asyncio.open_connection
+    attempts = []
+
+    async def refuse_once(*args, **kwargs):
+        attempts.append(args)
+        if len(attempts) == 1:
+            raise ConnectionRefusedError()
+        return await connect(*args, **kwargs)
+    monkeypatch.setattr(asyncio, "open_connection", refuse_once)
+    assert client.submit({"action": "close", "ticket": 1}, url=relay.url).result(timeout=5) is True
+    assert len(attempts) == 2 and len(relay.bodies) == 1
+    relay.stop()
+
+
+def test_keep_alive_closed_by_the_relay_is_reopened(client):
+    relay = Relay(close_after=True)
+    assert client.submit({"action": "close", "ticket": 1}, url=relay.url).result(timeout=5) is True
+    relay.closed.wait(5)
+    time.sleep(0.05)  # Lets the client's loop see the FIN
+    assert client.submit({"action": "close", "ticket": 2}, url=relay.url).result(timeout=5) is True
+    assert len(relay.bodies) == 2
+    relay.stop()
+
+
+@pytest.mark.parametrize("stage, error, resend", [
+    ("connecting", ConnectionRefusedError(), True),
+    ("connecting", asyncio.TimeoutError(), True),
+    ("sending", BrokenPipeError(), True),
+    ("sending", asyncio.TimeoutError(), False),
+    ("receiving", asyncio.IncompleteReadError(b"", 10), False),
+    ("receiving", asyncio.TimeoutError(), False),
+])
+def test_only_undelivered_requests_are_resent(stage, error, resend):
+    assert CommandClient.undelivered(stage, error) is resend
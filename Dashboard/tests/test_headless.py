@@ -0,0 +1,92 @@
+# FILE: tests/test_headless.py
+import io
+
+import pytest
+
+from headless import TerminalDashboard
+from ingest import parse_endpoints
+from trade_store import TradeRecord
+
+SOURCE = "Live"
+
+
+@pytest.fixture
+def dashboard():
+    dashboard = TerminalDashboard(parse_endpoints([f"{SOURCE}=127.0.0.1:9"]), out=io.StringIO())
+    dashboard.book.apply(SOURCE, {"total_pl": 0.0, "trades": [
+        TradeRecord(ticket, "EURUSD", "Buy", 0.1, 5.0, True, source=SOURCE) for ticket in (10000003, 10000004)]})
+    return dashboard
+
+
+def test_atm_off_then_on_before_the_flush_sends_nothing(dashboard):
+    dashboard.execute("atm off 10000003 10000004")
+    dashboard.execute("atm on 10000003")
+    [(source, payload, _)] = dashboard.batcher.take()
+    assert source == SOURCE
+    assert payload == {"action": "toggle_atm_trade", "ticket": 10000004, "atm_trade_state": False}
+    assert not dashboard.pending.actions((SOURCE, 10000003))
+    assert dashboard.pending.actions((SOURCE, 10000004))["toggle_atm_trade"].target is False
+
+
+def test_atm_compares_against_the_pending_target(dashboard):
+    dashboard.execute("atm off 10000003")
+    dashboard.execute("atm off 10000003")
+    assert dashboard.atm_state((SOURCE, 10000003)) is False
+    [(_, payload, _)] = dashboard.batcher.take()
+    assert payload == {"action": "toggle_atm_trade", "ticket": 10000003, "atm_trade_state": False}
+
+
+def test_opposite_toggle_is_refused_while_the_first_is_in_flight(dashboard):
+    dashboard.execute("atm off 10000003")
+    [(source, payload, _)] = dashboard.batcher.take()
+    dashboard.pending.sent(source, payload)
+    dashboard.execute("atm on 10000003")
+    assert not dashboard.batcher
+    assert "still waiting" in dashboard.notice
+
+
+def answer(dashboard, text):
+    dashboard.input = text
+    dashboard.on_key("enter")
+
+
+def test_close_waits_for_a_yes(dashboard):
+    dashboard.execute("close 10000003")
+    assert dashboard.confirm[0] == "Close position 10000003? [y/N]"
+    assert "Close position 10000003? [y/N]" in dashboard.out.getvalue()
+    assert not dashboard.batcher and not dashboard.pending
+    answer(dashboard, "y")
+    [(_, payload, _)] = dashboard.batcher.take()
+    assert payload == {"action": "close", "ticket": 10000003}
+
+
+@pytest.mark.parametrize("reply", ["", "n", "no", "close 10000004"])
+def test_close_is_cancelled_by_anything_but_yes(dashboard, reply):
+    dashboard.execute("close 10000003 10000004")
+    assert dashboard.confirm[0] == "Close the 2 positions 10000003, 10000004? [y/N]"
+    answer(dashboard, reply)
+    assert dashboard.confirm is None and not dashboard.batcher
+    assert dashboard.notice == "Cancelled."
+
+
+def test_position_closed_while_asking_is_skipped(dashboard):
+    dashboard.execute("close 10000003 10000004")
+    dashboard.book.apply(SOURCE, {"total_pl": 0.0, "trades": [
+        TradeRecord(10000004, "EURUSD", "Buy", 0.1, 5.0, True, source=SOURCE)]})
+    answer(dashboard, "yes")
+    [(_, payload, _)] = dashboard.batcher.take()
+    assert payload == {"action": "close", "ticket": 10000004}
+
+
+@pytest.mark.parametrize("command, action", [("closeall", "close_all"), ("closeprofits", "close_profits"),
+                                             ("closelosses", "close_losses")])
+def test_account_wide_closes_wait_for_a_yes(dashboard, monkeypatch, command, action):
+    sent = []
+    monkeypatch.setattr(dashboard, "send_command", lambda payload, *args, **kwargs: sent.append(payload))
+    dashboard.execute(command)
+    answer(dashboard, "n")
+    assert sent == []
+    dashboard.execute(command)
+    assert dashboard.confirm[0].endswith("on 1 relay(s)? [y/N]")
+    answer(dashboard, "y")
+    assert sent == [{"action": action}]
@@ -0,0 +1,157 @@
+# FILE: tests/test_history.py
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from history import FLAG_ACCOUNT, HEADER_SIZE, RECORD_DTYPE, HistoryFile, HistoryRecorder
+from trade_store import TradeRecord
+
+
+def snapshot(*tickets, total_pl=1.0):
+    return {"total_pl": total_pl, "trades": [TradeRecord(ticket, "EURUSD", "Buy", 0.1, 2.5, True) for ticket in tickets]}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+# ===================================================================
+# Ring file
+# ===================================================================
+SMALL = HEADER_SIZE  # The smallest ring: 1024 rows, 256 index slots
+
+
+def rows(snapshot, count, source=0):
+    block = np.zeros(count, RECORD_DTYPE)
+    block["time_ms"] = snapshot * 1000
+    block["ticket"] = snapshot * 10000 + np.arange(count)
+    block["source"] = source
+    return block
+
+
+def tickets(views):
+    return [int(ticket) for view in views for ticket in view["ticket"]]
+
+
+def test_append_wraps_around_the_ring(tmp_path):
+    history = HistoryFile(str(tmp_path / "history.bin"), SMALL)
+    assert history.capacity == 1024
+    for snapshot in range(15):
+        history.append(snapshot * 1000, rows(snapshot, 100))
+    assert history.counts == (1500, 15)
+    views = history.read()
+    # Rows 476..499 of snapshot 4 survive but the snapshot is incomplete, so reading starts at snapshot 5
+    assert len(views) == 2
+    assert tickets(views) == [snapshot * 10000 + row for snapshot in range(5, 15) for row in range(100)]
+    history.close()
+
+
+def test_read_a_time_range_across_the_wrap(tmp_path):
+    history = HistoryFile(str(tmp_path / "history.bin"), SMALL)
+    for snapshot in range(15):
+        history.append(snapshot * 1000, rows(snapshot, 100))
+    views = history.read(7000, 12000)
+    assert len(views) == 2  # Rows 700..1299 of the ring's 1024
+    assert tickets(views) == [snapshot * 10000 + row for snapshot in range(7, 13) for row in range(100)]
+    assert tickets(history.read(6500, 7500)) == [70000 + row for row in range(100)]
+    assert history.read(20000) == [] and history.read(1000, 2000) == []
+    history.close()
+
+
+def test_oversized_snapshot_keeps_its_newest_rows(tmp_path):
+    history = HistoryFile(str(tmp_path / "history.bin"), SMALL)
+    history.append(0, rows(0, 10))
+    history.append(1000, rows(1, 2000))
+    assert tickets(history.read(1000)) == [10000 + row for row in range(976, 2000)]
+    history.close()
+
+
+def test_index_ring_wraps_with_small_snapshots(tmp_path):
+    history = HistoryFile(str(tmp_path / "history.bin"), SMALL)
+    for snapshot in range(300):
+        history.append(snapshot * 1000, rows(snapshot, 1))
+    assert tickets(history.read()) == [snapshot * 10000 for snapshot in range(44, 300)]
+    assert tickets(history.read(298000)) == [2980000, 2990000]
+    history.close()
+
+
+def test_reopened_read_only(tmp_path):
+    path = str(tmp_path / "history.bin")
+    history = HistoryFile(path, SMALL)
+    relay, other = history.source_id("relay"), history.source_id("other")
+    assert history.symbol_id("EURUSD") == 0
+    for snapshot in range(15):
+        block = rows(snapshot, 100, relay if snapshot % 2 else other)
+        block["flags"][0] = FLAG_ACCOUNT
+        block["profit"][0] = snapshot
+        history.append(snapshot * 1000, block)
+    expected = tickets(history.read(3000, 13000))
+    history.close()
+
+    reader = HistoryFile(path, readonly=True)
+    assert reader.counts == (1500, 15) and reader.capacity == 1024
+    assert reader.sources == ["relay", "other"] and reader.symbols == ["EURUSD"]
+    assert tickets(reader.read(3000, 13000)) == expected
+    times, values = reader.account_series(source="relay")
+    assert list(times) == [5000, 7000, 9000, 11000, 13000] and list(values) == [5, 7, 9, 11, 13]
+    reader.close()
+
+
+def test_other_size_cap_starts_a_new_history(tmp_path):
+    path = str(tmp_path / "history.bin")
+    history = HistoryFile(path, SMALL)
+    history.append(0, rows(0, 10))
+    history.close()
+    history = HistoryFile(path, 2 * 1024 * 1024)
+    assert history.counts == (0, 0) and history.read() == []
+    history.close()
+    (tmp_path / "other.bin").write_bytes(b"x" * HEADER_SIZE)
+    with pytest.raises(ValueError):
+        HistoryFile(str(tmp_path / "other.bin"), readonly=True)
+
+# ===================================================================
+# Recorder
+# ===================================================================
+def test_recorder_writes_snapshots(tmp_path):
+    recorder = HistoryRecorder(str(tmp_path / "history.bin"), 1024 * 1024, min_interval_ms=0)
+    recorder.record("relay", snapshot(1, 2))
+    recorder.record("relay", snapshot(1))
+    assert wait_for(lambda: recorder.written == 2)
+    views = recorder.file.read()
+    assert [int(ticket) for ticket in np.concatenate(views)["ticket"]] == [0, 1, 2, 0, 1]
+    recorder.close()
+
+
+def test_failed_write_disables_recording(tmp_path, capsys):
+    recorder = HistoryRecorder(str(tmp_path / "history.bin"), 1024 * 1024, min_interval_ms=0)
+    def broken(time_ms, rows):
+        raise OSError("disk gone")
+    recorder.file.append = broken
+    recorder.record("relay", snapshot(1))
+    assert wait_for(lambda: not recorder.enabled)
+    assert not recorder.due("relay")
+    recorder.record("relay", snapshot(2))
+    assert recorder._queue.empty()
+    started = time.monotonic()
+    recorder.close()
+    assert time.monotonic() - started < 1 and not recorder._thread.is_alive()
+    assert "[History] ❌ Recording disabled" in capsys.readouterr().out
+
+
+def test_queue_is_bounded_while_the_writer_is_behind(tmp_path):
+    recorder = HistoryRecorder(str(tmp_path / "history.bin"), 1024 * 1024, min_interval_ms=0)
+    release = threading.Event()
+    write = recorder._write
+    recorder._write = lambda *item: (release.wait(5), write(*item))
+    for source in range(HistoryRecorder.MAX_QUEUED + 20):
+        recorder.record(str(source), snapshot(1))
+    assert recorder._queue.qsize() <= HistoryRecorder.MAX_QUEUED
+    assert recorder.dropped >= 19
+    release.set()
+    recorder.close()
+    assert recorder.written + recorder.dropped == HistoryRecorder.MAX_QUEUED + 20
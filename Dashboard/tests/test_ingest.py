@@ -0,0 +1,108 @@
+# FILE: tests/test_ingest.py
+import random
+import threading
+
+import pytest
+
+from ingest import DEFAULT_RELAY, MessageCoalescer, ReconnectBackoff, parse_endpoints
+
+
+def snapshot(source, seq):
+    return {"type": "trade_data", "source": source, "seq": seq}
+
+# ===================================================================
+# MessageCoalescer
+# ===================================================================
+def test_latest_snapshot_per_source_wins():
+    coalescer = MessageCoalescer()
+    assert coalescer.push(snapshot("a", 1))
+    assert not coalescer.push(snapshot("b", 1))
+    assert not coalescer.push(snapshot("a", 2))
+    assert not coalescer.push(snapshot("a", 3))
+    assert coalescer.drain() == [snapshot("a", 3), snapshot("b", 1)]
+    assert coalescer.stats() == {"received": 4, "rendered": 2, "dropped": 2, "merged": 1}
+
+
+def test_control_messages_are_kept_in_order_before_the_snapshots():
+    coalescer = MessageCoalescer()
+    coalescer.push(snapshot("a", 1))
+    coalescer.push({"type": "settings", "n": 1})
+    coalescer.push(snapshot("a", 2))
+    coalescer.push({"type": "status", "n": 2})
+    coalescer.push({"type": "settings", "n": 3})
+    assert coalescer.drain() == [{"type": "settings", "n": 1}, {"type": "status", "n": 2},
+                                 {"type": "settings", "n": 3}, snapshot("a", 2)]
+
+
+def test_drain_empties_the_buffer_and_the_next_push_wakes_the_ui():
+    coalescer = MessageCoalescer()
+    coalescer.push(snapshot("a", 1))
+    assert coalescer.drain() == [snapshot("a", 1)]
+    assert coalescer.drain() == []
+    assert coalescer.push(snapshot("a", 2))
+    coalescer.drain()
+    assert coalescer.stats()["merged"] == 0  # One frame per drain is not a merge
+
+
+def test_concurrent_pushes_lose_nothing_but_superseded_snapshots():
+    coalescer = MessageCoalescer()
+    drained = []
+
+    def produce(source):
+        for seq in range(2000):
+            coalescer.push(snapshot(source, seq))
+            if seq % 100 == 0:
+                coalescer.push({"type": "status", "source": source, "seq": seq})
+
+    threads = [threading.Thread(target=produce, args=(source,)) for source in "abc"]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        drained += coalescer.drain()
+    drained += coalescer.drain()
+    stats = coalescer.stats()
+    assert stats["received"] == 3 * 2020 and stats["rendered"] == len(drained)
+    assert stats["rendered"] + stats["dropped"] == stats["received"]
+    assert sum(message["type"] == "status" for message in drained) == 60
+    for source in "abc":
+        seqs = [message["seq"] for message in drained if message["type"] == "trade_data" and message["source"] == source]
+        assert seqs == sorted(seqs) and seqs[-1] == 1999
+
+# ===================================================================
+# Relay endpoints and reconnect backoff
+# ===================================================================
+def test_parse_endpoints():
+    endpoints = parse_endpoints(["10.0.0.5:5000", "demo=ws://10.0.0.6:5001/, live = 10.0.0.7:5002", ""])
+    assert [(e.name, e.address) for e in endpoints] == [
+        ("10.0.0.5:5000", "10.0.0.5:5000"), ("demo", "10.0.0.6:5001"), ("live", "10.0.0.7:5002")]
+    assert endpoints[1].ws_url == "ws://10.0.0.6:5001"
+    assert endpoints[1].command_url == "http://10.0.0.6:5001/command"
+
+
+def test_parse_endpoints_defaults_and_duplicates():
+    assert [e.address for e in parse_endpoints([])] == [DEFAULT_RELAY]
+    with pytest.raises(ValueError):
+        parse_endpoints(["a=127.0.0.1:5000", "a=127.0.0.1:5001"])
+
+
+def test_backoff_retries_at_once_then_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(random, "random", lambda: 0.0)  # No jitter
+    backoff = ReconnectBackoff(base=0.5, cap=4.0, jitter=0.5)
+    assert [backoff.next_delay() for _ in range(7)] == [0.0, 0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+    backoff.reset()
+    assert [backoff.next_delay() for _ in range(3)] == [0.0, 0.5, 1.0]
+
+
+def test_backoff_jitter_only_shortens_the_delay():
+    random.seed(4)
+    backoff = ReconnectBackoff(base=0.5, cap=30.0, jitter=0.5)
+    backoff.next_delay()
+    for attempt in range(1, 200):
+        nominal = min(30.0, 0.5 * 2 ** (attempt - 1))
+        assert nominal * 0.5 <= backoff.next_delay() <= nominal
+    delays = []
+    for _ in range(200):
+        backoff.reset()
+        backoff.next_delay()
+        delays.append(backoff.next_delay())
+    assert len(set(delays)) > 150  # Spread out, not in lockstep
@@ -0,0 +1,58 @@
+# FILE: tests/test_ingest_process.py
+import time
+from multiprocessing import shared_memory
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import ingest_process
+from ingest import parse_endpoints
+from ingest_process import IngestProcess, SnapshotWriter
+
+
+def stuck_ingest(specs, conn, capacity):
+    """ An ingest process that announces its segment and then never listens to the parent again. """
+    writer = SnapshotWriter(capacity)
+    conn.send(("segment", "relay", writer.name))
+    while True:
+        time.sleep(1)
+
+
+def exists(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def started(process):
+    process.start()
+    events = process.events()
+    kind, source, name = next(events)
+    assert (kind, source) == ("segment", "relay") and exists(name)
+    return events, name
+
+
+def test_stop_asks_the_process_to_exit():
+    process = IngestProcess(parse_endpoints(["relay=127.0.0.1:9"]), capacity=16)
+    events, name = started(process)
+    child = process.process
+    process.stop(timeout=5)
+    assert child.exitcode == 0
+    assert not exists(name)  # Unlinked by the process itself
+    assert list(events) == []
+
+
+def test_stuck_process_is_terminated_quickly_and_its_segments_unlinked(monkeypatch):
+    monkeypatch.setattr(ingest_process, "run_ingest", stuck_ingest)
+    process = IngestProcess(parse_endpoints(["relay=127.0.0.1:9"]), capacity=16)
+    events, name = started(process)
+    child = process.process
+    begun = time.perf_counter()
+    process.stop()
+    assert time.perf_counter() - begun < 1
+    assert not child.is_alive() and process.process is None
+    assert not exists(name)
+    assert list(events) == []
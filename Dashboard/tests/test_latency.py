@@ -0,0 +1,86 @@
+# FILE: tests/test_latency.py
+import random
+
+import pytest
+
+from latency import LatencyHistogram, RollingHistogram
+
+
+def exact_percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(1, int(round(fraction * len(ordered)))) - 1]
+
+
+def histogram_of(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+# ===================================================================
+# LatencyHistogram
+# ===================================================================
+def test_small_values_are_exact():
+    for value in range(2 * LatencyHistogram.SUB_BUCKETS):
+        assert LatencyHistogram.bucket_value(LatencyHistogram.bucket_of(value)) == value
+
+
+def test_bucket_edges_are_within_the_relative_precision():
+    rng = random.Random(1)
+    values = [rng.randrange(1, 1 << rng.randrange(5, 40)) for _ in range(20000)] + [32, 33, 63, 64, 65, 2 ** 30]
+    for value in values:
+        edge = LatencyHistogram.bucket_value(LatencyHistogram.bucket_of(value))
+        assert value <= edge <= value * (1 + 1 / LatencyHistogram.SUB_BUCKETS), value
+    # Consecutive buckets are contiguous
+    for index in range(1, 200):
+        assert LatencyHistogram.bucket_of(LatencyHistogram.bucket_value(index - 1) + 1) == index
+
+
+@pytest.mark.parametrize("fraction", [0.01, 0.5, 0.9, 0.99, 1.0])
+def test_percentiles_never_under_report_and_stay_close(fraction):
+    rng = random.Random(2)
+    values = [int(rng.lognormvariate(8, 1.5)) for _ in range(5000)]
+    histogram = histogram_of(values)
+    exact = exact_percentile(values, fraction)
+    reported = histogram.percentile(fraction)
+    assert exact <= reported <= exact * (1 + 1 / LatencyHistogram.SUB_BUCKETS)
+    assert reported <= histogram.max == max(values)
+
+
+def test_negative_and_huge_values_are_clamped():
+    histogram = histogram_of([-5, 2 ** 50])
+    assert histogram.counts[0] == 1 and histogram.counts[-1] == 1
+    assert histogram.percentile(1.0) == 2 ** 50
+    assert LatencyHistogram().percentile(0.5) == 0
+
+
+def test_merge_equals_recording_everything_in_one():
+    rng = random.Random(3)
+    first, second = ([int(rng.expovariate(1 / 5000)) for _ in range(1000)] for _ in range(2))
+    merged = histogram_of(first)
+    merged.add(histogram_of(second))
+    together = histogram_of(first + second)
+    assert merged.counts == together.counts
+    assert (merged.total, merged.max) == (together.total, together.max)
+    assert merged.summary() == together.summary()
+
+# ===================================================================
+# RollingHistogram
+# ===================================================================
+def test_rolling_window_forgets_old_slices():
+    rolling = RollingHistogram(window_seconds=60, slices=6)
+    rolling.record(100, 0)
+    rolling.record(200, 15)
+    assert rolling.snapshot(59).total == 2
+    snapshot = rolling.snapshot(61)  # The slice started at 0 is out of the window
+    assert snapshot.total == 1 and snapshot.max == 200
+
+
+def test_rolling_window_reuses_its_slices():
+    rolling = RollingHistogram(window_seconds=60, slices=6)
+    for second in range(0, 80, 10):
+        rolling.record(second + 1, second)
+    snapshot = rolling.snapshot(70)
+    assert snapshot.total == 6 and snapshot.max == 71
+    assert snapshot.percentile(0.01) == 21  # 1 and 11 were overwritten when the ring came around
+    assert rolling.snapshot(200).total == 0
@@ -0,0 +1,76 @@
+# FILE: tests/test_sparkline.py
+import random
+
+import pytest
+
+pytest.importorskip("PyQt6.QtWidgets")
+
+from sparkline import MultiResolutionSeries
+
+
+def brute_force(samples, width):
+    """ [index, low, high, last] of every bucket of the given width, oldest first. """
+    buckets = {}
+    for t, value in samples:
+        index = int(t // width)
+        bucket = buckets.get(index)
+        if bucket is None:
+            buckets[index] = [index, value, value, value]
+        else:
+            bucket[1], bucket[2], bucket[3] = min(bucket[1], value), max(bucket[2], value), value
+    return [buckets[index] for index in sorted(buckets)]
+
+
+def random_walk(rng, count, start=1000.0):
+    t, value, samples = start, 0.0, []
+    for _ in range(count):
+        t += rng.choice((0.05, 0.3, 1.0, 2.5, 9.0, 40.0))
+        value += rng.gauss(0, 5)
+        samples.append((t, round(value, 2)))
+    return samples
+
+
+@pytest.mark.parametrize("seed, base", [(1, 1.0), (2, 0.25), (3, 5.0)])
+def test_every_level_matches_a_brute_force_bucketing(seed, base):
+    rng = random.Random(seed)
+    samples = random_walk(rng, 4000)
+    series = MultiResolutionSeries(base_seconds=base, capacity=32)
+    for t, value in samples:
+        series.append(t, value)
+    assert len(series.levels) > 3
+    for level in range(len(series.levels)):
+        expected = brute_force(samples, series.width(level))
+        # Each level remembers its last `capacity` finished buckets plus the one being filled
+        assert series.buckets(level, -1) == expected[-(series.capacity + 1):], level
+        assert series.latest(level) == expected[-1]
+    # The coarsest level still covers the whole session
+    coarsest = len(series.levels) - 1
+    assert series.buckets(coarsest, -1)[0][0] == int(samples[0][0] // series.width(coarsest))
+
+
+def test_buckets_from_an_index_on():
+    series = MultiResolutionSeries(base_seconds=1.0, capacity=8)
+    for second in range(10):
+        series.append(second + 0.5, second)
+        series.append(second + 0.7, -second)
+    assert series.buckets(0, 7) == [[7, -7, 7, -7], [8, -8, 8, -8], [9, -9, 9, -9]]
+    assert series.buckets(1, 2) == [[2, -5, 5, -5], [3, -7, 7, -7], [4, -9, 9, -9]]
+    assert series.buckets(0, 10) == []
+    assert len(series.levels) == 2
+
+
+def test_clock_stepping_back_keeps_the_buckets_ordered():
+    series = MultiResolutionSeries(base_seconds=1.0, capacity=100)
+    series.append(10.2, 1.0)
+    series.append(11.5, 2.0)
+    series.append(9.0, -3.0)  # Counted in the current bucket instead of rewriting the past
+    assert series.buckets(0, 0) == [[10, 1.0, 1.0, 1.0], [11, -3.0, 2.0, -3.0]]
+    assert series.last_time == 11.5
+
+
+def test_levels_grow_with_the_logarithm_of_the_session():
+    series = MultiResolutionSeries(base_seconds=1.0, capacity=64)
+    for second in range(0, 100000, 7):
+        series.append(float(second), float(second % 13))
+    assert len(series.levels) == 12  # 62 * 2^11 s is the first level that covers 100000 s
+    assert len(series) <= series.capacity * len(series.levels)
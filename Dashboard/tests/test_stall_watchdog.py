@@ -0,0 +1,127 @@
+# FILE: tests/test_stall_watchdog.py
+import threading
+import time
+
+import pytest
+
+from stall_watchdog import StallWatchdog
+
+
+def parse_snapshot(state):
+    while state["stage"] == "parse":
+        time.sleep(0.001)
+    paint_rows(state)
+
+
+def paint_rows(state):
+    while state["stage"] == "paint":
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def loop():
+    """ A stand-in for the GUI thread that is blocked in parse_snapshot, then in paint_rows once told to. """
+    state = {"stage": "parse"}
+    thread = threading.Thread(target=parse_snapshot, args=(state,), daemon=True)
+    thread.start()
+
+    def move_to(stage):
+        state["stage"] = stage
+        time.sleep(0.05)
+    yield thread, move_to
+    move_to("done")
+    thread.join()
+
+
+def watching(thread, clock, **kwargs):
+    stalls = []
+    watchdog = StallWatchdog(threshold=0.5, interval=0.05, clock=clock,
+                             on_stall=lambda duration, offender: stalls.append((duration, offender)), **kwargs)
+    watchdog.target = thread.ident
+    watchdog.beat()
+    return watchdog, stalls
+
+
+def test_no_stall_while_the_beats_are_on_time(loop, clock):
+    watchdog, stalls = watching(loop[0], clock)
+    for _ in range(20):
+        clock.advance(0.05)
+        watchdog.beat()
+        watchdog.check()
+    clock.advance(0.54)  # Late, but within threshold + interval
+    watchdog.check()
+    assert stalls == [] and watchdog.stalled_since is None and not watchdog.samples
+
+
+def test_stall_is_blamed_on_the_stack_sampled_most(loop, clock):
+    thread, move_to = loop
+    watchdog, stalls = watching(thread, clock)
+    clock.advance(0.6)
+    for _ in range(2):
+        watchdog.check()
+    move_to("paint")
+    for _ in range(5):
+        clock.advance(0.1)
+        watchdog.check()
+    assert sum(watchdog.samples.values()) == 7
+    clock.advance(0.1)
+    watchdog.beat()
+    watchdog.check()
+    [(duration, offender)] = stalls
+    assert duration == pytest.approx(1.2 - 0.05)
+    assert offender.site.startswith("test_stall_watchdog.py:") and offender.site.endswith(" paint_rows")
+    assert [name for _, _, name in offender.stack[-2:]] == ["parse_snapshot", "paint_rows"]
+    assert watchdog.stalls == 1 and watchdog.stalled_time == pytest.approx(1.15)
+    assert watchdog.stalled_since is None and not watchdog.samples
+
+
+def test_stalls_at_one_site_add_up_and_rank_by_total(loop, clock):
+    thread, move_to = loop
+    watchdog, stalls = watching(thread, clock)
+
+    def stall(seconds, polls=3):
+        for _ in range(polls):
+            clock.advance(seconds / polls)
+            watchdog.check()
+        watchdog.beat()
+        watchdog.check()
+    stall(0.9)
+    stall(1.5)
+    move_to("paint")
+    stall(2.0)
+    parse, paint = (offender for _, offender in stalls[1:])
+    assert parse.count == 2 and parse.total == pytest.approx(0.85 + 1.45) and parse.max == pytest.approx(1.45)
+    assert [o.site for o in watchdog.top()] == [parse.site, paint.site]
+    summary = watchdog.summary()
+    assert summary["stalls"] == 3 and [o["count"] for o in summary["offenders"]] == [2, 1]
+    assert len(summary["recent"]) == 3 and summary["recent"][-1]["site"].endswith("paint_rows")
+    assert "paint_rows" in watchdog.format_table() and "parse_snapshot" in watchdog.format_report()
+
+
+def test_samples_are_capped(loop, clock):
+    watchdog, _ = watching(loop[0], clock)
+    clock.advance(1)
+    for _ in range(StallWatchdog.MAX_SAMPLES + 30):
+        watchdog.check()
+    assert sum(watchdog.samples.values()) == StallWatchdog.MAX_SAMPLES
+
+
+def blocking_call():
+    time.sleep(0.4)
+
+
+def test_watchdog_thread_catches_a_real_stall():
+    stalls = []
+    watchdog = StallWatchdog(threshold=0.1, interval=0.02, on_stall=lambda duration, offender: stalls.append(offender))
+    watchdog.start()
+    try:
+        blocking_call()
+        watchdog.beat()
+        deadline = time.monotonic() + 2
+        while not stalls and time.monotonic() < deadline:
+            time.sleep(0.01)
+            watchdog.beat()
+    finally:
+        watchdog.stop()
+    [offender] = stalls
+    assert offender.site.endswith(" blocking_call") and 0.25 < offender.total < 0.5
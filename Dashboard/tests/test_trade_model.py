@@ -0,0 +1,76 @@
+# FILE: tests/test_trade_model.py
+import pytest
+
+pytest.importorskip("PyQt6")
+
+from PyQt6.QtCore import QSettings
+
+from app_logic import TradeTableModel, Translator
+from command_client import PendingCommands
+from trade_store import TradeRecord
+
+SOURCE = "relay"
+
+
+@pytest.fixture
+def model(qapp, tmp_path, clock):
+    model = TradeTableModel(Translator(QSettings(str(tmp_path / "settings.ini"), QSettings.Format.IniFormat)))
+    model.pending = PendingCommands(timeout=30.0, clock=clock)
+    model.apply_changes([TradeRecord(ticket, "EURUSD", "Buy", 0.1, 5.0, True, source=SOURCE) for ticket in (1, 2, 3)])
+    return model
+
+
+def toggle_off(model, ticket):
+    """ What MainWindow does for a click on the ATM button, followed by the batch going out. """
+    key = (SOURCE, ticket)
+    assert model.pending.begin(key, "toggle_atm_trade", model.get_trade(key), False)
+    model.set_atm_enabled(key, False)
+    model.pending.sent(SOURCE, {"action": "toggle_atm_trade", "ticket": ticket, "atm_trade_state": False})
+    return key
+
+
+def test_frame_without_the_row_does_not_confirm_optimistic_toggle(model):
+    # The ingest process only sends rows that changed on the EA's side
+    key = toggle_off(model, 1)
+    model.apply_changes([], ())
+    model.resolve_pending(SOURCE)
+    assert model.pending.actions(key)
+    assert model.pending.outcomes["toggle_atm_trade"]["confirmed"] == 0
+    assert model.get_trade(key).atm_enabled is False
+    assert model.confirmed_trade(key).atm_enabled is True
+
+
+def test_reported_row_confirms_toggle(model, clock):
+    key = toggle_off(model, 1)
+    clock.advance(0.5)
+    model.apply_changes([TradeRecord(1, "EURUSD", "Buy", 0.1, 5.0, False, source=SOURCE)], ())
+    model.resolve_pending(SOURCE)
+    assert not model.pending
+    assert model.pending.outcomes["toggle_atm_trade"]["confirmed"] == 1
+    assert model.get_trade(key).atm_enabled is False
+    assert not model.confirmed
+
+
+def test_full_snapshot_keeps_unconfirmed_toggle_on_screen(model):
+    key = toggle_off(model, 2)
+    model.update_trades([TradeRecord(ticket, "EURUSD", "Buy", 0.1, 6.0, True, source=SOURCE) for ticket in (1, 2, 3)], SOURCE)
+    model.resolve_pending(SOURCE)
+    assert model.pending.actions(key)
+    assert model.get_trade(key).atm_enabled is False
+    assert model.get_trade(key).profit == 6.0
+
+
+def test_expired_toggle_restores_reported_state(model, clock):
+    key = toggle_off(model, 3)
+    clock.advance(31)
+    assert model.expire_pending() == [key]
+    assert model.get_trade(key).atm_enabled is True
+    assert not model.confirmed
+    assert model.pending.outcomes["toggle_atm_trade"]["timed_out"] == 1
+
+
+def test_closed_row_drops_its_reported_record(model):
+    key = toggle_off(model, 1)
+    model.apply_changes([], [key])
+    assert model.get_trade(key) is None
+    assert not model.confirmed
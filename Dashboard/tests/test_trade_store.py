@@ -0,0 +1,88 @@
+# FILE: tests/test_trade_store.py
+import json
+
+import pytest
+
+from trade_store import TradeDecoder
+
+
+def position(ticket, profit=5.0, symbol="EURUSD", atm_enabled=True):
+    return {"ticket": ticket, "symbol": symbol, "type": "Buy", "volume": 0.1, "profit": profit, "atm_enabled": atm_enabled}
+
+
+def snapshot(seq, *trades):
+    return json.dumps({"type": "trade_data", "seq": seq, "data": {"symbol": "EURUSD", "total_pl": 0.0, "trades": list(trades)}})
+
+
+def delta(seq, opened=(), changed=(), closed=()):
+    return json.dumps({"type": "trade_delta", "seq": seq, "data": {"symbol": "EURUSD", "total_pl": 1.0,
+                                                                    "opened": list(opened), "changed": list(changed), "closed": list(closed)}})
+
+
+def tickets(message):
+    return sorted(trade.ticket for trade in message["data"]["trades"])
+
+
+@pytest.fixture
+def decoder():
+    decoder = TradeDecoder("relay")
+    decoder.decode(snapshot(5, position(1), position(2)))
+    return decoder
+
+
+def test_in_order_deltas_are_applied(decoder):
+    message = decoder.decode(delta(6, opened=[position(3)], changed=[{"ticket": 1, "profit": 7.5}], closed=[2]))
+    assert message["type"] == "trade_data" and message["seq"] == 6
+    assert tickets(message) == [1, 3]
+    assert decoder.records[1].profit == 7.5 and decoder.records[1].profit_text == "+7.50 $"
+    assert message["data"]["total_pl"] == 1.0 and "changed" not in message["data"]
+    assert decoder.decode(delta(7, changed=[{"ticket": 3, "atm_enabled": False}]))["seq"] == 7
+    assert decoder.records[3].atm_enabled is False
+    assert not decoder.resync_pending and decoder.resyncs == 0
+
+
+def test_unchanged_rows_keep_their_record(decoder):
+    before = decoder.records[2]
+    decoder.decode(delta(6, changed=[{"ticket": 1, "profit": 6.0}]))
+    assert decoder.records[2] is before
+    decoder.decode(snapshot(9, position(1, profit=6.0), position(2)))
+    assert decoder.records[2] is before
+
+
+def test_gap_requests_one_snapshot_and_ignores_deltas_until_then(decoder):
+    assert decoder.decode(delta(7, changed=[{"ticket": 1, "profit": 9.0}])) is None
+    assert decoder.resync_pending and decoder.resyncs == 1
+    decoder.resync_pending = False
+    assert decoder.decode(delta(8)) is None
+    assert not decoder.resync_pending and decoder.resyncs == 1
+    assert decoder.records[1].profit == 5.0
+    assert tickets(decoder.decode(snapshot(9, position(1, profit=9.0)))) == [1]
+    assert decoder.decode(delta(10, changed=[{"ticket": 1, "profit": 9.5}]))["seq"] == 10
+
+
+def test_duplicate_seq_is_not_applied_twice(decoder):
+    decoder.decode(delta(6, opened=[position(3)]))
+    assert decoder.decode(delta(6, opened=[position(4)])) is None
+    assert decoder.resync_pending
+    assert sorted(decoder.records) == [1, 2, 3]
+
+
+def test_delta_before_any_snapshot_requests_one():
+    decoder = TradeDecoder("relay")
+    assert decoder.decode(delta(1, opened=[position(1)])) is None
+    assert decoder.resync_pending
+
+
+def test_change_of_an_unknown_ticket_requests_a_snapshot(decoder):
+    message = delta(6, changed=[{"ticket": 1, "profit": 8.0}, {"ticket": 99, "profit": 1.0}], closed=[2])
+    assert decoder.decode(message) is None
+    assert decoder.resync_pending and decoder.resyncs == 1
+    # Nothing of the diverged delta was applied
+    assert sorted(decoder.records) == [1, 2] and decoder.records[1].profit == 5.0
+    assert decoder.decode(delta(7)) is None
+
+
+def test_reset_forgets_the_sequence(decoder):
+    decoder.reset()
+    assert decoder.decode(delta(6)) is None
+    assert decoder.resync_pending
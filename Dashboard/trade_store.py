@@ -0,0 +1,262 @@
+# FILE: trade_store.py
+import json
+import sys
+
+from binary_frames import KIND_SNAPSHOT, FLAG_SELL, FLAG_ATM, FLAG_RULE_APPLIED, is_frame, read_frame, update_symbols
+
+# Use a fast JSON backend when one is installed; the standard library is the fallback.
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    try:
+        import ujson
+        json_loads = ujson.loads
+    except ImportError:
+        json_loads = json.loads
+
+# Protocol 2 adds sequence-numbered trade_delta messages and, optionally, binary frames
+# (binary_frames.py). The dashboard announces support with HELLO_MESSAGE; relays that don't
+# understand it ignore it and keep sending JSON snapshots.
+PROTOCOL_VERSION = 2
+HELLO_MESSAGE = json.dumps({"type": "hello", "version": PROTOCOL_VERSION, "features": ["delta", "binary"]})
+RESYNC_MESSAGE = json.dumps({"type": "resync"})
+
+# ===================================================================
+# 1. Compact trade record
+# ===================================================================
+class TradeRecord:
+    """
+    One open position. Slotted to keep thousands of positions small in memory,
+    with the table's display strings computed once when the value changes
+    instead of on every paint. source names the relay the position came from;
+    key = (source, ticket) identifies it across terminals. The price fields feed the
+    ATM rule preview and stay 0.0 when the EA doesn't send them.
+    """
+    __slots__ = ("ticket", "symbol", "type", "volume", "profit", "atm_enabled",
+                 "ticket_text", "volume_text", "profit_text", "source", "key",
+                 "open_price", "sl", "tp", "price", "rule_applied")
+
+    def __init__(self, ticket, symbol, type, volume, profit, atm_enabled,
+                 ticket_text=None, volume_text=None, profit_text=None, source="",
+                 open_price=0.0, sl=0.0, tp=0.0, price=0.0, rule_applied=False):
+        self.source = source
+        self.key = (source, ticket)
+        self.ticket = ticket
+        self.symbol = symbol
+        self.type = type
+        self.volume = volume
+        self.profit = profit
+        self.atm_enabled = atm_enabled
+        self.open_price = open_price
+        self.sl = sl
+        self.tp = tp
+        self.price = price
+        self.rule_applied = rule_applied
+        self.ticket_text = ticket_text if ticket_text is not None else str(ticket)
+        self.volume_text = volume_text if volume_text is not None else f"{volume:.2f}"
+        self.profit_text = profit_text if profit_text is not None else f"{profit:+.2f} $"
+
+    def replace(self, **changes):
+        """ Returns a copy with some fields changed, reusing the cached texts that still apply. """
+        fields = {name: getattr(self, name) for name in self.__slots__ if name != "key"}
+        fields.update(changes)
+        if "volume" in changes and changes["volume"] != self.volume:
+            fields["volume_text"] = None
+        if "profit" in changes and changes["profit"] != self.profit:
+            fields["profit_text"] = None
+        return TradeRecord(**fields)
+
+    def __repr__(self):
+        return f"TradeRecord(source={self.source!r}, ticket={self.ticket}, symbol={self.symbol!r}, type={self.type!r}, volume={self.volume}, profit={self.profit}, atm_enabled={self.atm_enabled})"
+
+# ===================================================================
+# 2. Decoder (runs on the network thread)
+# ===================================================================
+class TradeDecoder:
+    """
+    Decodes raw relay frames and converts the trade list of trade_data messages into TradeRecords.
+    The previous snapshot is kept so unchanged positions reuse their existing record
+    (no allocation, and the table model skips them by identity) and changed positions
+    only re-format the fields that actually moved. Symbol and type strings are interned.
+
+    trade_delta messages (protocol 2) are applied on top of the last snapshot and handed on
+    as an ordinary trade_data message. When a sequence gap is detected the delta is discarded,
+    resync_pending is set so the caller can ask the relay for a fresh snapshot, and further
+    deltas are ignored until that snapshot arrives. Binary frames carry the same snapshots and
+    deltas and are turned into the same messages, straight from their rows.
+    """
+    TYPES = ("Buy", "Sell")
+
+    def __init__(self, source=""):
+        self.source = source
+        self.records = {}
+        self.resyncs = 0
+        self.reset()
+
+    def reset(self):
+        """ Forgets the sequence state, e.g. after reconnecting. """
+        self.seq = None
+        self.awaiting_snapshot = False
+        self.resync_pending = False
+        self.symbols = []  # Symbol table of the binary frames
+
+    def decode(self, raw):
+        """ Returns the decoded message, or None when a delta could not be applied. """
+        if is_frame(raw):
+            return self.decode_frame(raw)
+        message = json_loads(raw)
+        msg_type = message.get("type")
+        if msg_type == "trade_data":
+            data = message.get("data") or {}
+            data["trades"] = self.decode_trades(data.get("trades") or ())
+            message["data"] = data
+            self.seq = message.get("seq")
+            self.awaiting_snapshot = False
+        elif msg_type == "trade_delta":
+            return self.apply_delta(message)
+        return message
+
+    def in_sequence(self, seq):
+        """ Whether a delta with this seq follows the last applied message; if not, a resync is requested. """
+        if self.awaiting_snapshot:
+            return False
+        if self.seq is None or seq != self.seq + 1:
+            self.request_resync(f"Sequence gap (have {self.seq}, got {seq})")
+            return False
+        return True
+
+    def request_resync(self, reason):
+        """ Ignores deltas until the next snapshot, which the owner asks for when it sees resync_pending. """
+        print(f"[WebSocket] ⚠️ {reason}, requesting snapshot")
+        self.awaiting_snapshot = True
+        self.resync_pending = True
+        self.resyncs += 1
+
+    def apply_delta(self, message):
+        seq = message.get("seq")
+        if not self.in_sequence(seq):
+            return None
+
+        delta = message.get("data") or {}
+        records = self.records
+        changed = delta.get("changed") or ()
+        for trade in changed:
+            if trade.get("ticket") not in records:
+                # The book has diverged from the relay's; applying the rest would hide it
+                self.request_resync(f"Delta {seq} changes unknown ticket {trade.get('ticket')}")
+                return None
+        for trade in changed:
+            old = records[trade.get("ticket")]
+            volume = trade.get("volume", old.volume)
+            profit = trade.get("profit", old.profit)
+            records[old.ticket] = TradeRecord(
+                old.ticket, old.symbol, old.type, volume, profit, trade.get("atm_enabled", old.atm_enabled),
+                old.ticket_text, old.volume_text if old.volume == volume else None,
+                old.profit_text if old.profit == profit else None, self.source,
+                old.open_price, trade.get("sl", old.sl), trade.get("tp", old.tp), trade.get("price", old.price),
+                trade.get("rule_applied", old.rule_applied))
+        for ticket in delta.get("closed") or ():
+            records.pop(ticket, None)
+        for trade in delta.get("opened") or ():
+            records[trade.get("ticket")] = self.new_record(trade)
+        self.seq = seq
+
+        data = {key: value for key, value in delta.items() if key not in ("opened", "closed", "changed")}
+        data["trades"] = list(records.values())
+        return {"type": "trade_data", "seq": seq, "data": data}
+
+    def decode_frame(self, raw):
+        kind, seq, header, opened, moved, changed, closed = read_frame(raw)
+        if not update_symbols(self.symbols, header) and kind != KIND_SNAPSHOT:
+            seq = None  # Entries were lost with a missed delta; force a resync
+        source = self.source
+        symbols = self.symbols
+        types = self.TYPES
+        records = self.records
+        if kind == KIND_SNAPSHOT:
+            previous, records = records, {}
+            self.records = records
+            self.seq = seq
+            self.awaiting_snapshot = False
+        elif not self.in_sequence(seq):
+            return None
+        else:
+            moved, changed = list(moved), list(changed)
+            for row in (*moved, *changed):
+                if row[0] not in records:
+                    self.request_resync(f"Delta {seq} changes unknown ticket {row[0]}")
+                    return None
+            previous = records
+            self.seq = seq
+            for ticket, profit, price in moved:
+                old = records[ticket]
+                records[ticket] = TradeRecord(
+                    ticket, old.symbol, old.type, old.volume, profit, old.atm_enabled, old.ticket_text, old.volume_text,
+                    old.profit_text if old.profit == profit else None, source, old.open_price, old.sl, old.tp, price,
+                    old.rule_applied)
+            for ticket, flags, volume, profit, sl, tp, price in changed:
+                old = records[ticket]
+                records[ticket] = TradeRecord(
+                    ticket, old.symbol, old.type, volume, profit, bool(flags & FLAG_ATM), old.ticket_text,
+                    old.volume_text if old.volume == volume else None, old.profit_text if old.profit == profit else None,
+                    source, old.open_price, sl, tp, price, bool(flags & FLAG_RULE_APPLIED))
+            for ticket in closed:
+                records.pop(ticket, None)
+
+        for ticket, symbol, flags, volume, profit, open_price, sl, tp, price in opened:
+            atm_enabled = bool(flags & FLAG_ATM)
+            rule_applied = bool(flags & FLAG_RULE_APPLIED)
+            old = previous.get(ticket)
+            if old is None:
+                record = TradeRecord(ticket, symbols[symbol], types[flags & FLAG_SELL], volume, profit, atm_enabled,
+                                     source=source, open_price=open_price, sl=sl, tp=tp, price=price, rule_applied=rule_applied)
+            elif (old.volume == volume and old.profit == profit and old.atm_enabled == atm_enabled and old.price == price
+                  and old.sl == sl and old.tp == tp and old.rule_applied == rule_applied):
+                record = old
+            else:
+                record = TradeRecord(ticket, old.symbol, old.type, volume, profit, atm_enabled, old.ticket_text,
+                                     old.volume_text if old.volume == volume else None,
+                                     old.profit_text if old.profit == profit else None, source,
+                                     old.open_price, sl, tp, price, rule_applied)
+            records[ticket] = record
+
+        header["trades"] = list(records.values())
+        return {"type": "trade_data", "seq": seq, "data": header}
+
+    def new_record(self, trade):
+        intern = sys.intern
+        return TradeRecord(trade.get("ticket"), intern(trade.get("symbol", "")), intern(trade.get("type", "")),
+                           trade.get("volume", 0.0), trade.get("profit", 0.0), trade.get("atm_enabled", True),
+                           source=self.source, open_price=trade.get("open_price", 0.0), sl=trade.get("sl", 0.0),
+                           tp=trade.get("tp", 0.0), price=trade.get("price", 0.0),
+                           rule_applied=trade.get("rule_applied", False))
+
+    def decode_trades(self, trades):
+        previous = self.records
+        current = {}
+        decoded = []
+        for trade in trades:
+            ticket = trade.get("ticket")
+            volume = trade.get("volume", 0.0)
+            profit = trade.get("profit", 0.0)
+            atm_enabled = trade.get("atm_enabled", True)
+            price = trade.get("price", 0.0)
+            sl = trade.get("sl", 0.0)
+            tp = trade.get("tp", 0.0)
+            rule_applied = trade.get("rule_applied", False)
+            old = previous.get(ticket)
+            if old is None:
+                record = self.new_record(trade)
+            elif (old.volume == volume and old.profit == profit and old.atm_enabled == atm_enabled and old.price == price
+                  and old.sl == sl and old.tp == tp and old.rule_applied == rule_applied):
+                record = old
+            else:
+                record = TradeRecord(ticket, old.symbol, old.type, volume, profit, atm_enabled, old.ticket_text,
+                                     old.volume_text if old.volume == volume else None,
+                                     old.profit_text if old.profit == profit else None, self.source,
+                                     old.open_price, sl, tp, price, rule_applied)
+            current[ticket] = record
+            decoded.append(record)
+        self.records = current
+        return decoded
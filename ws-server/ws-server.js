@@ -5,7 +5,8 @@ const WebSocket = require('ws');
 const app = express();
 const PORT = 5000;
 const server = http.createServer(app);
-const wss = new WebSocket.Server({ server });
+// Deflates large messages when the dashboard offers permessage-deflate (the websockets client does by default)
+const wss = new WebSocket.Server({ server, perMessageDeflate: { threshold: 256 } });
 
 app.use(express.json());
 